@@ -0,0 +1,218 @@
+"""لوحة ويب للمديرين (Streamlit): سجل اليوم، تقرير موظف لفترة، كشف الرواتب، وتكلفة الأقسام.
+
+تقرأ مجلد البيانات للقراءة فقط بجانب البرنامج أو خدمة الحضور التي تملك الكتابة. نواة واحدة مشتركة
+بين كل المشاهدين، وكل عرض يبدأ بـ refresh (فحص بصمة الملفات وإعادة التحميل عند حفظ جديد) ثم تُحسب
+التقارير عبر st.cache_data بمفتاح data_version: أول مشاهد يحسب التقرير مرة لكل نسخة من البيانات
+والباقون يأخذونه من الذاكرة.
+
+التشغيل: streamlit run app.py -- --data-dir data --storage json
+"""
+import argparse
+import sqlite3
+import threading
+from datetime import date as date_type
+
+import pandas as pd
+import streamlit as st
+
+from core import AttendanceCore
+
+# أقصى عدد نتائج محفوظة لكل تقرير (النسخ القديمة من البيانات تخرج أولاً)
+CACHE_ENTRIES = 64
+
+DAILY_COLUMNS = ['كود الموظف', 'اسم الموظف', 'وقت الحضور', 'وقت الانصراف', 'عدد الساعات', 'الراتب']
+PERIOD_COLUMNS = ['التاريخ', 'وقت الحضور', 'وقت الانصراف', 'عدد الساعات', 'الراتب']
+ON_SITE_COLUMNS = ['كود الموظف', 'اسم الموظف', 'القسم', 'وقت الحضور']
+PAYROLL_HEADINGS = {'emp_id': 'كود الموظف', 'name': 'اسم الموظف', 'department': 'القسم',
+                    'hourly_rate': 'سعر الساعه', 'days': 'أيام العمل', 'hours': 'عدد الساعات', 'salary': 'الراتب'}
+DEPARTMENT_COLUMNS = ['القسم', 'عدد الموظفين', 'أيام العمل', 'عدد الساعات', 'الراتب']
+GRANULARITY_NAMES = {'week': "أسبوع", 'month': "شهر", 'year': "سنة"}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="لوحة ويب لتقارير الحضور")
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--shard-format', choices=['json', 'binary'], default='json')
+    return parser.parse_known_args()[0]
+
+
+@st.cache_resource
+def open_dashboard(storage_backend, data_dir, shard_format):
+    """النواة المشتركة للقراءة فقط، وقفل لأن كل مشاهد يعمل في خيط مستقل"""
+    return AttendanceCore(storage_backend, data_dir, shard_format, read_only=True), threading.Lock()
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def employee_options(_dashboard, data_version):
+    """(الكود، الاسم) لكل الموظفين مرتبة بالكود"""
+    core, lock = _dashboard
+    with lock:
+        return sorted((emp_id, data['name']) for emp_id, data in core.employees.items())
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def daily_board(_dashboard, data_version, report_date):
+    """صفوف تقرير اليوم وإجمالياته والمتواجدين حالياً"""
+    core, lock = _dashboard
+    with lock:
+        rows = core.daily_report_rows(report_date) or []
+        on_site = [(emp_id, core.employees.get(emp_id, {}).get('name', ''),
+                    core.employees.get(emp_id, {}).get('department', ''), record.check_in)
+                   for emp_id, (_, record) in sorted(core.open_sessions.items(), key=lambda item: item[1][1].start)]
+
+    totals = [values for _, values, tags in rows if 'total' in tags]
+    summary = {
+        'present': len({iid.split(':')[0] for iid, _, _ in rows}),
+        'hours': round(sum(values[4] for values in totals), 2),
+        'salary': round(sum(values[5] for values in totals), 2),
+    }
+    return (pd.DataFrame([values for _, values, _ in rows], columns=DAILY_COLUMNS),
+            pd.DataFrame(on_site, columns=ON_SITE_COLUMNS), summary)
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def period_report(_dashboard, data_version, emp_id, start_date_str, end_date_str):
+    """أيام موظف في الفترة (نفس التقرير الشهري في البرنامج) وإجمالي ساعاتها"""
+    core, lock = _dashboard
+    with lock:
+        if emp_id not in core.employees:
+            return pd.DataFrame(columns=PERIOD_COLUMNS), 0
+        rows, total_hours = core.monthly_report_rows(emp_id, start_date_str, end_date_str)
+    return pd.DataFrame([values for _, values, _ in rows], columns=PERIOD_COLUMNS), total_hours
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def payroll_totals(_dashboard, data_version, start_date_str, end_date_str):
+    """كشف رواتب كل الموظفين للفترة"""
+    core, lock = _dashboard
+    with lock:
+        return core.compute_payroll(start_date_str, end_date_str)
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def department_costs(_dashboard, data_version, granularity, date_str):
+    """تكلفة الأقسام للفترة التي تشمل التاريخ (بدون صف الإجمالي) واسم الفترة"""
+    core, lock = _dashboard
+    with lock:
+        rows, period = core.department_report_rows(granularity, date_str)
+    return pd.DataFrame([values for _, values, tags in rows if 'total' not in tags],
+                        columns=DEPARTMENT_COLUMNS), period
+
+
+def show_daily(dashboard, data_version):
+    report_date = st.date_input("التاريخ", date_type.today()).strftime('%Y-%m-%d')
+    report, on_site, summary = daily_board(dashboard, data_version, report_date)
+
+    present, hours, salary, now = st.columns(4)
+    present.metric("الحاضرون", summary['present'])
+    hours.metric("إجمالي الساعات", summary['hours'])
+    salary.metric("إجمالي الرواتب", summary['salary'])
+    now.metric("المتواجدون الآن", len(on_site))
+
+    st.subheader(f"سجل يوم {report_date}")
+    if report.empty:
+        st.info("لا توجد بيانات لهذا التاريخ")
+    else:
+        st.dataframe(report, hide_index=True, use_container_width=True)
+
+    st.subheader("المتواجدون حالياً")
+    st.dataframe(on_site, hide_index=True, use_container_width=True)
+
+
+def period_inputs():
+    today = date_type.today()
+    start, end = st.columns(2)
+    start_date = start.date_input("من تاريخ", today.replace(day=1))
+    end_date = end.date_input("إلى تاريخ", today)
+    if start_date > end_date:
+        st.error("تاريخ البداية يجب أن يكون أقل من تاريخ النهاية")
+        st.stop()
+    return start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+
+
+def show_period(dashboard, data_version):
+    options = employee_options(dashboard, data_version)
+    if not options:
+        st.info("لا يوجد موظفون")
+        return
+    names = dict(options)
+    emp_id = st.selectbox("الموظف", [emp_id for emp_id, _ in options],
+                          format_func=lambda emp_id: f"{emp_id} - {names[emp_id]}")
+    start_date_str, end_date_str = period_inputs()
+
+    report, total_hours = period_report(dashboard, data_version, emp_id, start_date_str, end_date_str)
+    if report.empty:
+        st.info("لا توجد بيانات للفترة المحددة")
+        return
+    st.metric("إجمالي الساعات", round(total_hours, 2))
+    st.dataframe(report, hide_index=True, use_container_width=True)
+
+
+def show_payroll(dashboard, data_version):
+    start_date_str, end_date_str = period_inputs()
+    result = payroll_totals(dashboard, data_version, start_date_str, end_date_str)
+    if not result['hours'].gt(0).any():
+        st.info("لا توجد بيانات للفترة المحددة")
+        return
+
+    days, hours, salary = st.columns(3)
+    days.metric("أيام العمل", int(result['days'].sum()))
+    hours.metric("إجمالي الساعات", round(float(result['hours'].sum()), 2))
+    salary.metric("إجمالي الرواتب", round(float(result['salary'].sum()), 2))
+    st.dataframe(result.rename(columns=PAYROLL_HEADINGS), hide_index=True, use_container_width=True)
+
+    st.subheader("الرواتب حسب القسم")
+    st.bar_chart(result.groupby('department', sort=True)['salary'].sum())
+
+
+def show_departments(dashboard, data_version):
+    granularity_column, date_column = st.columns(2)
+    granularity = granularity_column.radio("المستوى", list(GRANULARITY_NAMES), index=1, horizontal=True,
+                                           format_func=GRANULARITY_NAMES.get)
+    date_str = date_column.date_input("الفترة التي تشمل", date_type.today()).strftime('%Y-%m-%d')
+
+    report, period = department_costs(dashboard, data_version, granularity, date_str)
+    st.subheader(f"تكلفة الأقسام - {period}")
+    if report.empty:
+        st.info("لا توجد بيانات للفترة المحددة")
+        return
+
+    employees, hours, salary = st.columns(3)
+    employees.metric("الموظفون", int(report['عدد الموظفين'].sum()))
+    hours.metric("إجمالي الساعات", round(float(report['عدد الساعات'].sum()), 2))
+    salary.metric("إجمالي الرواتب", round(float(report['الراتب'].sum()), 2))
+    st.dataframe(report, hide_index=True, use_container_width=True)
+    st.bar_chart(report.set_index('القسم')['الراتب'])
+
+
+PAGES = {
+    "سجل اليوم": show_daily,
+    "تقرير موظف لفترة": show_period,
+    "كشف الرواتب": show_payroll,
+    "تكلفة الأقسام": show_departments,
+}
+
+
+def main():
+    args = parse_args()
+    st.set_page_config(page_title="لوحة الحضور والانصراف", layout='wide')
+
+    try:
+        dashboard = open_dashboard(args.storage, args.data_dir, args.shard_format)
+    except sqlite3.OperationalError as e:
+        st.error(f"تعذر فتح قاعدة البيانات: {str(e)}")
+        st.stop()
+
+    core, lock = dashboard
+    with lock:
+        data_version = core.refresh()
+
+    page = st.sidebar.radio("التقرير", list(PAGES))
+    st.sidebar.caption(f"نسخة البيانات: {data_version}")
+    st.title(page)
+    PAGES[page](dashboard, data_version)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""أرشيف السنوات المغلقة: ملف مضغوط للقراءة فقط لكل سنة مع فهرس صغير بجانبه.
+
+ملف السنة (archive/2023.1.arch) هو لقطات snapfile للأشهر متتالية (كل شهر مضغوط وله checksum خاص)،
+والفهرس (archive/2023.index.json) فيه اسم الملف وموضع وطول كل شهر فيه، ومدى التواريخ، والموظفون
+الموجودون مع أيامهم وجلساتهم وساعاتهم، وإجماليات السنة. قراءة شهر مؤرشف تفتح ملف سنته فقط وتقرأ
+بايتات ذلك الشهر فقط، وباقي الأدوات (المسح بعد حذف موظف مثلاً) تعرف من الفهرس وحده أي أرشيف
+يحتاج إعادة كتابة.
+
+الأرشفة تكتب ملفاً جديداً ثم الفهرس الذي يشير إليه ثم يحذف التخزين نسخته الحية من الأشهر؛ الانقطاع
+قبل الفهرس يترك ملفاً يتم تجاهله والفهرس القديم صالح، وبعده تبقى النسخة الحية وتُدمج مع الأرشيف عند
+القراءة. إعادة كتابة أرشيف (بعد مسح موظف) تكتب ملفاً بإصدار جديد بنفس الطريقة.
+
+أرشفة كل السنوات المغلقة من سطر الأوامر (والبرنامج والخدمة متوقفان):
+    python archive.py data --storage json
+"""
+import argparse
+import json
+import os
+import threading
+
+import snapfile
+from metrics import registry
+
+INDEX_VERSION = 1
+
+
+def shard_hours(start, end):
+    if isinstance(start, int) and isinstance(end, int):
+        return (end - start) / 3600
+    return 0
+
+
+class ArchiveStore:
+    """أرشيفات السنوات في data/archive (آمن للقراءة من الواجهة والكتابة من خيط الحفظ)"""
+
+    def __init__(self, data_dir):
+        self.dir = os.path.join(data_dir, 'archive')
+        self.lock = threading.Lock()
+        self._indexes = None
+
+    def data_path(self, year):
+        return os.path.join(self.dir, self.indexes[year]['file'])
+
+    def index_path(self, year):
+        return os.path.join(self.dir, f'{year}.index.json')
+
+    @property
+    def indexes(self):
+        """السنة ← الفهرس (تُقرأ الفهارس الصغيرة فقط، مرة واحدة)"""
+        if self._indexes is None:
+            indexes = {}
+            try:
+                names = os.listdir(self.dir)
+            except FileNotFoundError:
+                names = []
+            for name in names:
+                if not name.endswith('.index.json'):
+                    continue
+                try:
+                    with open(os.path.join(self.dir, name), 'r', encoding='utf-8') as f:
+                        index = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    continue
+                indexes[index['year']] = index
+            self._indexes = indexes
+        return self._indexes
+
+    def reload(self):
+        """قراءة الفهارس من القرص من جديد عند الاستخدام التالي (أرشفة أو مسح من عملية أخرى)"""
+        with self.lock:
+            self._indexes = None
+
+    def version(self):
+        """بصمة ملفات الفهارس على القرص: (الاسم، وقت التعديل، الحجم) لكل فهرس"""
+        try:
+            names = sorted(name for name in os.listdir(self.dir) if name.endswith('.index.json'))
+        except FileNotFoundError:
+            return ()
+        version = []
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(self.dir, name))
+            except FileNotFoundError:
+                continue
+            version.append((name, stat.st_mtime_ns, stat.st_size))
+        return tuple(version)
+
+    def years(self):
+        return sorted(self.indexes)
+
+    def months(self):
+        """الشهر ← سنة الأرشيف لكل الأشهر المؤرشفة"""
+        return {month: year for year, index in self.indexes.items() for month in index['months']}
+
+    def read_months(self, months):
+        """سجلات الأشهر المطلوبة الموجودة في الأرشيف {التاريخ: {الكود: [Session]}}، بفتح أرشيفاتها فقط"""
+        attendance = {}
+        archived = self.months()
+        by_year = {}
+        for month in months:
+            if month in archived:
+                by_year.setdefault(archived[month], []).append(month)
+
+        with self.lock:
+            for year, year_months in sorted(by_year.items()):
+                index = self.indexes[year]
+                with registry.timer('archive_read'), open(self.data_path(year), 'rb') as f:
+                    for month in sorted(year_months):
+                        offset, length = index['months'][month]
+                        f.seek(offset)
+                        attendance.update(snapfile.decode_shard(f.read(length)))
+        return attendance
+
+    def write_year(self, year, shards):
+        """أرشفة سنة: shards هو {الشهر: {التاريخ: {الكود: [(الحضور، الانصراف)]}}}؛ يعيد الفهرس"""
+        employees = {}
+        dates = []
+        blobs = []
+        months = {}
+        offset = 0
+        for month in sorted(shards):
+            shard = shards[month]
+            blob = snapfile.encode_shard(shard)
+            months[month] = [offset, len(blob)]
+            offset += len(blob)
+            blobs.append(blob)
+            for date, day in shard.items():
+                dates.append(date)
+                for emp_id, records in day.items():
+                    totals = employees.setdefault(emp_id, [0, 0, 0.0])
+                    totals[0] += 1
+                    totals[1] += len(records)
+                    totals[2] += sum(shard_hours(start, end) for start, end in records)
+
+        year = str(year)
+        previous = self.indexes.get(year)
+        generation = previous['generation'] + 1 if previous else 1
+        index = {
+            'version': INDEX_VERSION,
+            'year': year,
+            'generation': generation,
+            'file': f'{year}.{generation}.arch',
+            'months': months,
+            'first_date': min(dates) if dates else None,
+            'last_date': max(dates) if dates else None,
+            'sessions': sum(totals[1] for totals in employees.values()),
+            'hours': round(sum(totals[2] for totals in employees.values()), 2),
+            # الكود ← [الأيام، الجلسات، الساعات]
+            'employees': {emp_id: [days, sessions, round(hours, 2)]
+                          for emp_id, (days, sessions, hours) in sorted(employees.items())},
+        }
+
+        os.makedirs(self.dir, exist_ok=True)
+        with self.lock:
+            data_path = os.path.join(self.dir, index['file'])
+            with open(data_path, 'wb') as f:
+                for blob in blobs:
+                    f.write(blob)
+                f.flush()
+                os.fsync(f.fileno())
+            tmp_path = self.index_path(year) + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.index_path(year))
+            self.indexes[year] = index
+            if previous:
+                os.remove(os.path.join(self.dir, previous['file']))
+        return index
+
+    def read_year(self, year):
+        """كل أشهر أرشيف سنة بصيغة write_year"""
+        attendance = self.read_months(self.indexes[year]['months'])
+        shards = {}
+        for date, day in attendance.items():
+            shards.setdefault(date[:7], {})[date] = {
+                emp_id: [(record.start, record.end) for record in records] for emp_id, records in day.items()}
+        return shards
+
+    def purge_employees(self, emp_ids):
+        """حذف سجلات موظفين من الأرشيفات التي يذكرهم فهرسها فقط؛ يعيد عدد الجلسات المحذوفة"""
+        emp_ids = set(emp_ids)
+        purged = 0
+        for year, index in sorted(list(self.indexes.items())):
+            present = emp_ids & set(index['employees'])
+            if not present:
+                continue
+            shards = self.read_year(year)
+            for shard in shards.values():
+                for day in shard.values():
+                    for emp_id in present:
+                        purged += len(day.pop(emp_id, ()))
+            self.write_year(year, {month: {date: day for date, day in shard.items() if day}
+                                   for month, shard in shards.items()})
+        return purged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="أرشفة السنوات المغلقة")
+    parser.add_argument('data_dir')
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--shard-format', choices=['json', 'binary'], default='json')
+    args = parser.parse_args(argv)
+
+    from core import AttendanceCore
+
+    core = AttendanceCore(args.storage, args.data_dir, args.shard_format)
+    try:
+        for index in core.archive_closed_years():
+            print(f"{index['year']}: {len(index['months'])} شهر، {len(index['employees'])} موظف، "
+                  f"{index['sessions']} جلسة، {index['hours']} ساعة")
+    finally:
+        core.storage.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""سطر أوامر الحضور بدون واجهة: الحضور والانصراف، الاستعلام، التقارير، كشف الرواتب، والتصدير.
+
+يستخدم AttendanceCore مباشرة (أو خدمة الحضور المحلية مع --service) بدون Tk أو Streamlit، ولا تُستورد
+pandas أو openpyxl أو fpdf إلا في الأمر الذي يحتاجها (كشف الرواتب والتصدير)، فالحضور والاستعلام
+يبدآن بسرعة على خادم بدون شاشة. التقارير تفتح البيانات للقراءة فقط فتعمل بجانب البرنامج أو الخدمة؛
+الحضور والانصراف يكتبان في البيانات، فإذا كانت الخدمة تعمل يُمرران لها (بـ --service أو تلقائياً من
+قفل الخدمة على مجلد البيانات).
+
+أمثلة:
+    python attendance.py check-in 1001 --service http://127.0.0.1:8765
+    python attendance.py status 1001
+    python attendance.py report daily --date 2024-05-01
+    python attendance.py report monthly 1001 --from 2024-05-01 --to 2024-05-31 --excel may.xlsx
+    python attendance.py report departments --period month --date 2024-05-01
+    python attendance.py payroll --from 2024-05-01 --to 2024-05-31 --pdf payroll.pdf
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from core import AttendanceCore, AttendanceError, StatusLookup
+
+
+def report_date(text):
+    try:
+        datetime.strptime(text, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError("صيغة التاريخ غير صحيحة. استخدم YYYY-MM-DD")
+    return text
+
+
+def open_core(args, read_only=True):
+    return AttendanceCore(args.storage, args.data_dir, args.shard_format, read_only=read_only)
+
+
+def open_kiosk(args, read_only=False):
+    """خدمة الحضور إذا حُددت أو كانت تعمل على البيانات، وإلا نواة محلية (تكتب في البيانات مباشرة إلا للقراءة فقط)"""
+    if not args.service and not read_only:
+        import servicelock
+
+        args.service = servicelock.holder_url(args.data_dir) or None
+    if args.service:
+        from client import AttendanceClient
+
+        return AttendanceClient(args.service)
+    return open_core(args, read_only)
+
+
+def open_lookup(args):
+    """خدمة الحضور إذا حُددت، وإلا استعلام محلي يقرأ الموظفين والحضور المفتوح فقط"""
+    if args.service:
+        return open_kiosk(args, read_only=True)
+    return StatusLookup(args.storage, args.data_dir, args.shard_format)
+
+
+def close(kiosk):
+    if isinstance(kiosk, (AttendanceCore, StatusLookup)):
+        kiosk.storage.close()
+
+
+def format_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return str(round(value, 2))
+    return str(value)
+
+
+def print_rows(headers, rows):
+    print('\t'.join(headers))
+    for values in rows:
+        print('\t'.join(format_value(value) for value in values))
+
+
+def output_report(args, kind, title, rows):
+    """طباعة صفوف التقرير (أوقاتها بالثواني من النواة)، أو تصديرها إلى Excel/PDF إذا طُلب ذلك"""
+    import exports
+
+    headers, col_widths = exports.REPORT_HEADERS[kind]
+    if args.excel:
+        exports.write_excel_report(args.excel, headers, [values for _, values, _ in rows])
+        print(f"تم تصدير التقرير إلى {args.excel}")
+    values = [exports.display_values(values, headers) for _, values, _ in rows]
+    if args.pdf:
+        exports.write_pdf_report(args.pdf, title, headers, col_widths, values)
+        print(f"تم تصدير التقرير إلى {args.pdf}")
+    if not args.excel and not args.pdf:
+        print_rows(headers, values)
+
+
+def cmd_status(args):
+    kiosk = open_lookup(args)
+    try:
+        status = kiosk.employee_status(args.emp_id)
+    finally:
+        close(kiosk)
+    if status is None:
+        raise AttendanceError("كود الموظف غير مسجل")
+    state = f"حاضر منذ {status['open_date']}" if status['open_date'] else "غير حاضر"
+    print(f"{status['emp_id']}\t{status['name']}\t{state}")
+
+
+def cmd_search(args):
+    kiosk = open_lookup(args)
+    try:
+        matches = kiosk.search_employees(args.text, args.limit)
+    finally:
+        close(kiosk)
+    for emp_id, name in matches:
+        print(f"{emp_id}\t{name}")
+
+
+def cmd_punch(args):
+    kiosk = open_kiosk(args)
+    try:
+        if args.command == 'check-in':
+            result = kiosk.check_in_employee(args.emp_id)
+            print(f"تم تسجيل حضور {args.emp_id} في {result['check_in']}")
+        else:
+            result = kiosk.check_out_employee(args.emp_id)
+            print(f"تم تسجيل انصراف {args.emp_id} في {result['check_out']}")
+    finally:
+        close(kiosk)
+
+
+def cmd_report(args):
+    core = open_core(args)
+    try:
+        if args.report == 'daily':
+            rows = core.daily_report_rows(args.date, epochs=True) or []
+            title = f"تقرير الحضور اليومي - {args.date}"
+        elif args.report == 'monthly':
+            if args.emp_id not in core.employees:
+                raise AttendanceError("كود الموظف غير مسجل")
+            rows, _ = core.monthly_report_rows(args.emp_id, args.start, args.end, epochs=True)
+            title = f"تقرير الحضور للفترة - {args.start} إلى {args.end} للموظف {args.emp_id}"
+        else:
+            rows, period = core.department_report_rows(args.period, args.date)
+            title = f"تكلفة الأقسام - {period}"
+    finally:
+        core.storage.close()
+
+    if not rows:
+        print("لا توجد بيانات للفترة المحددة", file=sys.stderr)
+        return
+    kind = 'department' if args.report == 'departments' else args.report
+    output_report(args, kind, title, rows)
+
+
+def cmd_payroll(args):
+    core = open_core(args)
+    try:
+        rows = core.payroll_report_rows(args.start, args.end)
+    finally:
+        core.storage.close()
+
+    if not rows:
+        print("لا توجد بيانات للفترة المحددة", file=sys.stderr)
+        return
+    output_report(args, 'payroll', f"كشف الرواتب للفترة - {args.start} إلى {args.end}", rows)
+
+
+def add_period_arguments(parser):
+    parser.add_argument('--from', dest='start', type=report_date, required=True)
+    parser.add_argument('--to', dest='end', type=report_date, required=True)
+
+
+def add_export_arguments(parser):
+    parser.add_argument('--excel', help="تصدير التقرير إلى ملف Excel بدلاً من طباعته")
+    parser.add_argument('--pdf', help="تصدير التقرير إلى ملف PDF بدلاً من طباعته")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='attendance', description="نظام الحضور والانصراف من سطر الأوامر")
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--shard-format', choices=['json', 'binary'], default='json')
+    parser.add_argument('--service', help="عنوان خدمة الحضور المحلية (مثل http://127.0.0.1:8765)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for name, help_text in (('check-in', "تسجيل حضور"), ('check-out', "تسجيل انصراف"),
+                            ('status', "حالة موظف")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('emp_id')
+        command.set_defaults(func=cmd_status if name == 'status' else cmd_punch)
+
+    search = commands.add_parser('search', help="البحث عن موظف بالكود أو الاسم")
+    search.add_argument('text')
+    search.add_argument('--limit', type=int, default=10)
+    search.set_defaults(func=cmd_search)
+
+    report = commands.add_parser('report', help="التقارير")
+    reports = report.add_subparsers(dest='report', required=True)
+    daily = reports.add_parser('daily', help="تقرير يومي")
+    daily.add_argument('--date', type=report_date, default=datetime.now().strftime('%Y-%m-%d'))
+    monthly = reports.add_parser('monthly', help="تقرير موظف لفترة")
+    monthly.add_argument('emp_id')
+    add_period_arguments(monthly)
+    departments = reports.add_parser('departments', help="تكلفة الأقسام")
+    departments.add_argument('--period', choices=['week', 'month', 'year'], default='month')
+    departments.add_argument('--date', type=report_date, default=datetime.now().strftime('%Y-%m-%d'))
+    for command in (daily, monthly, departments):
+        add_export_arguments(command)
+        command.set_defaults(func=cmd_report)
+
+    payroll = commands.add_parser('payroll', help="كشف رواتب كل الموظفين لفترة")
+    add_period_arguments(payroll)
+    add_export_arguments(payroll)
+    payroll.set_defaults(func=cmd_payroll)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except AttendanceError as e:
+        sys.exit(str(e))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""قياس أداء نواة الحضور على بيانات تجريبية بأحجام مختلفة (بدون واجهة).
+
+لكل حجم: توليد البيانات (synthetic.py) ثم قياس أول تحميل (ترحيل الملف القديم)، load_data،
+save_data، الحضور والانصراف، has_open_checkin، التقرير اليومي والتقرير الشهري. النتيجة زمن
+p50/p95/p99/max لكل عملية، وأعلى ذاكرة Python مخصصة للعملية (tracemalloc في تشغيل منفصل غير
+مقاس زمنه)، وأعلى ذاكرة للعملية كلها (RSS). كل حجم يعمل في عملية مستقلة حتى لا تختلط قيم الذاكرة.
+
+التشغيل:
+    python bench.py --sizes small medium --storage json --output bench.json
+    python bench.py --sizes small --compare bench.json   # مقارنة بقياس سابق
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date as date_type
+from datetime import timedelta
+
+# الحجم ← (عدد الموظفين، عدد السنوات، خيارات إضافية للمولد)
+# الجلسات تقريباً = الموظفين × السنوات × 313 يوم عمل × نسبة الحضور × 1.3
+SIZES = {
+    'small': (100, 1, {}),
+    'medium': (1000, 2, {}),
+    'large': (5000, 3, {}),
+    'long': (500, 10, {}),
+    'wide': (50000, 1, {'attendance_rate': 0.2}),
+    'xlarge': (50000, 10, {'attendance_rate': 0.05}),
+}
+
+OPERATIONS = ['first_load', 'load_data', 'save_data', 'check_in', 'check_out',
+              'has_open_checkin', 'daily_report', 'monthly_report']
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+
+    def at(fraction):
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+    return {'count': len(samples), 'p50': at(0.5), 'p95': at(0.95), 'p99': at(0.99), 'max': samples[-1]}
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def peak_allocation(func, *args):
+    """أعلى ذاكرة Python مخصصة أثناء تنفيذ الدالة (بالميجابايت)"""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def run_size(name, storage_backend, repeat, seed, shard_format='json'):
+    """تشغيل القياسات لحجم واحد (داخل عملية مستقلة)"""
+    from core import AttendanceCore
+    from synthetic import generate_dataset
+
+    employees, years, options = SIZES[name]
+    rng = random.Random(seed)
+    end = date_type.today()
+    data_dir = tempfile.mkdtemp(prefix=f'bench-{name}-')
+    try:
+        generate_time, dataset = timed(generate_dataset, data_dir, employees, years, end, seed, **options)
+
+        latencies = {}
+        peaks = {}
+
+        # الترحيل يحدث مرة واحدة فقط، فالذاكرة تقاس على أول تحميل لنسخة ثانية من نفس البيانات
+        copy_dir = data_dir + '-copy'
+        shutil.copytree(data_dir, copy_dir)
+        elapsed, core = timed(AttendanceCore, storage_backend, data_dir, shard_format)
+        latencies['first_load'] = [elapsed]
+        peaks['first_load'] = peak_allocation(AttendanceCore, storage_backend, copy_dir, shard_format)
+
+        latencies['load_data'] = [timed(core.load_data)[0] for _ in range(repeat)]
+        peaks['load_data'] = peak_allocation(core.load_data)
+
+        emp_ids = sorted(core.employees)
+        free = [emp_id for emp_id in emp_ids if not core.has_open_checkin(emp_id)[0]]
+        sample = rng.sample(free, min(len(free), repeat * 10))
+
+        latencies['check_in'] = [timed(core.check_in_employee, emp_id)[0] for emp_id in sample]
+        latencies['check_out'] = [timed(core.check_out_employee, emp_id)[0] for emp_id in sample]
+
+        latencies['has_open_checkin'] = [timed(core.has_open_checkin, emp_id)[0] for emp_id in emp_ids]
+
+        # كل حفظ بعد حركة جديدة (الشهر الحالي متغير) مثل الحفظ الفعلي في البرنامج
+        save_times = []
+        for emp_id in sample[:repeat]:
+            core.check_in_employee(emp_id)
+            save_times.append(timed(core.save_data)[0])
+            core.check_out_employee(emp_id)
+        latencies['save_data'] = save_times
+        core.check_in_employee(sample[0])
+        peaks['save_data'] = peak_allocation(core.save_data)
+        core.check_out_employee(sample[0])
+
+        # تواريخ عشوائية في كل الفترة: أول مرة لشهر قديم تشمل تحميله من التخزين
+        total_days = round(365.25 * years)
+        dates = [(end - timedelta(days=rng.randrange(total_days))).strftime('%Y-%m-%d')
+                 for _ in range(repeat)]
+        latencies['daily_report'] = [timed(core.daily_report_rows, date)[0] for date in dates]
+        peaks['daily_report'] = peak_allocation(core.daily_report_rows, dates[0])
+
+        monthly = []
+        for _ in range(repeat):
+            start = end - timedelta(days=rng.randrange(30, total_days))
+            monthly.append(timed(core.monthly_report_rows, rng.choice(emp_ids), start.strftime('%Y-%m-%d'),
+                                 (start + timedelta(days=30)).strftime('%Y-%m-%d'))[0])
+        latencies['monthly_report'] = monthly
+        peaks['monthly_report'] = peak_allocation(core.monthly_report_rows, emp_ids[0],
+                                                  (end - timedelta(days=30)).strftime('%Y-%m-%d'),
+                                                  end.strftime('%Y-%m-%d'))
+
+        core.storage.close()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+        shutil.rmtree(data_dir + '-copy', ignore_errors=True)
+
+    return {
+        'size': name,
+        'storage': storage_backend,
+        'shard_format': shard_format,
+        'dataset': dataset,
+        'generate_seconds': generate_time,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'operations': {op: dict(percentiles(latencies[op]), peak_mb=peaks.get(op))
+                       for op in OPERATIONS},
+    }
+
+
+def run_isolated(name, storage_backend, repeat, seed, shard_format='json'):
+    """تشغيل حجم في عملية Python جديدة وقراءة نتيجته"""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--one', name, '--storage', storage_backend,
+         '--repeat', str(repeat), '--seed', str(seed), '--shard-format', shard_format],
+        check=True, stdout=subprocess.PIPE, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output)
+
+
+def format_ms(seconds):
+    return f"{seconds * 1000:.4f}" if seconds < 0.01 else f"{seconds * 1000:.1f}"
+
+
+def print_result(result, baseline=None):
+    dataset = result['dataset']
+    print(f"\n== {result['size']} ({result['storage']}, {result.get('shard_format', 'json')}): {dataset['employees']} موظف، "
+          f"{dataset['days']} يوم، {dataset['sessions']} جلسة، RSS {result['peak_rss_mb']:.0f} MB")
+    print(f"{'operation':<18}{'n':>6}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'max ms':>11}{'peak MB':>9}"
+          + ('  p50 vs baseline' if baseline else ''))
+    for op, stats in result['operations'].items():
+        peak = f"{stats['peak_mb']:.1f}" if stats['peak_mb'] is not None else '-'
+        line = (f"{op:<18}{stats['count']:>6}{format_ms(stats['p50']):>11}{format_ms(stats['p95']):>11}"
+                f"{format_ms(stats['p99']):>11}{format_ms(stats['max']):>11}{peak:>9}")
+        if baseline and op in baseline['operations']:
+            line += f"  x{stats['p50'] / max(baseline['operations'][op]['p50'], 1e-9):.2f}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس أداء نواة الحضور على بيانات تجريبية")
+    parser.add_argument('--sizes', nargs='+', choices=sorted(SIZES), default=['small'])
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--shard-format', choices=['json', 'binary'], default='json')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="حفظ النتائج في ملف JSON")
+    parser.add_argument('--compare', help="ملف نتائج سابق للمقارنة")
+    parser.add_argument('--one', choices=sorted(SIZES), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.one:
+        json.dump(run_size(args.one, args.storage, args.repeat, args.seed, args.shard_format), sys.stdout)
+        return
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = {(result['size'], result['storage']): result for result in json.load(f)}
+
+    results = []
+    for name in args.sizes:
+        result = run_isolated(name, args.storage, args.repeat, args.seed, args.shard_format)
+        print_result(result, baseline.get((name, args.storage)))
+        results.append(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import json
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote, urlencode
+from urllib.request import Request, urlopen
+
+from core import AttendanceError
+
+
+class AttendanceClient:
+    """واجهة جهاز الحضور عبر خدمة الحضور المحلية (service.py).
+
+    نفس دوال AttendanceCore التي تستخدمها شاشة الحضور، فالواجهة لا تعرف هل البيانات محلية أم في الخدمة.
+    """
+
+    def __init__(self, base_url, timeout=5):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, path, body=None):
+        data = None
+        headers = {}
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        request = Request(self.base_url + path, data=data, headers=headers)
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except HTTPError as e:
+            try:
+                message = json.loads(e.read().decode('utf-8'))['error']
+            except (ValueError, KeyError):
+                message = f"خطأ من خدمة الحضور ({e.code})"
+            raise AttendanceError(message) from e
+        except (URLError, OSError) as e:
+            raise AttendanceError("تعذر الاتصال بخدمة الحضور") from e
+
+    def employee_status(self, emp_id):
+        """اسم الموظف وتاريخ حضوره المفتوح، أو None إذا لم يكن مسجلاً"""
+        return self._request('/employees/' + quote(emp_id, safe=''))['employee']
+
+    def search_employees(self, text, limit=10):
+        """(الكود، الاسم) للموظفين الذين يبدأ كودهم أو اسمهم بالنص"""
+        matches = self._request('/search?' + urlencode({'q': text, 'limit': limit}))['matches']
+        return [tuple(match) for match in matches]
+
+    def daily_rows(self, date):
+        """صفوف سجل الحضور اليومي (المعرف، القيم، الوسوم) لجدول العرض"""
+        return self._request('/daily?' + urlencode({'date': date}))['rows']
+
+    def check_in_employee(self, emp_id):
+        return self._request('/check_in', {'emp_id': emp_id})
+
+    def check_out_employee(self, emp_id):
+        return self._request('/check_out', {'emp_id': emp_id})
+
+    # ---- واجهة المدير ----
+
+    def employee_rows(self):
+        """صفوف قائمة الموظفين (المعرف، القيم، الوسوم) مع سعر الساعة"""
+        return rows_of(self._request('/employees')['rows'])
+
+    def on_site_rows(self):
+        """صفوف الموظفين المتواجدين الآن (حضور بدون انصراف)"""
+        return rows_of(self._request('/on_site')['rows'])
+
+    def create_employee(self, emp_id, name, department='', monthly_salary=0):
+        self._request('/add_employee', {'emp_id': emp_id, 'name': name, 'department': department,
+                                        'monthly_salary': monthly_salary})
+
+    def retire_employee(self, emp_id):
+        """حذف موظف؛ تعيد مدة الاسترجاع بالأيام"""
+        return self._request('/delete_employee', {'emp_id': emp_id})['purge_delay_days']
+
+    def last_deleted_employee(self):
+        """آخر موظف محذوف يمكن استرجاعه {'emp_id', 'name'}، أو None"""
+        return self._request('/deleted/last')['employee']
+
+    def restore_deleted_employee(self, emp_id):
+        self._request('/restore_employee', {'emp_id': emp_id})
+
+    def daily_report_rows(self, report_date, epochs=False):
+        rows = self._request('/reports/daily?' + urlencode({'date': report_date, 'epochs': int(epochs)}))['rows']
+        return None if rows is None else rows_of(rows)
+
+    def monthly_report_rows(self, emp_id, start_date, end_date, epochs=False):
+        result = self._request('/reports/monthly?' + urlencode({'emp_id': emp_id, 'start': start_date,
+                                                                'end': end_date, 'epochs': int(epochs)}))
+        return rows_of(result['rows']), result['total_hours']
+
+    def payroll_report_rows(self, start_date, end_date):
+        return rows_of(self._request('/reports/payroll?' + urlencode({'start': start_date, 'end': end_date}))['rows'])
+
+    def department_report_rows(self, granularity, date):
+        result = self._request('/reports/department?' + urlencode({'granularity': granularity, 'date': date}))
+        return rows_of(result['rows']), result['period']
+
+
+def rows_of(rows):
+    """صفوف جدول من JSON (قوائم) بنفس شكل صفوف النواة: (المعرف، القيم، الوسوم) كـ tuples"""
+    return [(iid, tuple(values), tuple(tags)) for iid, values, tags in rows]
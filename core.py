@@ -0,0 +1,691 @@
+import gc
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import ingest
+import servicelock
+import storage
+from indexes import DailyTotals, DepartmentRollup, EmployeeSearchIndex, SessionIndex, period_bounds, period_of
+from metrics import registry, timed
+from models import Session, intern_id, parse_time
+
+
+class AttendanceError(Exception):
+    """رفض عملية حضور/انصراف؛ الرسالة تُعرض للمستخدم كما هي"""
+
+
+def punch_result(op):
+    """نتيجة حركة للعرض أو للإرسال من الخدمة: التاريخ ووقت الحضور (ووقت الانصراف)"""
+    kind, date, emp_id, _, _, check_in, at = op
+    result = {'op': kind, 'emp_id': emp_id, 'date': date, 'check_in': check_in}
+    if kind == 'out':
+        result['check_out'] = at
+    return result
+
+
+class StatusLookup:
+    """استعلام سريع بدون تحميل الجلسات: حالة موظف والبحث فقط (أوامر status وsearch في سطر الأوامر).
+
+    يقرأ الموظفين فقط، والحضور المفتوح للموظف المطلوب عند الاستعلام (storage.open_session)، فلا يحول
+    جلسات الشهر الحالي ولا يبني فهارس الجلسات كما يفعل AttendanceCore. للقراءة فقط، فيعمل بجانب
+    البرنامج أو الخدمة.
+    """
+
+    def __init__(self, storage_backend='json', data_dir='data', shard_format='json'):
+        self.storage = storage.open_storage(storage_backend, data_dir, shard_format, read_only=True)
+        self.employees = self.storage.load_employees()
+        for emp_id in self.storage.load_tombstones():
+            self.employees.pop(emp_id, None)
+        self.search_index = None
+
+    def employee_status(self, emp_id):
+        """اسم الموظف وتاريخ حضوره المفتوح، أو None إذا لم يكن مسجلاً"""
+        if emp_id not in self.employees:
+            return None
+        session = self.storage.open_session(emp_id)
+        return {'emp_id': emp_id, 'name': self.employees[emp_id]['name'],
+                'open_date': session[0] if session else None}
+
+    def search_employees(self, text, limit=10):
+        """(الكود، الاسم) للموظفين الذين يبدأ كودهم أو اسمهم بالنص"""
+        if self.search_index is None:
+            self.search_index = EmployeeSearchIndex()
+            self.search_index.build(self.employees)
+        return [(emp_id, self.employees[emp_id]['name']) for emp_id in self.search_index.search(text, limit)]
+
+
+class AttendanceCore:
+    """حالة الحضور بدون واجهة: التخزين والفهارس وعمليات الحضور والانصراف والتقارير.
+
+    تستخدمها واجهة Tk مباشرة (تشغيل محلي) أو خدمة الحضور المحلية التي تخدم عدة أجهزة.
+    """
+
+    # مدة إمكانية استرجاع الموظف المحذوف قبل مسح سجلاته نهائياً
+    purge_delay_days = 7
+
+    # عدد أشهر الأرشيف التي تبقى في الذاكرة بعد التقارير (الأقدم استخداماً يخرج أولاً)
+    cold_months_limit = 12
+
+    def __init__(self, storage_backend='json', data_dir='data', shard_format='json', read_only=False):
+        # نوع التخزين: 'json' (ملفات JSON مع سجل حركات) أو 'sqlite' (قاعدة مفهرسة)
+        self.storage_backend = storage_backend
+        # تنسيق ملفات الأشهر في تخزين 'json': 'json' أو 'binary' (لقطة مضغوطة أسرع في التحميل)
+        self.shard_format = shard_format
+
+        if not read_only:
+            # الخدمة تملك الكتابة ما دامت تعمل: الحركات والتعديلات تُرسل لها بدلاً من فتح البيانات
+            url = servicelock.holder_url(data_dir)
+            if url is not None:
+                raise AttendanceError(f"خدمة الحضور تعمل على مجلد البيانات {data_dir} ({url})، "
+                                      "يجب الاتصال بها بدلاً من فتح البيانات للكتابة")
+
+        # إنشاء مجلد البيانات إذا لم يكن موجوداً
+        if not os.path.exists(data_dir) and not read_only:
+            os.makedirs(data_dir)
+
+        self.storage = storage.open_storage(self.storage_backend, data_dir, self.shard_format, read_only)
+
+        # يزيد مع كل تغيير في البيانات (حركة، حذف، استرجاع، إعادة تحميل): مفتاح للنتائج المحفوظة مؤقتاً
+        self.data_version = 0
+        # دوال تُستدعى بقائمة (التاريخ، الكود) بعد كل مجموعة حركات (مثل مزامنة Google Sheets)
+        self.change_hooks = []
+
+        # تحميل البيانات
+        self.load_data()
+
+    @timed('load_data')
+    def load_data(self):
+        """تحميل بيانات الموظفين وسجلات الحضور"""
+        # البصمة قبل القراءة: أي حفظ أثناء التحميل يظهر كتغيير في refresh التالي
+        self.storage_version = self.storage.data_version()
+        self.employees, self.attendance, self.loaded_months = self.storage.load()
+        self.data_version += 1
+        # أشهر الأرشيف المحملة في الذاكرة بترتيب آخر استخدام
+        self.cold_months = OrderedDict()
+
+        # الموظفون المحذوفون: مخفيون فوراً وسجلاتهم باقية حتى المسح في الخلفية
+        self.tombstones = self.storage.load_tombstones()
+        for emp_id in self.tombstones:
+            self.employees.pop(emp_id, None)
+        self.purging = set()
+
+        self.build_open_sessions()
+
+        self.session_index = SessionIndex()
+        self.session_index.build(self.attendance)
+
+        # تجميعات الأسابيع والأشهر والسنوات تُحدث من ملخصات الأيام
+        self.rollup = DepartmentRollup()
+        self.daily_totals = DailyTotals(self.rollup)
+        self.daily_totals.build(self.attendance)
+
+        self.search_index = EmployeeSearchIndex()
+        self.search_index.build(self.employees)
+
+    def refresh(self):
+        """إعادة التحميل إذا حفظت عملية أخرى بيانات جديدة (للقارئ فقط مثل لوحة الويب)؛ تعيد data_version"""
+        if self.storage.data_version() != self.storage_version:
+            self.load_data()
+        return self.data_version
+
+    @timed('ensure_loaded')
+    def ensure_loaded(self, start_date, end_date):
+        """تحميل أشهر الفترة المطلوبة من التخزين إذا لم تكن في الذاكرة"""
+        months = storage.months_between(start_date, end_date)
+        missing = [month for month in months if month not in self.loaded_months]
+        if missing:
+            self._load_months(missing)
+        self.touch_cold_months(months)
+
+    def _load_months(self, missing):
+        added = storage.new_attendance()
+        for date, employees in self.storage.load_months(missing).items():
+            for emp_id, records in employees.items():
+                if emp_id in self.purging:
+                    continue
+                existing = self.attendance[date][emp_id]
+                known = {record.start for record in existing}
+                for record in records:
+                    if record.start not in known:
+                        existing.append(record)
+                        added[date][emp_id].append(record)
+        self.loaded_months.update(missing)
+        if self.purging:
+            # المسح في الخلفية يتجاهل الأشهر المحملة، فتُكتب من الذاكرة بدون سجلاتهم
+            self.storage.forget_employees(self.purging)
+        self.session_index.add_attendance(added)
+        self.daily_totals.add_attendance({date: {emp_id: self.attendance[date][emp_id] for emp_id in employees}
+                                          for date, employees in added.items()})
+
+    def touch_cold_months(self, months):
+        """تسجيل استخدام أشهر الأرشيف وإخراج الأقدم استخداماً إذا زادت عن cold_months_limit"""
+        archived = self.storage.archive.months()
+        for month in months:
+            if month in archived and month in self.loaded_months:
+                self.cold_months[month] = True
+                self.cold_months.move_to_end(month)
+        excess = len(self.cold_months) - self.cold_months_limit
+        if excess > 0:
+            # أشهر التقرير الحالي والأشهر غير المحفوظة تبقى
+            keep = self.storage.pinned_months() | set(months)
+            self.unload_months([month for month in list(self.cold_months)[:excess] if month not in keep])
+
+    def unload_months(self, months):
+        """إخراج أشهر من الذاكرة والفهارس (تبقى على القرص وتُحمل من جديد عند الحاجة)"""
+        months = set(months)
+        if not months:
+            return
+        by_employee = {}
+        for date in [date for date in self.attendance if storage.month_of(date) in months]:
+            for emp_id in self.attendance[date]:
+                by_employee.setdefault(emp_id, set()).add(date)
+            del self.attendance[date]
+        for emp_id, dates in by_employee.items():
+            self.session_index.remove_dates(emp_id, dates)
+            self.daily_totals.remove_dates(emp_id, dates)
+        self.loaded_months.difference_update(months)
+        for month in months:
+            self.cold_months.pop(month, None)
+
+    def closed_years(self):
+        """السنوات الجاهزة للأرشفة: قبل السنة الحالية وليس بها جلسات مفتوحة"""
+        open_years = {date[:4] for date, _ in self.open_sessions.values()}
+        return [year for year in self.storage.archivable_years() if year not in open_years]
+
+    def release_archived(self):
+        """إخراج الأشهر المؤرشفة من الذاكرة بعد الأرشفة (ما عدا غير المحفوظة)"""
+        archived = self.storage.archive.months()
+        pinned = self.storage.pinned_months()
+        self.unload_months([month for month in self.loaded_months if month in archived and month not in pinned])
+
+    def archive_closed_years(self):
+        """أرشفة كل السنوات المغلقة الآن؛ تعيد فهارس الأرشيفات (واجهة Tk تؤرشف في الخلفية بدلاً من ذلك)"""
+        years = self.closed_years()
+        if not years:
+            return []
+        self.save_data()
+        indexes = [self.storage.archive_year(year) for year in years]
+        self.release_archived()
+        return indexes
+
+    def build_open_sessions(self):
+        """بناء فهرس جلسات الحضور المفتوحة لكل موظف (مرة واحدة عند التحميل)"""
+        self.open_sessions = {}
+        for date in sorted(self.attendance.keys()):
+            for emp_id, records in self.attendance[date].items():
+                if emp_id in self.tombstones:
+                    continue
+                for record in records:
+                    if record.is_open:
+                        self.open_sessions[emp_id] = (date, record)
+
+    def convert_old_data(self, old_data):
+        """تحويل البيانات القديمة إلى الهيكل الجديد"""
+        return storage.convert_old_data(old_data)
+
+    def calculate_hourly_rate(self, monthly_salary):
+        """حساب سعر الساعة من سعر الساعه"""
+        return round(monthly_salary / 26, 2)
+
+    def calculate_salary(self, hourly_rate, hours):
+        """حساب الراتب من سعر الساعة وعدد الساعات"""
+        return round(hourly_rate * hours, 2)
+
+    @timed('report_payroll')
+    def compute_payroll(self, start_date, end_date):
+        """حساب الساعات والرواتب لكل الموظفين في فترة (DataFrame بصف لكل موظف)"""
+        import payroll
+
+        self.ensure_loaded(start_date, end_date)
+
+        rates = {}
+        for emp_id, emp_data in self.employees.items():
+            monthly_salary = emp_data.get('monthly_salary', 0)
+            rates[emp_id] = self.calculate_hourly_rate(monthly_salary) if monthly_salary else 0
+
+        return payroll.compute_payroll(self.employees, self.session_index, start_date, end_date, rates)
+
+    def payroll_report_rows(self, start_date, end_date):
+        """صفوف كشف الرواتب (موظف لكل صف ثم الإجمالي)، أو قائمة فارغة إذا لم توجد ساعات في الفترة"""
+        result = self.compute_payroll(start_date, end_date)
+        if not result['hours'].gt(0).any():
+            return []
+
+        rows = [(row.emp_id, (row.emp_id, row.name, row.department, row.days, row.hours, row.salary), ())
+                for row in result.itertuples(index=False)]
+        rows.append((':total',
+            (f"الإجمالي ({start_date} إلى {end_date})", "", "",
+             int(result['days'].sum()), result['hours'].sum(), result['salary'].sum()),
+            ('total',)))
+        return rows
+
+    def period_days(self, emp_id, start_date_str, end_date_str, hourly_rate, epochs=False):
+        """أيام الموظف التي بها ساعات في الفترة: (التاريخ، أول حضور، آخر انصراف، الساعات، الراتب).
+
+        epochs: الحضور والانصراف كثوانٍ (أو None) كما في الجلسة بدلاً من نص العرض، للتصدير بأنواع حقيقية.
+        """
+        days = []
+        # المرور فقط على أيام الموظف الموجودة في الفترة بدلاً من كل أيام التقويم
+        for date_str in self.session_index.dates_between(emp_id, start_date_str, end_date_str):
+            day = self.daily_totals.get(emp_id, date_str)
+            if day is not None and day.hours > 0:
+                if epochs:
+                    first_checkin = day.first_check_in.start
+                    last_checkout = day.last_check_out.end if day.last_check_out else None
+                else:
+                    first_checkin = day.first_check_in.check_in
+                    last_checkout = day.last_check_out.check_out if day.last_check_out else ''
+                days.append((date_str, first_checkin, last_checkout, day.hours,
+                             self.calculate_salary(hourly_rate, day.hours)))
+        return days
+
+    @timed('save_data')
+    def save_data(self):
+        """حفظ كامل للموظفين والأشهر المتغيرة (واجهة Tk تنفذ الكتابة في الخلفية بدلاً من ذلك)"""
+        self.storage.save(self.employees, self.attendance)
+
+    @timed('report_daily')
+    def daily_report_rows(self, report_date, epochs=False):
+        """صفوف التقرير اليومي بالساعات والرواتب، أو None إذا لم توجد بيانات للتاريخ (epochs كما في period_days)"""
+        self.ensure_loaded(report_date, report_date)
+
+        if report_date not in self.attendance:
+            return None
+
+        rows = []
+        for emp_id, records in self.attendance[report_date].items():
+            if emp_id in self.employees:
+                emp_name = self.employees[emp_id]['name']
+                monthly_salary = self.employees[emp_id].get('monthly_salary', 0)
+                hourly_rate = self.calculate_hourly_rate(monthly_salary) if monthly_salary else 0
+                day = self.daily_totals.get(emp_id, report_date)
+                total_hours = day.hours if day else 0
+
+                for i, record in enumerate(records, 1):
+                    hours = record.hours
+                    salary = ''
+                    if hours is None:
+                        hours = ''
+                    else:
+                        salary = self.calculate_salary(hourly_rate, hours)
+
+                    if epochs:
+                        check_in, check_out = record.start, record.end
+                    else:
+                        check_in, check_out = record.check_in, record.check_out
+                    rows.append((f"{emp_id}:{i}",
+                        (f"{emp_id} ({i})", emp_name, check_in, check_out, hours, salary), ()))
+
+                if total_hours > 0:
+                    total_salary = self.calculate_salary(hourly_rate, total_hours)
+                    rows.append((f"{emp_id}:total",
+                        (f"{emp_id} (الإجمالي)", emp_name, "", "", total_hours, total_salary), ('total',)))
+        return rows
+
+    @timed('report_monthly')
+    def monthly_report_rows(self, emp_id, start_date_str, end_date_str, epochs=False):
+        """صفوف التقرير الشهري لموظف (يوم لكل صف ثم الإجمالي) وإجمالي ساعات الفترة (epochs كما في period_days)"""
+        if emp_id not in self.employees:
+            raise AttendanceError("كود الموظف غير مسجل")
+        self.ensure_loaded(start_date_str, end_date_str)
+
+        rows = []
+        monthly_salary = self.employees[emp_id].get('monthly_salary', 0)
+        hourly_rate = self.calculate_hourly_rate(monthly_salary) if monthly_salary else 0
+
+        total_period_hours = 0
+        total_period_salary = 0
+
+        for values in self.period_days(emp_id, start_date_str, end_date_str, hourly_rate, epochs):
+            total_period_hours += values[3]
+            total_period_salary += values[4]
+            rows.append((values[0], values, ()))
+
+        if total_period_hours > 0:
+            rows.append((':total',
+                (f"الإجمالي ({start_date_str} إلى {end_date_str})", "", "", total_period_hours, total_period_salary),
+                ('total',)))
+        return rows, total_period_hours
+
+    @timed('report_departments')
+    def department_report_rows(self, granularity, date_str):
+        """صفوف تكلفة الأقسام (قسم لكل صف ثم الإجمالي) للأسبوع أو الشهر أو السنة التي تشمل التاريخ، والفترة"""
+        period = period_of(date_str, granularity)
+        start_date, end_date = period_bounds(period, granularity)
+        self.ensure_loaded(start_date, end_date)
+
+        # القسم ← [الموظفون، الأيام، الساعات، الراتب]
+        departments = {}
+        for emp_id, (hours, days) in self.rollup.employees(granularity, period).items():
+            emp_data = self.employees.get(emp_id)
+            if emp_data is None:
+                continue
+            monthly_salary = emp_data.get('monthly_salary', 0)
+            hourly_rate = self.calculate_hourly_rate(monthly_salary) if monthly_salary else 0
+            totals = departments.setdefault(emp_data.get('department') or 'بدون قسم', [0, 0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += days
+            totals[2] += hours
+            # الراتب من رواتب الأيام (كل يوم مقرب على حدة) مثل كشف الرواتب والتقرير الشهري،
+            # وليس من ساعات الفترة كلها بسعر الساعة
+            totals[3] += sum(values[4] for values in self.period_days(emp_id, start_date, end_date, hourly_rate))
+
+        rows = []
+        for department, (count, days, hours, salary) in sorted(departments.items()):
+            rows.append((department, (department, count, days, round(hours, 2), round(salary, 2)), ()))
+        if rows:
+            rows.append((':total', (f"الإجمالي ({period})",
+                                    sum(totals[0] for totals in departments.values()),
+                                    sum(totals[1] for totals in departments.values()),
+                                    round(sum(totals[2] for totals in departments.values()), 2),
+                                    round(sum(totals[3] for totals in departments.values()), 2)), ('total',)))
+        return rows, period
+
+    def has_open_checkin(self, emp_id):
+        """التحقق من وجود حضور مفتوح (بدون انصراف) للموظف في أي يوم"""
+        session = self.open_sessions.get(emp_id)
+        if session:
+            return True, session[0]
+        return False, None
+
+    # ---- عمليات الجهاز (نفس الواجهة في AttendanceClient للتشغيل عبر الخدمة) ----
+
+    def employee_status(self, emp_id):
+        """اسم الموظف وتاريخ حضوره المفتوح، أو None إذا لم يكن مسجلاً"""
+        if emp_id not in self.employees:
+            return None
+        has_open, open_date = self.has_open_checkin(emp_id)
+        return {'emp_id': emp_id, 'name': self.employees[emp_id]['name'], 'open_date': open_date}
+
+    @timed('search')
+    def search_employees(self, text, limit=10):
+        """(الكود، الاسم) للموظفين الذين يبدأ كودهم أو اسمهم بالنص"""
+        return [(emp_id, self.employees[emp_id]['name']) for emp_id in self.search_index.search(text, limit)]
+
+    def daily_rows(self, date):
+        """صفوف سجل الحضور اليومي (المعرف، القيم، الوسوم) لجدول العرض"""
+        self.ensure_loaded(date, date)
+
+        rows = []
+        if date in self.attendance:
+            for emp_id, records in self.attendance[date].items():
+                if emp_id in self.employees:
+                    emp_name = self.employees[emp_id]['name']
+                    day = self.daily_totals.get(emp_id, date)
+                    total_hours = day.hours if day else 0
+
+                    for i, record in enumerate(records, 1):
+                        hours = record.hours
+                        if hours is None:
+                            hours = ''
+
+                        rows.append((f"{emp_id}:{i}",
+                            (f"{emp_id} ({i})", emp_name, record.check_in, record.check_out, hours), ()))
+
+                    if total_hours > 0:
+                        rows.append((f"{emp_id}:total",
+                            (f"{emp_id} (الإجمالي)", emp_name, "", "", total_hours), ('total',)))
+        return rows
+
+    def apply_check_in(self, emp_id, now=None):
+        """تسجيل حضور في الذاكرة فقط (الحفظ على القرص مسؤولية المستدعي)؛ تعيد الحركة"""
+        if not emp_id:
+            raise AttendanceError("يرجى إدخال كود الموظف")
+
+        if emp_id not in self.employees:
+            raise AttendanceError("كود الموظف غير مسجل")
+
+        has_open, open_date = self.has_open_checkin(emp_id)
+        if has_open:
+            raise AttendanceError(f"الموظف متحضر بالفعل من تاريخ {open_date}\nيجب تسجيل الانصراف أولاً")
+
+        now = now or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        op = ('in', now[:10], intern_id(emp_id), Session(now), parse_time(now), now, now)
+        self.apply_ops([op])
+        return op
+
+    def apply_check_out(self, emp_id, now=None):
+        """تسجيل انصراف في الذاكرة فقط (الحفظ على القرص مسؤولية المستدعي)؛ تعيد الحركة"""
+        if not emp_id:
+            raise AttendanceError("يرجى إدخال كود الموظف")
+
+        if emp_id not in self.employees:
+            raise AttendanceError("كود الموظف غير مسجل")
+
+        if emp_id not in self.open_sessions:
+            raise AttendanceError("لا يوجد حضور مسجل يحتاج إلى انصراف")
+
+        found_date, found_record = self.open_sessions[emp_id]
+        now = now or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        op = ('out', found_date, intern_id(emp_id), found_record, parse_time(now), found_record.check_in, now)
+        self.apply_ops([op])
+        return op
+
+    @timed('check_in')
+    def check_in_employee(self, emp_id):
+        """تسجيل حضور وحفظه فوراً"""
+        op = self.apply_check_in(emp_id)
+        self.storage.record_check_in(op[1], op[2], op[3])
+        return punch_result(op)
+
+    @timed('check_out')
+    def check_out_employee(self, emp_id):
+        """تسجيل انصراف وحفظه فوراً"""
+        op = self.apply_check_out(emp_id)
+        self.storage.record_check_out(op[1], op[2], op[3])
+        return punch_result(op)
+
+    def apply_ops(self, ops):
+        """تطبيق حركات (النوع، التاريخ، الكود، الجلسة، الوقت، ...) على البيانات والفهارس"""
+        check_ins = 0
+        self.data_version += 1
+        for kind, date, emp_id, record, at, _, _ in ops:
+            if kind == 'in':
+                check_ins += 1
+                self.attendance[date][emp_id].append(record)
+                self.open_sessions[emp_id] = (date, record)
+                self.session_index.add(emp_id, date, record)
+                self.daily_totals.check_in(date, emp_id, record)
+            else:
+                record.end = at
+                self.open_sessions.pop(emp_id, None)
+                self.daily_totals.check_out(date, emp_id, record)
+        if self.change_hooks:
+            keys = [(date, emp_id) for _, date, emp_id, _, _, _, _ in ops]
+            for hook in self.change_hooks:
+                hook(keys)
+        return check_ins
+
+    def revert_ops(self, ops):
+        """إلغاء حركات طُبقت بـ apply_ops ولم تُحفظ (فشل الكتابة على القرص)، بالترتيب العكسي"""
+        self.data_version += 1
+        for kind, date, emp_id, record, _, _, _ in reversed(ops):
+            records = self.attendance[date][emp_id]
+            if kind == 'in':
+                for position in range(len(records) - 1, -1, -1):
+                    if records[position] is record:
+                        del records[position]
+                        break
+                self.open_sessions.pop(emp_id, None)
+                self.session_index.remove(emp_id, date, record)
+                if not records:
+                    del self.attendance[date][emp_id]
+                    if not self.attendance[date]:
+                        del self.attendance[date]
+                    self.daily_totals.remove_dates(emp_id, [date])
+                    continue
+            else:
+                record.end = None
+                self.open_sessions[emp_id] = (date, record)
+            self.daily_totals.refresh(date, emp_id, records)
+        if self.change_hooks:
+            keys = [(date, emp_id) for _, date, emp_id, _, _, _, _ in ops]
+            for hook in self.change_hooks:
+                hook(keys)
+
+    @timed('import_punches')
+    def import_punches(self, path):
+        """استيراد ملف بصمات (CSV/JSONL) كدفعة واحدة مع حفظ واحد"""
+        # إيقاف جامع المهملات أثناء إنشاء مئات الآلاف من الكائنات الصغيرة
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._import_punches(path)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def _import_punches(self, path):
+        rows = list(ingest.read_punch_file(path))
+        valid, invalid = ingest.validate_punches(rows, self.employees)
+
+        # الأشهر التي تغطيها البصمات يجب أن تكون في الذاكرة قبل المطابقة
+        if valid:
+            days = [punch[3][:10] for punch in valid]
+            self.ensure_loaded(min(days), max(days))
+
+        ops, rejected, duplicates = ingest.pair_punches(valid, self.open_sessions, self.attendance)
+        rejected = sorted(invalid + rejected, key=lambda row: row[0])
+        registry.count('imported_rows', len(rows))
+        registry.count('rejected_rows', len(rejected))
+
+        check_ins = self.apply_ops(ops)
+
+        if ops:
+            self.storage.record_punches(ops)
+
+        return {
+            'rows': len(rows),
+            'check_ins': check_ins,
+            'check_outs': len(ops) - check_ins,
+            'duplicates': duplicates,
+            'rejected': rejected,
+        }
+
+    def save_employees(self):
+        """حفظ الموظفين والمحذوفين (واجهة Tk تنفذ الكتابة في الخلفية بدلاً من ذلك)"""
+        self.storage.save_employees(dict(self.employees), dict(self.tombstones))
+
+    def remove_employee(self, emp_id):
+        """حذف الموظف من الذاكرة فوراً مع الاحتفاظ بسجلاته حتى المسح (purge_due)؛ الحفظ على المستدعي"""
+        employee = self.employees.pop(emp_id)
+        self.search_index.remove(emp_id, employee)
+        self.open_sessions.pop(emp_id, None)
+        self.data_version += 1
+        self.tombstones[emp_id] = {'employee': employee,
+                                   'deleted_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+
+    def restore_employee(self, emp_id):
+        """استرجاع موظف محذوف لم تُمسح سجلاته بعد (مع حضوره المفتوح إن وجد)"""
+        if emp_id not in self.tombstones or emp_id in self.purging:
+            raise AttendanceError("لا يمكن استرجاع هذا الموظف")
+        employee = self.tombstones.pop(emp_id)['employee']
+        self.data_version += 1
+        self.employees[emp_id] = employee
+        self.search_index.add(emp_id, employee)
+
+        # الأشهر التي بها جلسات مفتوحة محملة دائماً، فآخر جلسة في الفهرس هي الحضور المفتوح إن وجد
+        sessions = self.session_index.by_employee.get(emp_id)
+        if sessions and sessions.records and sessions.records[-1].is_open:
+            self.open_sessions[emp_id] = (sessions.dates[-1], sessions.records[-1])
+
+    # ---- عمليات المدير (نفس الواجهة في AttendanceClient لواجهة المدير على جهاز متصل بالخدمة) ----
+
+    def employee_rows(self):
+        """صفوف قائمة الموظفين (المعرف، القيم، الوسوم) مع سعر الساعة"""
+        rows = []
+        for emp_id, emp_data in self.employees.items():
+            monthly_salary = emp_data.get('monthly_salary', 0)
+            hourly_rate = self.calculate_hourly_rate(monthly_salary) if monthly_salary else 0
+            rows.append((emp_id, (emp_id, emp_data['name'], emp_data.get('department', ''),
+                                  monthly_salary, hourly_rate), ()))
+        return rows
+
+    def on_site_rows(self):
+        """صفوف الموظفين المتواجدين الآن (حضور بدون انصراف) بترتيب وقت الحضور"""
+        rows = []
+        for emp_id, (date, record) in sorted(self.open_sessions.items(), key=lambda item: item[1][1].start):
+            emp_data = self.employees.get(emp_id, {})
+            rows.append((emp_id, (emp_id, emp_data.get('name', ''), emp_data.get('department', ''),
+                                  record.check_in), ()))
+        return rows
+
+    def create_employee(self, emp_id, name, department='', monthly_salary=0):
+        """إضافة موظف جديد وحفظ الموظفين"""
+        if not emp_id or not name:
+            raise AttendanceError("يرجى إدخال كود الموظف واسمه")
+        if emp_id in self.employees:
+            raise AttendanceError("كود الموظف مسجل مسبقاً")
+        if emp_id in self.tombstones:
+            raise AttendanceError("كود الموظف محذوف ولم تُمسح سجلاته بعد، يمكن استرجاعه بدلاً من ذلك")
+
+        self.employees[emp_id] = {
+            'name': name,
+            'department': department,
+            'monthly_salary': monthly_salary
+        }
+        self.search_index.add(emp_id, self.employees[emp_id])
+        self.data_version += 1
+        self.save_employees()
+
+    def retire_employee(self, emp_id):
+        """حذف موظف (قابل للاسترجاع خلال purge_delay_days) وحفظ الموظفين؛ تعيد مدة الاسترجاع بالأيام"""
+        if emp_id not in self.employees:
+            raise AttendanceError("كود الموظف غير مسجل")
+        self.remove_employee(emp_id)
+        self.save_employees()
+        return self.purge_delay_days
+
+    def last_deleted_employee(self):
+        """آخر موظف محذوف يمكن استرجاعه {'emp_id', 'name'}، أو None"""
+        candidates = [emp_id for emp_id in self.tombstones if emp_id not in self.purging]
+        if not candidates:
+            return None
+        emp_id = max(candidates, key=lambda emp_id: self.tombstones[emp_id]['deleted_at'])
+        return {'emp_id': emp_id, 'name': self.tombstones[emp_id]['employee']['name']}
+
+    def restore_deleted_employee(self, emp_id):
+        """استرجاع موظف محذوف وحفظ الموظفين"""
+        self.restore_employee(emp_id)
+        self.save_employees()
+
+    def due_tombstones(self, now=None):
+        """أكواد المحذوفين الذين انتهت مدة استرجاعهم ولم يبدأ مسحهم"""
+        cutoff = ((now or datetime.now()) - timedelta(days=self.purge_delay_days)).strftime('%Y-%m-%d %H:%M:%S')
+        return [emp_id for emp_id, tombstone in self.tombstones.items()
+                if tombstone['deleted_at'] <= cutoff and emp_id not in self.purging]
+
+    def drop_history(self, emp_ids):
+        """حذف سجلات موظفين من الذاكرة والفهارس (أيامهم فقط من الفهرس بدلاً من المرور على كل الأيام)"""
+        self.purging.update(emp_ids)
+        self.data_version += 1
+        for emp_id in emp_ids:
+            sessions = self.session_index.by_employee.get(emp_id)
+            for date in set(sessions.dates) if sessions else ():
+                day = self.attendance.get(date)
+                if day is not None:
+                    day.pop(emp_id, None)
+                    if not day:
+                        del self.attendance[date]
+            self.session_index.remove_employee(emp_id)
+            self.daily_totals.remove_employee(emp_id)
+        self.storage.forget_employees(emp_ids)
+
+    def finish_purge(self, emp_ids):
+        """بعد مسح السجلات من التخزين: حفظ الأشهر المحملة ثم إزالة المحذوفين نهائياً"""
+        for emp_id in emp_ids:
+            self.tombstones.pop(emp_id, None)
+        self.purging.difference_update(emp_ids)
+        self.save_data()
+        self.save_employees()
+
+    @timed('purge_employees')
+    def purge_due(self):
+        """مسح سجلات كل المحذوفين المستحقين الآن (للخدمة وسطر الأوامر؛ واجهة Tk تمسحها في الخلفية)"""
+        due = self.due_tombstones()
+        if due:
+            self.drop_history(due)
+            self.storage.purge_employees(due)
+            self.finish_purge(due)
+        return due
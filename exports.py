@@ -0,0 +1,206 @@
+from datetime import date as date_type
+from datetime import datetime, timedelta
+
+from metrics import timed
+from models import DATE_FORMAT, format_time
+
+EPOCH = datetime(1970, 1, 1)
+
+# رموز غير مسموحة في أسماء أوراق Excel
+INVALID_TITLE_CHARS = set('[]:*?/\\')
+
+# عدد الصفوف بين كل تحديث لنسبة التقدم
+PROGRESS_EVERY = 200
+
+# أعمدة التقارير التي تُكتب في Excel كتاريخ أو وقت حقيقي؛ باقي الأعمدة (الأسماء، الأقسام، الأكواد)
+# تبقى كما هي حتى لو كان نصها يشبه تاريخاً
+DATE_COLUMNS = {'التاريخ'}
+TIME_COLUMNS = {'وقت الحضور', 'وقت الانصراف'}
+
+# نوع التقرير ← (عناوين الأعمدة، عرض الأعمدة في PDF)
+REPORT_HEADERS = {
+    'daily': (['كود الموظف', 'اسم الموظف', 'وقت الحضور', 'وقت الانصراف', 'الساعات', 'الراتب'],
+              [25, 35, 35, 35, 25, 25]),
+    'monthly': (['التاريخ', 'وقت الحضور', 'وقت الانصراف', 'الساعات', 'الراتب'], [35, 35, 35, 25, 25]),
+    'payroll': (['كود الموظف', 'اسم الموظف', 'القسم', 'الأيام', 'الساعات', 'الراتب'], [25, 40, 35, 20, 25, 30]),
+    'department': (['القسم', 'الموظفون', 'الأيام', 'الساعات', 'الراتب'], [50, 30, 30, 30, 35]),
+}
+
+
+@timed('export_pdf')
+def write_pdf_report(path, title, headers, col_widths, rows, progress=None):
+    """كتابة تقرير PDF من صفوف جاهزة (تعمل في الخيط الخلفي بدون أي عناصر Tk)"""
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+
+    try:
+        pdf.add_font('Arial', '', 'arial.ttf', uni=True)
+        pdf.set_font('Arial', '', 12)
+    except:
+        pdf.set_font('Arial', '', 12)
+
+    pdf.cell(0, 10, title, 0, 1, 'C')
+    pdf.ln(10)
+
+    for i, header in enumerate(headers):
+        pdf.cell(col_widths[i], 10, header, 1, 0, 'C')
+    pdf.ln()
+
+    for n, values in enumerate(rows, 1):
+        if "الإجمالي" in str(values[0]):
+            continue
+
+        for i, value in enumerate(values):
+            pdf.cell(col_widths[i], 10, str(value), 1, 0, 'C')
+        pdf.ln()
+
+        if progress is not None and n % PROGRESS_EVERY == 0:
+            progress(n / len(rows))
+
+    for values in rows:
+        if "الإجمالي" in str(values[0]):
+            pdf.set_font('Arial', 'B', 12)
+            pdf.cell(sum(col_widths[:-2]), 10, "الإجمالي:", 1, 0, 'R')
+            pdf.cell(col_widths[-2], 10, str(values[-2]), 1, 0, 'C')
+            pdf.cell(col_widths[-1], 10, str(values[-1]), 1, 0, 'C')
+            pdf.set_font('Arial', '', 12)
+            break
+
+    if progress is not None:
+        progress(1.0, "جاري حفظ الملف...")
+    pdf.output(path)
+    return path
+
+
+def excel_value(value, column):
+    """نوع خلية حقيقي لقيمة من صفوف النواة (epochs=True): أوقات الجلسات وتواريخ الأيام إلى datetime/date"""
+    if column in TIME_COLUMNS:
+        return epoch_to_datetime(value)
+    if column in DATE_COLUMNS and isinstance(value, str):
+        try:
+            return datetime.strptime(value, DATE_FORMAT).date()
+        except ValueError:
+            return value
+    return value
+
+
+def display_values(values, columns):
+    """قيم صف من صفوف النواة (epochs=True) للعرض في الجدول: أعمدة الوقت كنص"""
+    return tuple(format_time(value) if column in TIME_COLUMNS else value for value, column in zip(values, columns))
+
+
+def epoch_to_datetime(value):
+    """وقت الجلسة (ثوانٍ) كـ datetime للخلية، والقيم غير المقروءة تبقى نصاً"""
+    if isinstance(value, int):
+        return EPOCH + timedelta(seconds=value)
+    return format_time(value)
+
+
+def typed_row(sheet, values):
+    """صف للإضافة في ورقة write_only مع تنسيق خلايا التاريخ والوقت"""
+    from openpyxl.cell import WriteOnlyCell
+
+    row = []
+    for value in values:
+        if isinstance(value, datetime):
+            cell = WriteOnlyCell(sheet, value=value)
+            cell.number_format = 'yyyy-mm-dd hh:mm:ss'
+            row.append(cell)
+        elif isinstance(value, date_type):
+            cell = WriteOnlyCell(sheet, value=value)
+            cell.number_format = 'yyyy-mm-dd'
+            row.append(cell)
+        else:
+            row.append(value)
+    return row
+
+
+@timed('export_excel')
+def write_excel_report(path, columns, rows, progress=None):
+    """كتابة تقرير Excel بتدفق الصفوف مباشرة لملف write_only (بدون DataFrame) بأنواع خلايا حقيقية"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("التقرير")
+    sheet.append(columns)
+
+    for n, values in enumerate(rows, 1):
+        sheet.append(typed_row(sheet, [excel_value(value, column) for value, column in zip(values, columns)]))
+        if progress is not None and n % PROGRESS_EVERY == 0:
+            progress(n / len(rows))
+
+    if progress is not None:
+        progress(1.0, "جاري حفظ الملف...")
+    workbook.save(path)
+    return path
+
+
+def sheet_title(emp_id, name, used):
+    """اسم ورقة صالح في Excel (بدون رموز ممنوعة، 31 حرفاً) وغير مكرر"""
+    title = ''.join('_' if char in INVALID_TITLE_CHARS else char for char in f"{emp_id} {name}")
+    title = title.strip("' ")[:31] or str(len(used) + 1)
+    candidate = title
+    n = 1
+    while candidate.lower() in used:
+        n += 1
+        suffix = f" ({n})"
+        candidate = title[:31 - len(suffix)] + suffix
+    used.add(candidate.lower())
+    return candidate
+
+
+def employee_sessions(session_index, emp_id, start_date, end_date):
+    """(التاريخ، الجلسة) للموظف في أيام الفترة من الفهرس الزمني (مراجع فقط بدون نسخ البيانات).
+
+    الاختيار بتاريخ اليوم المسجل مثل التقرير الشهري، فجلسة بعد منتصف الليل تتبع يومها.
+    """
+    return session_index.sessions_between(emp_id, start_date, end_date)
+
+
+@timed('export_workbook')
+def write_employees_workbook(path, employees, progress=None):
+    """ملف Excel لكل الموظفين: ورقة ملخص ثم ورقة لكل موظف بجلساته في الفترة.
+
+    employees: قائمة (الكود، البيانات، سعر الساعة، الجلسات) حيث الجلسات من employee_sessions.
+    الصفوف تُكتب بالتدفق في ملف write_only فالذاكرة لا تزيد مع عدد الصفوف المكتوبة.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    summary = workbook.create_sheet("الملخص")
+    summary.append(['كود الموظف', 'اسم الموظف', 'القسم', 'سعر الساعة', 'الأيام', 'الساعات', 'الراتب'])
+    used = {"الملخص"}
+
+    for n, (emp_id, data, hourly_rate, sessions) in enumerate(employees, 1):
+        sheet = workbook.create_sheet(sheet_title(emp_id, data.get('name', ''), used))
+        sheet.append(['التاريخ', 'وقت الحضور', 'وقت الانصراف', 'الساعات', 'الراتب'])
+
+        # الإجمالي بنفس طريقة التقرير الشهري: راتب كل يوم من إجمالي ساعاته
+        day_hours = {}
+        for date, record in sessions:
+            hours = record.hours
+            salary = round(hourly_rate * hours, 2) if hours is not None else None
+            if hours is not None:
+                day_hours[date] = day_hours.get(date, 0) + hours
+            sheet.append(typed_row(sheet, [
+                datetime.strptime(date, DATE_FORMAT).date(),
+                epoch_to_datetime(record.start),
+                epoch_to_datetime(record.end) if record.end is not None else None,
+                hours, salary]))
+
+        worked = [hours for hours in day_hours.values() if hours > 0]
+        total_hours = round(sum(worked), 2)
+        total_salary = round(sum(round(hourly_rate * hours, 2) for hours in worked), 2)
+        sheet.append(["الإجمالي", None, None, total_hours, total_salary])
+        summary.append([emp_id, data.get('name', ''), data.get('department', ''), hourly_rate,
+                        len(worked), total_hours, total_salary])
+
+        if progress is not None and n % 10 == 0:
+            progress(n / len(employees))
+
+    if progress is not None:
+        progress(1.0, "جاري حفظ الملف...")
+    workbook.save(path)
+    return path
@@ -0,0 +1,351 @@
+import calendar
+from bisect import bisect_left
+from datetime import date as date_type
+from datetime import timedelta
+
+from models import DATE_FORMAT, to_epoch
+
+# مستويات تجميع تقارير الأقسام
+GRANULARITIES = ('week', 'month', 'year')
+
+
+def session_start(date, record):
+    """مفتاح ترتيب الجلسة: وقت الحضور، أو بداية يومها إذا تعذرت قراءة الوقت"""
+    if isinstance(record.start, int):
+        return record.start
+    return to_epoch(date, DATE_FORMAT)
+
+
+class EmployeeSessions:
+    """جلسات موظف واحد مرتبة زمنياً في مصفوفات متوازية قابلة للبحث الثنائي"""
+
+    __slots__ = ('starts', 'dates', 'records')
+
+    def __init__(self):
+        self.starts = []
+        self.dates = []
+        self.records = []
+
+    def add(self, start, date, record):
+        if not self.starts or start >= self.starts[-1]:
+            # الحالة الشائعة: الجلسة الجديدة هي الأحدث
+            position = len(self.starts)
+        else:
+            position = bisect_left(self.starts, start)
+        self.starts.insert(position, start)
+        self.dates.insert(position, date)
+        self.records.insert(position, record)
+
+    def between(self, start, end):
+        """حدود الشريحة التي تبدأ جلساتها في الفترة [start, end)"""
+        return bisect_left(self.starts, start), bisect_left(self.starts, end)
+
+
+class SessionIndex:
+    """فهرس زمني للجلسات لكل موظف للاستعلام عن فترة بدون المرور على كل الأيام"""
+
+    def __init__(self):
+        self.by_employee = {}
+
+    def build(self, attendance):
+        """بناء الفهرس بالكامل من سجلات الحضور"""
+        self.by_employee = {}
+        self.add_attendance(attendance)
+
+    def add_attendance(self, attendance):
+        """إضافة مجموعة سجلات (مثلاً أشهر تم تحميلها لاحقاً) للفهرس"""
+        pending = {}
+        for date, employees in attendance.items():
+            for emp_id, records in employees.items():
+                items = pending.setdefault(emp_id, [])
+                for record in records:
+                    items.append((session_start(date, record), date, record))
+
+        for emp_id, items in pending.items():
+            sessions = self.by_employee.setdefault(emp_id, EmployeeSessions())
+            items.extend(zip(sessions.starts, sessions.dates, sessions.records))
+            items.sort(key=lambda item: item[0])
+            sessions.starts = [item[0] for item in items]
+            sessions.dates = [item[1] for item in items]
+            sessions.records = [item[2] for item in items]
+
+    def add(self, emp_id, date, record):
+        """إضافة جلسة جديدة (عند تسجيل الحضور)"""
+        sessions = self.by_employee.setdefault(emp_id, EmployeeSessions())
+        sessions.add(session_start(date, record), date, record)
+
+    def remove(self, emp_id, date, record):
+        """حذف جلسة واحدة (مثلاً حضور أُلغي لأن حفظه فشل)"""
+        sessions = self.by_employee.get(emp_id)
+        if sessions is None:
+            return
+        for position in range(bisect_left(sessions.starts, session_start(date, record)), len(sessions.records)):
+            if sessions.records[position] is record:
+                del sessions.starts[position]
+                del sessions.dates[position]
+                del sessions.records[position]
+                break
+        if not sessions.records:
+            del self.by_employee[emp_id]
+
+    def remove_employee(self, emp_id):
+        self.by_employee.pop(emp_id, None)
+
+    def remove_dates(self, emp_id, dates):
+        """حذف جلسات أيام محددة لموظف (مثلاً أشهر أرشيف خرجت من الذاكرة)"""
+        sessions = self.by_employee.get(emp_id)
+        if sessions is None:
+            return
+        items = [item for item in zip(sessions.starts, sessions.dates, sessions.records) if item[1] not in dates]
+        if not items:
+            del self.by_employee[emp_id]
+            return
+        sessions.starts = [item[0] for item in items]
+        sessions.dates = [item[1] for item in items]
+        sessions.records = [item[2] for item in items]
+
+    def sessions_between(self, emp_id, start_date, end_date):
+        """(التاريخ، الجلسة) للموظف في الأيام بين تاريخين (شاملة) بالترتيب الزمني"""
+        sessions = self.by_employee.get(emp_id)
+        if sessions is None:
+            return []
+
+        # الاختيار بمفتاح التاريخ: نافذة أوسع بيوم من كل جهة لأن جلسة بعد منتصف الليل قد تُسجل في اليوم السابق
+        lo, hi = sessions.between(to_epoch(start_date, DATE_FORMAT) - 86400,
+                                  to_epoch(end_date, DATE_FORMAT) + 2 * 86400)
+        return [(date, record) for date, record in zip(sessions.dates[lo:hi], sessions.records[lo:hi])
+                if start_date <= date <= end_date]
+
+    def dates_between(self, emp_id, start_date, end_date):
+        """أيام الموظف التي بها جلسات بين تاريخين (شاملة) بالترتيب الزمني"""
+        dates = []
+        seen = set()
+        for date, _ in self.sessions_between(emp_id, start_date, end_date):
+            if date not in seen:
+                seen.add(date)
+                dates.append(date)
+        return dates
+
+
+class DayTotals:
+    """ملخص يوم موظف: إجمالي الساعات وأول حضور وآخر انصراف وعدد الجلسات"""
+
+    __slots__ = ('hours', 'first_check_in', 'last_check_out', 'sessions')
+
+    def __init__(self):
+        self.hours = 0
+        self.first_check_in = None
+        self.last_check_out = None
+        self.sessions = 0
+
+    def add(self, record):
+        if self.sessions == 0:
+            self.first_check_in = record
+        self.sessions += 1
+        if record.end is not None:
+            self.close(record)
+
+    def close(self, record):
+        hours = record.hours
+        if hours is not None:
+            self.hours += hours
+        self.last_check_out = record
+
+
+class DailyTotals:
+    """ملخصات (التاريخ، الموظف) محدثة تدريجياً مع كل حركة بدلاً من إعادة الحساب"""
+
+    def __init__(self, rollup=None):
+        self.by_employee = {}
+        # تجميعات الفترات (DepartmentRollup) تُحدث مع كل تغير في ساعات يوم
+        self.rollup = rollup
+
+    def build(self, attendance):
+        """بناء الملخصات بالكامل من سجلات الحضور"""
+        self.by_employee = {}
+        if self.rollup is not None:
+            self.rollup.clear()
+        self.add_attendance(attendance)
+
+    def add_attendance(self, attendance):
+        """إعادة حساب أيام محددة (مثلاً أشهر تم تحميلها لاحقاً)"""
+        for date, employees in attendance.items():
+            for emp_id, records in employees.items():
+                self.refresh(date, emp_id, records)
+
+    def refresh(self, date, emp_id, records):
+        totals = DayTotals()
+        for record in records:
+            totals.add(record)
+        days = self.by_employee.setdefault(emp_id, {})
+        previous = days.get(date)
+        days[date] = totals
+        self._changed(emp_id, date, previous.hours if previous else 0, totals.hours)
+
+    def get(self, emp_id, date):
+        return self.by_employee.get(emp_id, {}).get(date)
+
+    def check_in(self, date, emp_id, record):
+        days = self.by_employee.setdefault(emp_id, {})
+        totals = days.get(date)
+        if totals is None:
+            totals = days[date] = DayTotals()
+        hours = totals.hours
+        totals.add(record)
+        self._changed(emp_id, date, hours, totals.hours)
+
+    def check_out(self, date, emp_id, record):
+        totals = self.get(emp_id, date)
+        if totals is not None:
+            hours = totals.hours
+            totals.close(record)
+            self._changed(emp_id, date, hours, totals.hours)
+
+    def remove_employee(self, emp_id):
+        days = self.by_employee.pop(emp_id, None)
+        if days:
+            for date, totals in days.items():
+                self._changed(emp_id, date, totals.hours, 0)
+
+    def remove_dates(self, emp_id, dates):
+        days = self.by_employee.get(emp_id)
+        if days is not None:
+            for date in dates:
+                totals = days.pop(date, None)
+                if totals is not None:
+                    self._changed(emp_id, date, totals.hours, 0)
+
+    def _changed(self, emp_id, date, old_hours, new_hours):
+        if self.rollup is not None and old_hours != new_hours:
+            self.rollup.change(emp_id, date, old_hours, new_hours)
+
+
+def period_of(date, granularity):
+    """الفترة التي تشمل التاريخ: '2024-W07' أو '2024-02' أو '2024'"""
+    if granularity == 'month':
+        return date[:7]
+    if granularity == 'year':
+        return date[:4]
+    year, week, _ = date_type.fromisoformat(date).isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def period_bounds(period, granularity):
+    """أول وآخر تاريخ في الفترة"""
+    if granularity == 'month':
+        year, month = int(period[:4]), int(period[5:7])
+        return f'{period}-01', f'{period}-{calendar.monthrange(year, month)[1]:02d}'
+    if granularity == 'year':
+        return f'{period}-01-01', f'{period}-12-31'
+    monday = date_type.fromisocalendar(int(period[:4]), int(period[6:]), 1)
+    return monday.isoformat(), (monday + timedelta(days=6)).isoformat()
+
+
+class DepartmentRollup:
+    """ساعات وأيام عمل كل موظف لكل أسبوع وشهر وسنة، تُحدث تدريجياً من DailyTotals مع كل انصراف.
+
+    القسم يُقرأ من بيانات الموظف عند الاستعلام، فنقل موظف لقسم آخر لا يحتاج إعادة بناء.
+    """
+
+    def __init__(self):
+        # (المستوى، الفترة) ← الكود ← [الساعات، الأيام]
+        self.periods = {}
+        self._keys = {}
+
+    def clear(self):
+        self.periods = {}
+
+    def keys(self, date):
+        keys = self._keys.get(date)
+        if keys is None:
+            keys = self._keys[date] = [(granularity, period_of(date, granularity)) for granularity in GRANULARITIES]
+        return keys
+
+    def change(self, emp_id, date, old_hours, new_hours):
+        """تغير ساعات يوم موظف من old_hours إلى new_hours"""
+        days = (new_hours > 0) - (old_hours > 0)
+        for key in self.keys(date):
+            cells = self.periods.setdefault(key, {})
+            cell = cells.get(emp_id)
+            if cell is None:
+                cell = cells[emp_id] = [0.0, 0]
+            cell[0] += new_hours - old_hours
+            cell[1] += days
+            if cell[1] <= 0:
+                del cells[emp_id]
+
+    def employees(self, granularity, period):
+        """الكود ← [الساعات، الأيام] للموظفين الذين عملوا في الفترة"""
+        return self.periods.get((granularity, period), {})
+
+
+# تشكيل وتطويل الحروف العربية (يتم تجاهلها في البحث)
+ARABIC_MARKS = dict.fromkeys(list(range(0x064B, 0x0653)) + [0x0640, 0x0670])
+ARABIC_LETTERS = str.maketrans({'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا', 'ى': 'ي', 'ة': 'ه', 'ؤ': 'و', 'ئ': 'ي'})
+
+
+def normalize_search_text(text):
+    """توحيد النص للبحث: بدون تشكيل، وأشكال الألف/الياء/التاء المربوطة موحدة، وبدون حالة الأحرف"""
+    return ' '.join(str(text).translate(ARABIC_MARKS).translate(ARABIC_LETTERS).casefold().split())
+
+
+class EmployeeSearchIndex:
+    """فهرس بادئات مرتب (بحث ثنائي) على أكواد الموظفين وكلمات أسمائهم للإكمال التلقائي"""
+
+    def __init__(self):
+        self.keys = []
+        self.emp_ids = []
+
+    def build(self, employees):
+        items = []
+        for emp_id, data in employees.items():
+            items.extend((key, emp_id) for key in self._keys_for(emp_id, data))
+        items.sort()
+        self.keys = [item[0] for item in items]
+        self.emp_ids = [item[1] for item in items]
+
+    @staticmethod
+    def _keys_for(emp_id, data):
+        """مفاتيح الموظف: الكود، والاسم كاملاً، وكل جزء من الاسم بداية من كل كلمة"""
+        keys = {normalize_search_text(emp_id)}
+        words = normalize_search_text(data.get('name', '')).split()
+        keys.update(' '.join(words[i:]) for i in range(len(words)))
+        keys.discard('')
+        return keys
+
+    def add(self, emp_id, data):
+        for key in self._keys_for(emp_id, data):
+            position = bisect_left(self.keys, key)
+            while position < len(self.keys) and self.keys[position] == key and self.emp_ids[position] < emp_id:
+                position += 1
+            self.keys.insert(position, key)
+            self.emp_ids.insert(position, emp_id)
+
+    def remove(self, emp_id, data):
+        for key in self._keys_for(emp_id, data):
+            position = bisect_left(self.keys, key)
+            while position < len(self.keys) and self.keys[position] == key:
+                if self.emp_ids[position] == emp_id:
+                    del self.keys[position]
+                    del self.emp_ids[position]
+                    break
+                position += 1
+
+    def search(self, text, limit=10):
+        """أكواد الموظفين التي يبدأ كودها أو أي كلمة من اسمها بالنص (بدون تكرار)"""
+        prefix = normalize_search_text(text)
+        if not prefix:
+            return []
+
+        results = []
+        seen = set()
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and len(results) < limit:
+            if not self.keys[position].startswith(prefix):
+                break
+            emp_id = self.emp_ids[position]
+            if emp_id not in seen:
+                seen.add(emp_id)
+                results.append(emp_id)
+            position += 1
+        return results
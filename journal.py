@@ -0,0 +1,254 @@
+import json
+import os
+import threading
+
+from metrics import registry
+
+
+class PunchJournal:
+    """سجل إلحاقي لحركات الحضور والانصراف مع تجميع الحفظ على القرص"""
+
+    def __init__(self, path, commit_interval=0.005):
+        self.path = path
+        self.old_path = path + '.old'
+        self.commit_interval = commit_interval
+        self.entries_count = 0
+
+        self._file = None
+        self._pending = []
+        self._appended_seq = 0
+        self._durable_seq = 0
+        self._closed = False
+        # آخر خطأ في كتابة السجل وعدد مرات الفشل: المنتظرون يرفعون الخطأ بدلاً من الانتظار للأبد
+        self.error = None
+        self._failures = 0
+        self._failed_seq = 0
+        # حجم الملف بعد آخر fsync ناجح (يُقص إليه سطر مكتوب جزئياً عند الفشل)
+        self._good_size = 0
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._compaction = None
+        # عدد الحركات في الجزء القديم (يُعاد للعداد إذا فشلت لقطته)
+        self._rotated_count = 0
+
+    @property
+    def compacting(self):
+        return self._compaction is not None and self._compaction.is_alive()
+
+    def open(self):
+        """فتح ملف السجل ودمج أي جزء متبقي من ضغط سابق لم يكتمل"""
+        if os.path.exists(self.old_path):
+            # ضغط سابق توقف قبل الانتهاء: نعيد الجزء القديم إلى بداية السجل
+            # الحركات قابلة لإعادة التطبيق بدون أثر لذلك لا خطر من التكرار
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as src, \
+                        open(self.old_path, 'a', encoding='utf-8') as dst:
+                    dst.write(src.read())
+            os.replace(self.old_path, self.path)
+
+        self.entries_count = sum(1 for _ in self.replay())
+        self._open_file()
+        threading.Thread(target=self._flush_loop, name='punch-journal', daemon=True).start()
+
+    def _open_file(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._good_size = self._file.tell()
+
+    def replay(self):
+        """قراءة الحركات المسجلة بالترتيب (الجزء القديم ثم الحالي)"""
+        for path in (self.old_path, self.path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            yield json.loads(line)
+                        except json.JSONDecodeError:
+                            # سطر مقطوع في نهاية الملف بسبب انقطاع الكتابة
+                            break
+            except FileNotFoundError:
+                continue
+
+    def append(self, entry, wait=True, weight=1):
+        """إضافة حركة واحدة للسجل (weight: عدد الحركات التي يمثلها السطر)"""
+        return self.append_many([entry], wait=wait, weight=weight)
+
+    def append_many(self, entries, wait=True, weight=None):
+        """إضافة مجموعة حركات تُكتب معاً بعملية fsync واحدة"""
+        lines = [json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries]
+        with self._cond:
+            self._pending.extend(lines)
+            self._appended_seq += len(lines)
+            self.entries_count += len(lines) if weight is None else weight
+            seq = self._appended_seq
+            self._cond.notify_all()
+            if wait:
+                self._wait(seq)
+        return seq
+
+    def sync(self):
+        """الانتظار حتى تُحفظ كل الحركات المعلقة على القرص"""
+        with self._cond:
+            self._wait(self._appended_seq)
+
+    def _wait(self, seq):
+        # تحت self._cond: فشل الكتابة بعد بدء الانتظار يُرفع للمستدعي (الحركة لم تُحفظ بعد)
+        failures = self._failures
+        while self._durable_seq < seq and not self._closed:
+            if self._failures != failures:
+                raise self.error
+            self._cond.wait()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+
+            # مهلة قصيرة لتجميع الحركات المتزامنة في عملية كتابة واحدة
+            if self.commit_interval:
+                threading.Event().wait(self.commit_interval)
+            try:
+                self._drain()
+            except Exception:
+                # الخطأ وصل للمنتظرين؛ المحاولة التالية مع الحركة الجديدة التالية بدلاً من تكرارها بلا توقف
+                with self._cond:
+                    while self._appended_seq == self._failed_seq and not self._closed:
+                        self._cond.wait()
+
+    def _drain(self):
+        # القفل يضمن أن الدفعات تُكتب وتُعلَن محفوظة بنفس ترتيب إضافتها
+        with self._io_lock:
+            with self._cond:
+                lines, self._pending = self._pending, []
+            if not lines or self._file is None or self._closed:
+                return
+            try:
+                if self._file.closed:
+                    # فشلت كتابة سابقة: الملف يُفتح من جديد بعد قص ما كُتب جزئياً
+                    self._open_file()
+                with registry.timer('journal_fsync'):
+                    self._file.write(''.join(lines))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                self._good_size = self._file.tell()
+            except Exception as e:
+                self._write_failed(lines, e)
+                raise
+            with self._cond:
+                self.error = None
+                self._durable_seq += len(lines)
+                self._cond.notify_all()
+
+    def _write_failed(self, lines, error):
+        """فشل write/flush/fsync: الأسطر تعود لأول المعلقة، والسطر الجزئي يُقص حتى لا يقطع إعادة القراءة"""
+        registry.count('journal_write_errors')
+        try:
+            self._file.close()
+        except Exception:
+            pass
+        try:
+            os.truncate(self.path, self._good_size)
+        except OSError:
+            pass
+        with self._cond:
+            self._pending[:0] = lines
+            self.error = error
+            self._failures += 1
+            self._failed_seq = self._appended_seq
+            self._cond.notify_all()
+
+    def rotate(self):
+        """نقل السجل الحالي إلى الجزء القديم؛ الحركات التالية تُكتب في سجل جديد لا تغطيه اللقطة"""
+        if self._closed or os.path.exists(self.old_path):
+            return False
+
+        try:
+            self._drain()
+        except Exception:
+            # السجل لا يقبل الكتابة الآن: اللقطة تُكتب بدون تدويره
+            return False
+        with self._io_lock:
+            self._file.close()
+            os.replace(self.path, self.old_path)
+            self._open_file()
+            self._rotated_count, self.entries_count = self.entries_count, 0
+        return True
+
+    def drop_rotated(self):
+        """حذف الجزء القديم بعد حفظ اللقطة التي تغطيه"""
+        os.remove(self.old_path)
+        self._rotated_count = 0
+
+    def restore_rotated(self):
+        """إعادة الجزء القديم إلى بداية السجل بعد فشل كتابة لقطته (نفس دمج open)؛ حركاته تبقى لإعادة التطبيق"""
+        if not os.path.exists(self.old_path):
+            return
+        try:
+            self._drain()
+        except Exception:
+            # الحركات تبقى معلقة وتُكتب في السجل المدمج في المحاولة التالية
+            pass
+        with self._io_lock:
+            reopen = self._file is not None and not self._closed
+            if reopen:
+                self._file.close()
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as src, \
+                        open(self.old_path, 'a', encoding='utf-8') as dst:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+            os.replace(self.old_path, self.path)
+            if reopen:
+                self._open_file()
+            with self._cond:
+                self.entries_count += self._rotated_count
+            self._rotated_count = 0
+
+    def start_compaction(self, snapshot, write_snapshot, on_error=None):
+        """تدوير السجل وكتابة لقطة كاملة في الخلفية ثم حذف الجزء القديم.
+
+        إذا فشلت كتابة اللقطة يعود الجزء القديم للسجل ويُبلغ on_error(الخطأ) بدلاً من ترك .old
+        على القرص (الذي يمنع كل تدوير تالٍ).
+        """
+        if self.compacting or not self.rotate():
+            return False
+
+        def run():
+            try:
+                write_snapshot(snapshot)
+            except Exception as e:
+                registry.count('journal_compaction_errors')
+                self.restore_rotated()
+                if on_error is not None:
+                    on_error(e)
+                return
+            self.drop_rotated()
+
+        self._compaction = threading.Thread(target=run, name='journal-compaction', daemon=True)
+        self._compaction.start()
+        return True
+
+    def wait_for_compaction(self):
+        """انتظار انتهاء الضغط الجاري قبل كتابة لقطة جديدة"""
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
+
+    def close(self):
+        """حفظ الحركات المعلقة وإغلاق الملف"""
+        if self._closed or self._file is None:
+            return
+        try:
+            self._drain()
+        finally:
+            with self._cond:
+                self._closed = True
+                self._cond.notify_all()
+            with self._io_lock:
+                self._file.close()
@@ -0,0 +1,328 @@
+"""لقطة أعمدة للحضور تُقرأ بـ mmap بدون نسخ، لعمليات التقارير والتصدير المتوازية.
+
+بدلاً من أن تقرأ كل عملية عاملة ملفات الأشهر وتبني شجرة قواميس خاصة بها (فتتضاعف الذاكرة بعدد
+العمليات)، تفتح كل عملية ملفات data/mapped/<الشهر>.map بـ mmap للقراءة فقط، فتشترك كل العمليات في
+نفس صفحات ذاكرة نظام التشغيل ولا تُنسخ إلا الجلسات التي تقرؤها فعلاً.
+
+التنسيق لكل شهر (little-endian، كل قسم يبدأ على حد 8 بايت):
+    رأس 32 بايت: MAGIC (8) | الإصدار u16 | عرض الكود u16 | عدد الموظفين u32 | عدد التواريخ u32
+                 | محجوز u32 | عدد الجلسات u64
+    التواريخ: 10 بايت لكل تاريخ (YYYY-MM-DD)
+    أكواد الموظفين: عرض ثابت لكل كود (UTF-8 مكمل بأصفار) مرتبة، للبحث الثنائي
+    بداية جلسات كل موظف: u64[عدد الموظفين + 1]
+    الحضور i64[n] | الانصراف i64[n] | رقم التاريخ u32[n]   (جلسات كل موظف متتالية بترتيب التاريخ)
+
+الأوقات بالثواني (parse_time)، وNULL للجلسة المفتوحة أو الوقت الذي تعذرت قراءته.
+
+الكاتب الوحيد (تخزين JSON في البرنامج أو الخدمة) يكتب ملف الشهر مع كل كتابة لملف الشهر العادي بعد
+الحفظ أو ضغط سجل الحركات، في ملف جديد ثم استبدال، فالعمليات التي فتحت النسخة السابقة تكمل القراءة
+منها بأمان وrefresh يفتح النسخة الجديدة. الحركات بعد آخر حفظ تبقى في سجل الحركات حتى الحفظ التالي.
+
+التفعيل مرة واحدة (والبرنامج والخدمة متوقفان) ببناء الملفات لكل الأشهر الحية والمؤرشفة؛ وجود المجلد
+يجعل التخزين يحدّثه بعد ذلك:
+    python mapsnap.py build data
+    python mapsnap.py hours data --from 2024-01-01 --to 2024-12-31 --workers 4
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import timed
+
+MAGIC = b'\x89ATTMAP\n'
+VERSION = 1
+HEADER = struct.Struct('<8sHHIIIQ')
+DATE_WIDTH = 10
+EXTENSION = '.map'
+
+NULL = -2 ** 63
+
+# المجلد المفتوح في كل عملية عاملة (يُملأ مرة واحدة عند بدء العملية)
+_attendance = None
+
+
+class MappedSnapshotError(ValueError):
+    """ملف غير صالح (رأس غير معروف، إصدار أحدث، أو حجم لا يطابق الرأس)"""
+
+
+def mapped_dir(data_dir):
+    return os.path.join(data_dir, 'mapped')
+
+
+def _aligned(size):
+    return (size + 7) // 8 * 8
+
+
+def _little_endian(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def encode_month(shard):
+    """بايتات ملف الشهر: shard هو {التاريخ: {الكود: [(الحضور، الانصراف)]}} بأوقات parse_time"""
+    dates = sorted(shard)
+    by_employee = {}
+    for date_no, date in enumerate(dates):
+        for emp_id, records in shard[date].items():
+            if records:
+                by_employee.setdefault(str(emp_id).encode('utf-8'), []).append((date_no, records))
+
+    keys = sorted(by_employee)
+    width = max((len(key) for key in keys), default=1)
+    offsets = array('Q', [0])
+    starts = array('q')
+    ends = array('q')
+    date_nos = array('I')
+    for key in keys:
+        for date_no, records in by_employee[key]:
+            for start, end in records:
+                starts.append(start if isinstance(start, int) else NULL)
+                ends.append(end if isinstance(end, int) else NULL)
+                date_nos.append(date_no)
+        offsets.append(len(starts))
+
+    def padded(data):
+        return data + b'\0' * (_aligned(len(data)) - len(data))
+
+    return b''.join([
+        HEADER.pack(MAGIC, VERSION, width, len(keys), len(dates), 0, len(starts)),
+        padded(''.join(dates).encode('ascii')),
+        padded(b''.join(key.ljust(width, b'\0') for key in keys)),
+        padded(_little_endian(offsets).tobytes()),
+        padded(_little_endian(starts).tobytes()),
+        padded(_little_endian(ends).tobytes()),
+        padded(_little_endian(date_nos).tobytes()),
+    ])
+
+
+def write_month(path, shard):
+    """كتابة ملف الشهر بشكل آمن (ملف مؤقت ثم استبدال؛ من فتح النسخة القديمة يكمل القراءة منها)"""
+    data = encode_month(shard)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class MappedMonth:
+    """ملف شهر مفتوح بـ mmap؛ الأعمدة memoryview على نفس الصفحات بدون نسخ"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if stat.st_size < HEADER.size:
+                raise MappedSnapshotError("ملف اللقطة ناقص")
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.width, self.count, dates_count, _, sessions = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise MappedSnapshotError("ليس ملف لقطة أعمدة")
+        if version > VERSION:
+            raise MappedSnapshotError(f"إصدار ملف اللقطة ({version}) أحدث من البرنامج")
+
+        offset = HEADER.size
+        self.dates = [self.map[offset + i * DATE_WIDTH:offset + (i + 1) * DATE_WIDTH].decode('ascii')
+                      for i in range(dates_count)]
+        offset += _aligned(dates_count * DATE_WIDTH)
+        self.ids_offset = offset
+        offset += _aligned(self.count * self.width)
+        sections = [('Q', self.count + 1), ('q', sessions), ('q', sessions), ('I', sessions)]
+        if offset + sum(_aligned(array(typecode).itemsize * n) for typecode, n in sections) != stat.st_size:
+            raise MappedSnapshotError("حجم ملف اللقطة لا يطابق رأسه")
+
+        self._view = memoryview(self.map)
+        columns = []
+        for typecode, n in sections:
+            size = array(typecode).itemsize * n
+            columns.append(self._column(typecode, offset, size))
+            offset += _aligned(size)
+        self.offsets, self.starts, self.ends, self.date_nos = columns
+
+    def _column(self, typecode, offset, size):
+        if sys.byteorder == 'big':
+            return _little_endian(array(typecode, self.map[offset:offset + size]))
+        return self._view[offset:offset + size].cast(typecode)
+
+    def _key(self, i):
+        start = self.ids_offset + i * self.width
+        return self.map[start:start + self.width]
+
+    def find(self, emp_id):
+        """رقم الموظف في الملف (بحث ثنائي على الأكواد الثابتة العرض)، أو None"""
+        key = str(emp_id).encode('utf-8')
+        if len(key) > self.width:
+            return None
+        key = key.ljust(self.width, b'\0')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.count and self._key(lo) == key else None
+
+    def employee_ids(self):
+        return [self._key(i).rstrip(b'\0').decode('utf-8') for i in range(self.count)]
+
+    def sessions(self, emp_id, start_date=None, end_date=None):
+        """(التاريخ، الحضور، الانصراف) لجلسات الموظف في الشهر (وبين التاريخين إن حُددا)"""
+        i = self.find(emp_id)
+        if i is None:
+            return []
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        if start_date is not None:
+            # أرقام التواريخ مرتبة داخل جلسات الموظف
+            first = bisect_left(self.dates, start_date)
+            last = bisect_right(self.dates, end_date)
+            date_nos = self.date_nos[lo:hi]
+            lo, hi = lo + bisect_left(date_nos, first), lo + bisect_left(date_nos, last)
+        dates = self.dates
+        return [(dates[date_no], None if start == NULL else start, None if end == NULL else end)
+                for date_no, start, end in zip(self.date_nos[lo:hi], self.starts[lo:hi], self.ends[lo:hi])]
+
+    def close(self):
+        for column in (self.offsets, self.starts, self.ends, self.date_nos):
+            if isinstance(column, memoryview):
+                column.release()
+        self._view.release()
+        self.map.close()
+
+
+class MappedAttendance:
+    """كل أشهر data/mapped للقراءة فقط؛ كل شهر يُفتح عند أول حاجة له"""
+
+    def __init__(self, data_dir):
+        self.dir = mapped_dir(data_dir)
+        self.open_months = {}
+
+    def path(self, month):
+        return os.path.join(self.dir, month + EXTENSION)
+
+    def months(self):
+        try:
+            names = os.listdir(self.dir)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len(EXTENSION)] for name in names if name.endswith(EXTENSION))
+
+    def month(self, month):
+        """الشهر المفتوح، أو None إذا لم يكن له ملف"""
+        mapped = self.open_months.get(month)
+        if mapped is None:
+            try:
+                mapped = self.open_months[month] = MappedMonth(self.path(month))
+            except FileNotFoundError:
+                return None
+        return mapped
+
+    def refresh(self):
+        """إغلاق الأشهر التي استبدلها الكاتب بنسخة أحدث (تُفتح الجديدة عند الحاجة)"""
+        for month, mapped in list(self.open_months.items()):
+            try:
+                stat = os.stat(self.path(month))
+                current = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                current = None
+            if current != mapped.signature:
+                mapped.close()
+                del self.open_months[month]
+
+    def employee_sessions(self, emp_id, start_date, end_date):
+        """(التاريخ، الحضور، الانصراف) لجلسات الموظف في الفترة"""
+        sessions = []
+        for month in self.months():
+            if start_date[:7] <= month <= end_date[:7]:
+                mapped = self.month(month)
+                if mapped is not None:
+                    sessions.extend(mapped.sessions(emp_id, start_date, end_date))
+        return sessions
+
+    def close(self):
+        for mapped in self.open_months.values():
+            mapped.close()
+        self.open_months = {}
+
+
+def employee_hours(attendance, emp_id, start_date, end_date):
+    """(عدد الأيام، الساعات) للموظف في الفترة بنفس تقريب Session.hours لكل جلسة"""
+    dates = set()
+    hours = 0
+    for date, start, end in attendance.employee_sessions(emp_id, start_date, end_date):
+        if start is not None and end is not None:
+            dates.add(date)
+            hours += round((end - start) / 3600, 2)
+    return len(dates), round(hours, 2)
+
+
+def _init_worker(data_dir):
+    global _attendance
+    _attendance = MappedAttendance(data_dir)
+
+
+def _employees_hours(emp_ids, start_date, end_date):
+    return {emp_id: employee_hours(_attendance, emp_id, start_date, end_date) for emp_id in emp_ids}
+
+
+@timed('mapped_hours')
+def parallel_hours(data_dir, emp_ids, start_date, end_date, workers=None, chunk_size=200):
+    """الكود ← (الأيام، الساعات) لكل الموظفين على عدة عمليات تقرأ نفس ملفات mmap"""
+    import multiprocessing
+
+    emp_ids = list(emp_ids)
+    # spawn بدلاً من fork: البرنامج الرئيسي به خيوط (الواجهة وسجل الحركات)
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(data_dir,)) as executor:
+        chunks = [emp_ids[i:i + chunk_size] for i in range(0, len(emp_ids), chunk_size)]
+        for result in executor.map(_employees_hours, chunks, [start_date] * len(chunks), [end_date] * len(chunks)):
+            results.update(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="لقطة الحضور المقروءة بـ mmap للعمليات المتوازية")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="بناء الملفات لكل الأشهر وتفعيل تحديثها مع كل حفظ")
+    build.add_argument('data_dir')
+    hours = commands.add_parser('hours', help="أيام وساعات كل الموظفين لفترة على عدة عمليات")
+    hours.add_argument('data_dir')
+    hours.add_argument('--from', dest='start', required=True)
+    hours.add_argument('--to', dest='end', required=True)
+    hours.add_argument('--workers', type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        from storage import JsonStorage
+
+        storage = JsonStorage(args.data_dir)
+        storage.load()
+        try:
+            print(f"{storage.build_mapped()} شهر في {mapped_dir(args.data_dir)}")
+        finally:
+            storage.close()
+        return
+
+    emp_ids = set()
+    attendance = MappedAttendance(args.data_dir)
+    for month in attendance.months():
+        if args.start[:7] <= month <= args.end[:7]:
+            emp_ids.update(attendance.month(month).employee_ids())
+    attendance.close()
+    for emp_id, (days, total) in sorted(parallel_hours(args.data_dir, emp_ids, args.start, args.end,
+                                                       args.workers).items()):
+        print(f"{emp_id}\t{days}\t{total}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""قياسات أداء خفيفة للعمليات الأساسية: أزمنة (مدرج تكراري + نافذة متحركة) وعدادات.
+
+القياس معطل افتراضياً؛ عند التعطيل تكلفة كل دالة مقاسة فحص قيمة واحدة فقط. التفعيل من لوحة
+الأداء في واجهة المدير أو registry.enabled = True، والتصدير بتنسيق Prometheus النصي.
+"""
+import bisect
+import functools
+import io
+import threading
+import time
+from collections import deque
+
+# حدود المدرج بالثواني (le في Prometheus)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# عدد آخر القياسات المحفوظة لكل عملية لحساب p50/p95/p99 الحالية
+WINDOW = 1024
+
+
+class Histogram:
+    """أزمنة عملية واحدة: عدادات تراكمية لكل حد (للتصدير) وآخر WINDOW قياس (للنسب المئوية)"""
+
+    __slots__ = ('counts', 'count', 'total', 'recent')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=WINDOW)
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+    def percentile(self, fraction):
+        samples = sorted(self.recent)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class _NoTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+class _Timer:
+    __slots__ = ('registry', 'name', 'start')
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """سجل القياسات (آمن للاستخدام من خيوط الحفظ والتصدير وخدمة الحضور)"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.profiler = None
+
+    def observe(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def timer(self, name):
+        """قياس زمن كتلة: with registry.timer('json_encode'): ..."""
+        if not self.enabled:
+            return _NO_TIMER
+        return _Timer(self, name)
+
+    def timed(self, name):
+        """مزخرف لقياس زمن دالة تحت الاسم name"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.counters = {}
+
+    def summary(self):
+        """(الاسم، العدد، p50، p95، p99، الإجمالي) لكل عملية مقاسة، بالثواني"""
+        with self.lock:
+            items = sorted(self.histograms.items())
+            return [(name, h.count, h.percentile(0.5), h.percentile(0.95), h.percentile(0.99), h.total)
+                    for name, h in items]
+
+    def prometheus_text(self):
+        """القياسات بتنسيق Prometheus النصي"""
+        lines = ['# HELP attendance_operation_seconds Duration of attendance operations.',
+                 '# TYPE attendance_operation_seconds histogram']
+        with self.lock:
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'attendance_operation_seconds_bucket{{operation="{name}",le="{bound}"}} '
+                                 f'{cumulative}')
+                lines.append(f'attendance_operation_seconds_sum{{operation="{name}"}} {histogram.total:.6f}')
+                lines.append(f'attendance_operation_seconds_count{{operation="{name}"}} {histogram.count}')
+
+            lines.append('# HELP attendance_events_total Counted attendance events.')
+            lines.append('# TYPE attendance_events_total counter')
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'attendance_events_total{{event="{name}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        return path
+
+    def start_profile(self):
+        """بدء تسجيل cProfile لكل الدوال في الخيط الحالي (خيط الواجهة)"""
+        if self.profiler is None:
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop_profile(self, path=None, limit=40):
+        """إيقاف التسجيل وحفظه (ملف .prof لـ pstats/snakeviz) وإرجاع ملخص نصي بأعلى الدوال زمناً"""
+        profiler, self.profiler = self.profiler, None
+        if profiler is None:
+            return ''
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+        import pstats
+
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+    @property
+    def profiling(self):
+        return self.profiler is not None
+
+
+# السجل المشترك لكل الوحدات
+registry = Metrics()
+timed = registry.timed
+timer = registry.timer
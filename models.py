@@ -0,0 +1,92 @@
+import calendar
+import sys
+import time
+from datetime import datetime
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def to_epoch(value, fmt=TIME_FORMAT):
+    """تحويل نص تاريخ/وقت إلى ثوانٍ (بدون منطقة زمنية مثل فرق الأوقات في التقارير)"""
+    return calendar.timegm(datetime.strptime(value, fmt).timetuple())
+
+
+def parse_time(value):
+    """قراءة وقت مرة واحدة: ثوانٍ إن أمكن، '' ← None، والقيم غير الصالحة تبقى كما هي"""
+    if not value:
+        return None
+    try:
+        return to_epoch(value)
+    except ValueError:
+        return value
+
+
+def format_time(value):
+    """عكس parse_time لعرض الوقت أو حفظه"""
+    if value is None:
+        return ''
+    if isinstance(value, int):
+        return time.strftime(TIME_FORMAT, time.gmtime(value))
+    return value
+
+
+def intern_id(emp_id):
+    """توحيد نسخة كود الموظف في الذاكرة بدلاً من تكراره في كل يوم"""
+    return sys.intern(str(emp_id))
+
+
+class Session:
+    """جلسة حضور واحدة؛ الأوقات محفوظة كثوانٍ تُقرأ مرة واحدة عند التحميل أو التسجيل"""
+
+    __slots__ = ('start', 'end')
+
+    def __init__(self, check_in='', check_out=''):
+        self.start = parse_time(check_in)
+        self.end = parse_time(check_out)
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(record['check_in'], record.get('check_out', ''))
+
+    @classmethod
+    def from_epochs(cls, start, end=None):
+        """إنشاء جلسة من أوقات مقروءة مسبقاً (بدون إعادة قراءة النصوص)"""
+        session = cls.__new__(cls)
+        session.start = start
+        session.end = end
+        return session
+
+    def to_dict(self):
+        return {'check_in': self.check_in, 'check_out': self.check_out}
+
+    @property
+    def check_in(self):
+        return format_time(self.start)
+
+    @check_in.setter
+    def check_in(self, value):
+        self.start = parse_time(value)
+
+    @property
+    def check_out(self):
+        return format_time(self.end)
+
+    @check_out.setter
+    def check_out(self, value):
+        self.end = parse_time(value)
+
+    @property
+    def is_open(self):
+        """حضور بدون انصراف"""
+        return self.start is not None and self.end is None
+
+    @property
+    def hours(self):
+        """عدد ساعات الجلسة مقربة لرقمين، أو None إذا لم تكتمل أو تعذرت قراءتها"""
+        if isinstance(self.start, int) and isinstance(self.end, int):
+            return round((self.end - self.start) / 3600, 2)
+        return None
+
+    def __repr__(self):
+        return f"Session({self.check_in!r}, {self.check_out!r})"
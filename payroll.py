@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+from models import DATE_FORMAT, to_epoch
+
+PAYROLL_COLUMNS = ['emp_id', 'name', 'department', 'hourly_rate', 'days', 'hours', 'salary']
+
+
+def round2(values):
+    """تقريب لرقمين مطابق تماماً لدالة round في بايثون (مستخدمة في حساب الساعات والراتب)"""
+    values = np.asarray(values, dtype=float)
+    result = np.round(values, 2)
+    # np.round يضرب في 100 أولاً، فالقيم التي يصبح ناتجها .5 بالضبط تُقرب بدالة round نفسها
+    scaled = values * 100
+    ties = (scaled - np.floor(scaled)) == 0.5
+    if ties.any():
+        result[ties] = [round(float(value), 2) for value in values[ties]]
+    return result
+
+
+def sequential_sums(codes, values, groups):
+    """مجموع القيم لكل مجموعة بنفس ترتيب الجمع في بايثون (0 + أ + ب + ...).
+
+    codes: رقم المجموعة لكل قيمة (القيم مرتبة حسب المجموعة). groupby().sum في pandas يجمع بطريقة
+    مختلفة (تعويض Kahan) فتختلف النتيجة في آخر الأرقام عن التقارير؛ هنا القيم توضع في مصفوفة
+    (مجموعة × ترتيب داخلها) وتُجمع عموداً بعد عمود لكل المجموعات معاً.
+    """
+    sums = np.zeros(groups)
+    if not len(values):
+        return sums
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    positions = np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+    matrix = np.zeros((groups, positions.max() + 1))
+    matrix[codes, positions] = values
+    for column in matrix.T:
+        sums = sums + column
+    return sums
+
+
+def collect_sessions(session_index, emp_ids, start_date, end_date):
+    """أعمدة الجلسات المكتملة لكل الموظفين في أيام الفترة (من أعمدة الفهرس الزمني مباشرة).
+
+    الاختيار بمفتاح التاريخ مثل التقرير الشهري: نافذة أوسع بيوم من كل جهة ثم تصفية بالتاريخ،
+    فجلسة بعد منتصف الليل تُحسب في يومها المسجل.
+    """
+    lo_epoch = to_epoch(start_date, DATE_FORMAT) - 86400
+    hi_epoch = to_epoch(end_date, DATE_FORMAT) + 2 * 86400
+
+    columns = {'emp_id': [], 'date': [], 'start': [], 'end': []}
+    for emp_id in emp_ids:
+        sessions = session_index.by_employee.get(emp_id)
+        if sessions is None:
+            continue
+        lo, hi = sessions.between(lo_epoch, hi_epoch)
+        for date, record in zip(sessions.dates[lo:hi], sessions.records[lo:hi]):
+            if (start_date <= date <= end_date
+                    and isinstance(record.start, int) and isinstance(record.end, int)):
+                columns['emp_id'].append(emp_id)
+                columns['date'].append(date)
+                columns['start'].append(record.start)
+                columns['end'].append(record.end)
+
+    return pd.DataFrame({
+        'emp_id': pd.Series(columns['emp_id'], dtype=object),
+        'date': pd.Series(columns['date'], dtype=object),
+        'start': np.array(columns['start'], dtype=np.int64),
+        'end': np.array(columns['end'], dtype=np.int64),
+    })
+
+
+def daily_payroll(sessions, rates):
+    """إجمالي الساعات والراتب لكل موظف في كل يوم (الأيام التي بها ساعات فقط)، مرتبة بالموظف والتاريخ"""
+    sessions = sessions.assign(hours=round2((sessions['end'] - sessions['start']) / 3600))
+    # ترتيب ثابت: جلسات اليوم بترتيب الحضور كما في ملخص اليوم
+    sessions = sessions.sort_values(['emp_id', 'date', 'start'], kind='stable')
+    keys = sessions.groupby(['emp_id', 'date'], sort=False).ngroup().to_numpy()
+    daily = sessions.drop_duplicates(['emp_id', 'date'])[['emp_id', 'date']].reset_index(drop=True)
+    daily['hours'] = sequential_sums(keys, sessions['hours'].to_numpy(), len(daily))
+    daily = daily[daily['hours'] > 0].reset_index(drop=True)
+    daily['hourly_rate'] = daily['emp_id'].map(rates).astype(float)
+    daily['salary'] = round2(daily['hourly_rate'] * daily['hours'])
+    return daily
+
+
+def compute_payroll(employees, session_index, start_date, end_date, rates):
+    """كشف رواتب كل الموظفين لفترة في عملية واحدة: صف لكل موظف.
+
+    نفس حساب التقرير الشهري: ساعات كل جلسة مقربة، وراتب كل يوم من إجمالي ساعاته مقرباً، ثم جمع
+    الأيام بالترتيب، فأرقام كل موظف هي إجمالي تقريره الشهري تماماً.
+    """
+    sessions = collect_sessions(session_index, list(employees), start_date, end_date)
+    daily = daily_payroll(sessions, rates)
+
+    codes = daily.groupby('emp_id', sort=False).ngroup().to_numpy()
+    emp_ids = daily['emp_id'].drop_duplicates().tolist()
+    totals = pd.DataFrame({
+        'days': daily.groupby('emp_id', sort=False).size().to_numpy(),
+        'hours': sequential_sums(codes, daily['hours'].to_numpy(), len(emp_ids)),
+        'salary': sequential_sums(codes, daily['salary'].to_numpy(), len(emp_ids)),
+    }, index=pd.Index(emp_ids, dtype=object))
+
+    payroll = pd.DataFrame({
+        'emp_id': list(employees),
+        'name': [data['name'] for data in employees.values()],
+        'department': [data.get('department', '') for data in employees.values()],
+        'hourly_rate': [rates[emp_id] for emp_id in employees],
+    })
+    payroll = payroll.join(totals, on='emp_id')
+    payroll[['days', 'hours', 'salary']] = payroll[['days', 'hours', 'salary']].fillna(0)
+    payroll['days'] = payroll['days'].astype(int)
+    return payroll[PAYROLL_COLUMNS]
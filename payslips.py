@@ -0,0 +1,142 @@
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from metrics import timed
+
+# الخط المستخدم في الكشوف (يحتاج خطاً يدعم العربية) واسم العائلة المسجل به في FPDF
+DEFAULT_FONT_PATH = 'arial.ttf'
+FONT_FAMILY = 'payslip'
+
+MANIFEST_NAME = 'manifest.json'
+
+# الخط المحمل في كل عملية عاملة (يُملأ مرة واحدة عند بدء العملية)
+_renderer = None
+
+
+class PayslipRenderer:
+    """رسم كشوف الرواتب؛ الخط يُقرأ مرة واحدة ثم يُعاد استخدامه لكل كشف في نفس العملية"""
+
+    def __init__(self, font_path=DEFAULT_FONT_PATH):
+        from fpdf import FPDF
+
+        self.FPDF = FPDF
+        self.fonts = None
+        self.font_files = None
+        self.family = 'Arial'
+        template = FPDF()
+        try:
+            template.add_font(FONT_FAMILY, '', font_path, uni=True)
+        except (RuntimeError, OSError):
+            # بدون ملف الخط نستخدم الخط المدمج مثل تقارير PDF الأخرى
+            return
+        self.fonts = template.fonts
+        self.font_files = template.font_files
+        self.family = FONT_FAMILY
+
+    def new_document(self):
+        pdf = self.FPDF()
+        if self.fonts is not None:
+            # نسخ بيانات الخط المحملة؛ قائمة الحروف المستخدمة (subset) خاصة بكل ملف
+            for key, font in self.fonts.items():
+                pdf.fonts[key] = dict(font, subset=list(font['subset']))
+            pdf.font_files.update(self.font_files)
+        pdf.add_page()
+        pdf.set_font(self.family, '', 12)
+        return pdf
+
+    def render(self, slip, path):
+        pdf = self.new_document()
+
+        pdf.set_font(self.family, '', 16)
+        pdf.cell(0, 10, "كشف راتب", 0, 1, 'C')
+        pdf.set_font(self.family, '', 12)
+        pdf.cell(0, 8, f"الفترة: {slip['start_date']} إلى {slip['end_date']}", 0, 1, 'C')
+        pdf.ln(5)
+
+        for label, value in (("كود الموظف", slip['emp_id']), ("اسم الموظف", slip['name']),
+                             ("القسم", slip['department']), ("سعر الساعة", slip['hourly_rate'])):
+            pdf.cell(45, 8, label, 1, 0, 'C')
+            pdf.cell(0, 8, str(value), 1, 1, 'C')
+        pdf.ln(5)
+
+        col_widths = [35, 45, 45, 30, 35]
+        for i, header in enumerate(['التاريخ', 'وقت الحضور', 'وقت الانصراف', 'الساعات', 'الراتب']):
+            pdf.cell(col_widths[i], 10, header, 1, 0, 'C')
+        pdf.ln()
+
+        for values in slip['days']:
+            for i, value in enumerate(values):
+                pdf.cell(col_widths[i], 10, str(value), 1, 0, 'C')
+            pdf.ln()
+
+        pdf.cell(sum(col_widths[:-2]), 10, "الإجمالي:", 1, 0, 'R')
+        pdf.cell(col_widths[-2], 10, str(slip['hours']), 1, 0, 'C')
+        pdf.cell(col_widths[-1], 10, str(slip['salary']), 1, 0, 'C')
+
+        pdf.output(path)
+
+
+def _init_worker(font_path):
+    global _renderer
+    _renderer = PayslipRenderer(font_path)
+
+
+def _render_payslip(slip, path):
+    """تنفيذ داخل العملية العاملة؛ الخطأ يُسجل في البيان بدلاً من إيقاف الدفعة كلها"""
+    try:
+        _renderer.render(slip, path)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def payslip_filename(slip):
+    emp_id = re.sub(r'[^\w.-]', '_', str(slip['emp_id']))
+    return f"payslip_{emp_id}_{slip['start_date']}_{slip['end_date']}.pdf"
+
+
+@timed('export_payslips')
+def generate_payslips(out_dir, slips, font_path=DEFAULT_FONT_PATH, workers=None, progress=None):
+    """توليد كشف PDF لكل موظف على عدة عمليات متوازية، مع ملف بيان للدفعة في نفس المجلد.
+
+    slips: قائمة قواميس (emp_id, name, department, hourly_rate, start_date, end_date,
+    days: [(التاريخ، أول حضور، آخر انصراف، الساعات، الراتب)], hours, salary).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    entries = [{
+        'emp_id': slip['emp_id'],
+        'name': slip['name'],
+        'file': payslip_filename(slip),
+        'days': len(slip['days']),
+        'hours': slip['hours'],
+        'salary': slip['salary'],
+        'error': None,
+    } for slip in slips]
+
+    # spawn بدلاً من fork: البرنامج الرئيسي به خيوط (الواجهة وسجل الحركات)
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(font_path,)) as executor:
+        futures = {executor.submit(_render_payslip, slip, os.path.join(out_dir, entry['file'])): entry
+                   for slip, entry in zip(slips, entries)}
+        for n, future in enumerate(as_completed(futures), 1):
+            futures[future]['error'] = future.result()
+            if progress is not None and n % 10 == 0:
+                progress(n / len(slips))
+
+    failed = sum(1 for entry in entries if entry['error'])
+    manifest = {
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'start_date': slips[0]['start_date'] if slips else '',
+        'end_date': slips[0]['end_date'] if slips else '',
+        'count': len(entries) - failed,
+        'failed': failed,
+        'payslips': entries,
+    }
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4, ensure_ascii=False)
+    return manifest
@@ -0,0 +1,351 @@
+"""خدمة الحضور المحلية: كاتب واحد يملك بيانات الحضور وتتصل به كل أجهزة الحضور.
+
+كل جهاز (test.py مع service_url) يرسل الحضور والانصراف والبحث عبر HTTP على localhost، والخدمة
+وحدها تقرأ وتكتب مجلد البيانات، فلا يكتب جهاز فوق حركات جهاز آخر وكل الأجهزة ترى نفس السجل.
+
+واجهة المدير على الأجهزة المتصلة تعمل أيضاً عبر الخدمة: قائمة الموظفين وإضافتهم وحذفهم واسترجاعهم
+والتقارير (اليومي والشهري وكشف الرواتب وتكلفة الأقسام). أثناء تشغيل الخدمة يبقى مجلد البيانات مقفلاً
+لها (servicelock.py)، فلا يفتحه البرنامج أو سطر الأوامر للكتابة بجانبها.
+
+الحفظ الجماعي: طلبات الحضور/الانصراف تدخل طابوراً، وخيط حفظ واحد يسحب كل ما تجمع فيه (حتى
+max_batch) ويطبقه على الذاكرة ثم يحفظه بعملية واحدة (سطر واحد في سجل الحركات بـ fsync واحد، أو
+معاملة SQLite واحدة)، ولا يرد على أي طلب قبل أن تُحفظ حركته على القرص. تحت الضغط يكبر حجم الدفعة
+تلقائياً بدلاً من أن تنتظر كل حركة fsync خاصاً بها.
+
+الهدف لموجة تغيير الوردية: 500 حركة/ثانية على الأقل بزمن استجابة أقل من ثانية لكل جهاز
+(مثلاً 1000 موظف يبصمون خلال دقيقتين على عشرات الأجهزة). القياس المحلي (معالج واحد، 50 عميلاً
+متزامناً، 5000 حركة): حوالي 1300 حركة/ثانية مع JSON وحوالي 1100 مع SQLite، وزمن الاستجابة p99 أقل
+من 60 مللي ثانية.
+
+التشغيل: python service.py --port 8765 --storage json
+"""
+import argparse
+import json
+import queue
+import sys
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from core import AttendanceCore, AttendanceError, punch_result
+from metrics import registry
+import servicelock
+from sheets_sync import SheetSync, open_worksheet
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+
+class AttendanceService:
+    """حالة الحضور المشتركة مع خيط حفظ جماعي للحركات"""
+
+    def __init__(self, core, max_batch=500):
+        self.core = core
+        self.max_batch = max_batch
+        # كل القراءات والتعديلات على الذاكرة تحت هذا القفل؛ الكاتب الوحيد هو خيط الحفظ
+        self.lock = threading.Lock()
+        self.punches = queue.Queue()
+        self.batches = 0
+        self.committed = 0
+
+        self.thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+        self.thread.start()
+
+    def punch(self, kind, emp_id, timeout=None):
+        """تسجيل حضور ('in') أو انصراف ('out') والانتظار حتى حفظه على القرص"""
+        future = Future()
+        self.punches.put((kind, emp_id, future))
+        return future.result(timeout)
+
+    def _run(self):
+        while True:
+            item = self.punches.get()
+            if item is None:
+                return
+            batch = [item]
+            # كل ما وصل أثناء حفظ الدفعة السابقة يدخل في هذه الدفعة
+            while len(batch) < self.max_batch:
+                try:
+                    item = self.punches.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.punches.put(None)
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        ops = []
+        waiting = []
+        with self.lock:
+            for kind, emp_id, future in batch:
+                try:
+                    if kind == 'in':
+                        op = self.core.apply_check_in(emp_id)
+                    else:
+                        op = self.core.apply_check_out(emp_id)
+                except AttendanceError as e:
+                    future.set_exception(e)
+                    continue
+                ops.append(op)
+                waiting.append((future, op))
+
+            if not ops:
+                return
+            try:
+                with registry.timer('commit_batch'):
+                    self.core.storage.record_punches(ops)
+            except Exception as e:
+                # الحركات لم تُحفظ: تُلغى من الذاكرة حتى لا يحفظها close() أو دفعة تالية
+                self.core.revert_ops(ops)
+                for future, op in waiting:
+                    future.set_exception(e)
+                return
+            self.batches += 1
+            self.committed += len(ops)
+            registry.count('service_punches', len(ops))
+
+        for future, op in waiting:
+            future.set_result(punch_result(op))
+
+    def employee_status(self, emp_id):
+        with self.lock:
+            return self.core.employee_status(emp_id)
+
+    def search_employees(self, text, limit=10):
+        with self.lock:
+            return self.core.search_employees(text, limit)
+
+    def daily_rows(self, date):
+        with self.lock:
+            return self.core.daily_rows(date)
+
+    # ---- واجهة المدير على الأجهزة المتصلة: تعديل الموظفين يُحفظ تحت نفس القفل فلا يتداخل مع دفعة حركات ----
+
+    def employee_rows(self):
+        with self.lock:
+            return self.core.employee_rows()
+
+    def on_site_rows(self):
+        with self.lock:
+            return self.core.on_site_rows()
+
+    def create_employee(self, emp_id, name, department, monthly_salary):
+        with self.lock:
+            self.core.create_employee(emp_id, name, department, monthly_salary)
+
+    def retire_employee(self, emp_id):
+        with self.lock:
+            return self.core.retire_employee(emp_id)
+
+    def last_deleted_employee(self):
+        with self.lock:
+            return self.core.last_deleted_employee()
+
+    def restore_deleted_employee(self, emp_id):
+        with self.lock:
+            self.core.restore_deleted_employee(emp_id)
+
+    def daily_report_rows(self, date, epochs=False):
+        with self.lock:
+            return self.core.daily_report_rows(date, epochs)
+
+    def monthly_report_rows(self, emp_id, start_date, end_date, epochs=False):
+        with self.lock:
+            return self.core.monthly_report_rows(emp_id, start_date, end_date, epochs)
+
+    def payroll_report_rows(self, start_date, end_date):
+        with self.lock:
+            return self.core.payroll_report_rows(start_date, end_date)
+
+    def department_report_rows(self, granularity, date):
+        with self.lock:
+            return self.core.department_report_rows(granularity, date)
+
+    def close(self):
+        """إيقاف خيط الحفظ بعد الحركات المنتظرة ثم حفظ لقطة كاملة"""
+        self.punches.put(None)
+        self.thread.join()
+        with self.lock:
+            self.core.storage.save(self.core.employees, self.core.attendance)
+            self.core.storage.close()
+
+
+def report_date(text):
+    """تاريخ تقرير من الطلب (ValueError إذا لم يكن YYYY-MM-DD)"""
+    datetime.strptime(text, '%Y-%m-%d')
+    return text
+
+
+class AttendanceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        # بدون سطر في الطرفية لكل طلب
+        pass
+
+    def reply(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        try:
+            body = self.get_body(url.path, lambda name, default='': query.get(name, [default])[0])
+        except AttendanceError as e:
+            self.reply(409, {'error': str(e)})
+            return
+        except ValueError:
+            # معامل ناقص أو ليس رقماً/تاريخاً صحيحاً (مثل limit=abc)
+            self.reply(400, {'error': "طلب غير صالح"})
+            return
+
+        if body is None:
+            self.reply(404, {'error': "مسار غير معروف"})
+        elif isinstance(body, bytes):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.reply(200, body)
+
+    def get_body(self, path, param):
+        """نتيجة طلب GET (قاموس JSON، أو bytes لنص /metrics)، أو None لمسار غير معروف"""
+        service = self.server.service
+
+        if path == '/employees':
+            return {'rows': service.employee_rows()}
+        if path.startswith('/employees/'):
+            return {'employee': service.employee_status(unquote(path[len('/employees/'):]))}
+        if path == '/search':
+            return {'matches': service.search_employees(param('q'), int(param('limit', '10')))}
+        if path == '/daily':
+            return {'rows': service.daily_rows(param('date'))}
+        if path == '/on_site':
+            return {'rows': service.on_site_rows()}
+        if path == '/deleted/last':
+            return {'employee': service.last_deleted_employee()}
+        if path == '/reports/daily':
+            return {'rows': service.daily_report_rows(report_date(param('date')), param('epochs') == '1')}
+        if path == '/reports/monthly':
+            rows, total = service.monthly_report_rows(param('emp_id'), report_date(param('start')),
+                                                      report_date(param('end')), param('epochs') == '1')
+            return {'rows': rows, 'total_hours': total}
+        if path == '/reports/payroll':
+            return {'rows': service.payroll_report_rows(report_date(param('start')), report_date(param('end')))}
+        if path == '/reports/department':
+            granularity = param('granularity', 'month')
+            if granularity not in ('week', 'month', 'year'):
+                raise ValueError(granularity)
+            rows, period = service.department_report_rows(granularity, report_date(param('date')))
+            return {'rows': rows, 'period': period}
+        if path == '/metrics':
+            return registry.prometheus_text().encode('utf-8')
+        if path == '/health':
+            return {'batches': service.batches, 'committed': service.committed}
+        return None
+
+    def do_POST(self):
+        service = self.server.service
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            body = json.loads(self.rfile.read(length).decode('utf-8') or '{}')
+            emp_id = str(body.get('emp_id', ''))
+            monthly_salary = float(body.get('monthly_salary') or 0)
+        except (ValueError, TypeError, AttributeError):
+            self.reply(400, {'error': "طلب غير صالح"})
+            return
+
+        try:
+            if self.path in ('/check_in', '/check_out'):
+                result = service.punch('in' if self.path == '/check_in' else 'out', emp_id)
+            elif self.path == '/add_employee':
+                service.create_employee(emp_id, str(body.get('name', '')), str(body.get('department', '')),
+                                        monthly_salary)
+                result = {}
+            elif self.path == '/delete_employee':
+                result = {'purge_delay_days': service.retire_employee(emp_id)}
+            elif self.path == '/restore_employee':
+                service.restore_deleted_employee(emp_id)
+                result = {}
+            else:
+                self.reply(404, {'error': "مسار غير معروف"})
+                return
+        except AttendanceError as e:
+            self.reply(409, {'error': str(e)})
+        except Exception as e:
+            failure = "تعذر حفظ الحركة" if self.path in ('/check_in', '/check_out') else "تعذر حفظ الموظفين"
+            self.reply(500, {'error': f"{failure}: {str(e)}"})
+        else:
+            self.reply(200, result)
+
+
+class AttendanceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # طابور اتصالات أكبر من الافتراضي (5) حتى لا تُرفض اتصالات الأجهزة وقت تغيير الوردية
+    request_queue_size = 128
+
+    def __init__(self, service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        super().__init__((host, port), AttendanceHandler)
+        self.service = service
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    return AttendanceServer(service, host, port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="خدمة الحضور المحلية لعدة أجهزة")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--shard-format', choices=['json', 'binary'], default='json')
+    parser.add_argument('--metrics', action='store_true', help="تفعيل قياسات الأداء (GET /metrics)")
+    parser.add_argument('--sheet', help="مفتاح جدول Google Sheets لمزامنة سجل الحضور اليومي")
+    parser.add_argument('--sheet-credentials', default='data/service_account.json')
+    parser.add_argument('--sheet-interval', type=float, default=60)
+    args = parser.parse_args(argv)
+    registry.enabled = args.metrics
+
+    # قفل مجلد البيانات: البرنامج وسطر الأوامر لا يفتحانه للكتابة ما دامت الخدمة تعمل
+    # العنوان المكتوب في القفل للأجهزة على نفس الحاسب (0.0.0.0 لا يصلح عنواناً للاتصال في ويندوز)
+    local_host = DEFAULT_HOST if args.host in ('', '0.0.0.0') else args.host
+    data_lock = servicelock.acquire(args.data_dir, f"http://{local_host}:{args.port}")
+    if data_lock is None:
+        sys.exit(f"خدمة حضور أخرى تعمل على مجلد البيانات {args.data_dir}")
+
+    core = AttendanceCore(args.storage, args.data_dir, args.shard_format)
+    # مسح سجلات الموظفين المحذوفين الذين انتهت مدة استرجاعهم قبل بدء الاستقبال
+    core.purge_due()
+    service = AttendanceService(core)
+    sheet_sync = None
+    if args.sheet:
+        sheet_sync = SheetSync(core, open_worksheet(args.sheet_credentials, args.sheet), args.sheet_interval)
+        sheet_sync.start()
+    server = make_server(service, args.host, args.port)
+    print(f"خدمة الحضور تعمل على http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if sheet_sync is not None:
+            sheet_sync.stop()
+        servicelock.release(data_lock)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""قفل مجلد البيانات لخدمة الحضور: الخدمة هي الكاتب الوحيد ما دامت تعمل.
+
+الخدمة تكتب عنوانها في data/service.lock وتقفله بقفل من نظام التشغيل يُفك تلقائياً إذا توقفت
+(حتى بانهيار)، فالملف الباقي بعد توقفها لا يمنع شيئاً. البرنامج وسطر الأوامر يفحصان القفل قبل
+فتح البيانات للكتابة، فلا يكتب أحدهما فوق حركات الخدمة.
+"""
+import json
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+LOCK_NAME = 'service.lock'
+# في ويندوز يُقفل بايت بعد محتوى الملف حتى يبقى العنوان مقروءاً للأجهزة الأخرى
+LOCK_OFFSET = 4096
+
+
+def lock_path(data_dir):
+    return os.path.join(data_dir, LOCK_NAME)
+
+
+def _try_lock(f):
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(LOCK_OFFSET)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(LOCK_OFFSET)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def acquire(data_dir, url):
+    """قفل مجلد البيانات للخدمة؛ يعيد الملف المفتوح (يبقى مفتوحاً حتى release) أو None إذا كانت خدمة أخرى تملكه"""
+    os.makedirs(data_dir, exist_ok=True)
+    f = open(lock_path(data_dir), 'a+', encoding='utf-8')
+    if not _try_lock(f):
+        f.close()
+        return None
+    f.seek(0)
+    f.truncate()
+    f.write(json.dumps({'pid': os.getpid(), 'url': url}))
+    f.flush()
+    return f
+
+
+def release(f):
+    try:
+        _unlock(f)
+    finally:
+        f.close()
+
+
+def holder_url(data_dir):
+    """عنوان الخدمة التي تملك مجلد البيانات الآن (من عملية أخرى)، أو None"""
+    try:
+        f = open(lock_path(data_dir), 'r+', encoding='utf-8')
+    except FileNotFoundError:
+        return None
+    with f:
+        try:
+            holder = json.loads(f.read() or '{}')
+        except ValueError:
+            holder = {}
+        if holder.get('pid') == os.getpid():
+            return None
+        if _try_lock(f):
+            # ملف باقٍ من خدمة توقفت
+            _unlock(f)
+            return None
+        return holder.get('url') or ''
@@ -0,0 +1,345 @@
+"""مزامنة سجل الحضور اليومي مع ورقة Google Sheets بالتغييرات فقط وبطلبات مجمعة.
+
+كل حركة تسجل صف (التاريخ، الموظف) كمتغير مع قيمه الحالية (في خيط الحركة نفسه، فلا يقرأ خيط
+المزامنة بيانات الحضور)، وخيط المزامنة يرسل كل فترة كل الصفوف المتغيرة بطلبين على الأكثر: batch_update
+واحد للصفوف الموجودة في الورقة و append_rows واحد للصفوف الجديدة، وليس طلباً لكل صف. الأخطاء المؤقتة
+(429 وأخطاء الخادم والاتصال) تعاد بتأخير متزايد، وإذا فشلت الدفعة تبقى صفوفها للمرة التالية.
+
+الإضافة غير قابلة للتكرار بأمان، فلا تعاد إلا عند 429 (الطلب لم يُنفذ)، وبعد أي فشل آخر تُقرأ
+أعمدة المفاتيح من الورقة من جديد قبل الدفعة التالية حتى لا يضاف نفس الصف مرتين.
+
+FakeWorksheet ورقة في الذاكرة بنفس الدوال المستخدمة من gspread (مع تأخير وأخطاء مصطنعة) للاختبار
+والقياس بدون اتصال:
+    python sheets_sync.py --employees 500 --punches 5000 --latency 0.2
+"""
+import argparse
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+from metrics import registry, timed
+
+HEADER = ['التاريخ', 'كود الموظف', 'اسم الموظف', 'القسم', 'أول حضور', 'آخر انصراف', 'عدد الساعات',
+          'عدد الجلسات']
+LAST_COLUMN = chr(ord('A') + len(HEADER) - 1)
+
+# أخطاء مؤقتة تستحق إعادة المحاولة؛ 429 تعني أن الطلب لم يُنفذ أصلاً
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+RANGE_ROW = re.compile(r'!?[A-Z]+(\d+)')
+
+# أعمدة النص (التاريخ والكود والاسم والقسم): تُرسل ببادئة ' حتى لا تحولها USER_ENTERED لرقم أو تاريخ
+# ('0012' تصبح 12) فتبقى مفاتيح الصفوف المقروءة من الورقة مطابقة لـ (التاريخ، الكود)
+TEXT_COLUMNS = 4
+
+
+def error_status(error):
+    """رمز HTTP لخطأ gspread (أو الورقة التجريبية)، أو None"""
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def is_retryable(error, idempotent=True):
+    status = error_status(error)
+    if status == 429:
+        return True
+    if not idempotent:
+        return False
+    return status in RETRYABLE_STATUS or isinstance(error, (ConnectionError, TimeoutError))
+
+
+def sheet_row(values):
+    """قيم الصف كما تُرسل للورقة: أعمدة النص كنص حرفي والباقي (الأوقات والأرقام) تفسره الورقة"""
+    return [f"'{value}" for value in values[:TEXT_COLUMNS]] + list(values[TEXT_COLUMNS:])
+
+
+def first_row(updated_range):
+    """رقم أول صف في نطاق مثل 'Sheet1'!A10:H12"""
+    return int(RANGE_ROW.search(updated_range.split('!')[-1]).group(1))
+
+
+class SheetSync:
+    """مزامنة صفوف (التاريخ، الموظف) المتغيرة مع ورقة كل interval ثانية"""
+
+    def __init__(self, core, worksheet, interval=60, max_retries=5, backoff=1.0, max_backoff=60,
+                 sleep=time.sleep):
+        self.core = core
+        self.worksheet = worksheet
+        self.interval = interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+
+        self.lock = threading.Lock()
+        # (التاريخ، الكود) ← قيم الصف المنتظرة للإرسال (آخر قيمة فقط لكل صف)
+        self.pending = {}
+        # (التاريخ، الكود) ← رقم الصف في الورقة؛ None = تُقرأ من الورقة قبل الدفعة التالية
+        self.positions = None
+        self.syncs = 0
+        self.rows_sent = 0
+        self.last_error = None
+
+        self.stopped = threading.Event()
+        self.thread = None
+        core.change_hooks.append(self.mark)
+
+    def row_values(self, date, emp_id):
+        """قيم صف موظف في يوم من الملخص اليومي"""
+        employee = self.core.employees.get(emp_id, {})
+        day = self.core.daily_totals.get(emp_id, date)
+        if day is None:
+            return [date, emp_id, employee.get('name', ''), employee.get('department', ''), '', '', 0, 0]
+        return [date, emp_id, employee.get('name', ''), employee.get('department', ''),
+                day.first_check_in.check_in if day.first_check_in else '',
+                day.last_check_out.check_out if day.last_check_out else '',
+                round(day.hours, 2), day.sessions]
+
+    def mark(self, keys):
+        """تسجيل صفوف متغيرة (يُستدعى من apply_ops في خيط الحركة)"""
+        rows = {key: self.row_values(*key) for key in keys}
+        with self.lock:
+            self.pending.update(rows)
+
+    def mark_date(self, date):
+        """تسجيل كل صفوف يوم للإرسال (مثلاً لملء ورقة جديدة)"""
+        self.mark([(date, emp_id) for emp_id in self.core.attendance.get(date, {})])
+
+    def _call(self, func, *args, idempotent=True, **kwargs):
+        """استدعاء الورقة مع إعادة المحاولة للأخطاء المؤقتة بتأخير متزايد (مع عشوائية)"""
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e, idempotent):
+                    raise
+                registry.count('sheet_sync_retries')
+                self.sleep(delay + random.uniform(0, delay))
+                delay = min(delay * 2, self.max_backoff)
+
+    def load_positions(self):
+        """قراءة مفاتيح الصفوف الموجودة في الورقة (وكتابة العناوين في ورقة فارغة)"""
+        values = self._call(self.worksheet.get_all_values)
+        if not values:
+            self._call(self.worksheet.append_rows, [HEADER], value_input_option='RAW', idempotent=False)
+            values = [HEADER]
+        self.positions = {(row[0], row[1]): number
+                          for number, row in enumerate(values[1:], 2) if len(row) >= 2}
+
+    @timed('sheet_sync')
+    def sync_once(self):
+        """إرسال كل الصفوف المتغيرة منذ آخر مزامنة؛ تعيد عدد الصفوف المرسلة"""
+        with self.lock:
+            batch, self.pending = self.pending, {}
+        if not batch:
+            return 0
+
+        try:
+            if self.positions is None:
+                self.load_positions()
+
+            updates = [{'range': f'A{self.positions[key]}:{LAST_COLUMN}{self.positions[key]}',
+                        'values': [sheet_row(values)]}
+                       for key, values in batch.items() if key in self.positions]
+            new_keys = [key for key in batch if key not in self.positions]
+
+            if updates:
+                self._call(self.worksheet.batch_update, updates, value_input_option='USER_ENTERED')
+            if new_keys:
+                response = self._call(self.worksheet.append_rows, [sheet_row(batch[key]) for key in new_keys],
+                                      value_input_option='USER_ENTERED', idempotent=False)
+                start = first_row(response['updates']['updatedRange'])
+                for number, key in enumerate(new_keys, start):
+                    self.positions[key] = number
+        except Exception as e:
+            # الصفوف تعود للانتظار (بدون الكتابة فوق قيم أحدث سُجلت أثناء الإرسال)
+            with self.lock:
+                for key, values in batch.items():
+                    self.pending.setdefault(key, values)
+            self.positions = None
+            self.last_error = e
+            registry.count('sheet_sync_failures')
+            raise
+
+        self.syncs += 1
+        self.rows_sent += len(batch)
+        self.last_error = None
+        registry.count('sheet_sync_rows', len(batch))
+        return len(batch)
+
+    def start(self):
+        """بدء خيط المزامنة الدورية"""
+        self.thread = threading.Thread(target=self._run, name='sheet-sync', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.sync_once()
+            except Exception:
+                # الخطأ محفوظ في last_error والصفوف تنتظر المحاولة التالية
+                continue
+
+    def stop(self, flush=True):
+        """إيقاف الخيط وإرسال ما تبقى (محاولة أخيرة عند الإغلاق)"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        if flush:
+            try:
+                self.sync_once()
+            except Exception:
+                pass
+        self.core.change_hooks.remove(self.mark)
+
+
+def open_worksheet(credentials_path, spreadsheet_key, title=None):
+    """فتح ورقة Google Sheets بحساب خدمة (gspread و google-auth يُستوردان عند الحاجة فقط)"""
+    import gspread
+
+    client = gspread.service_account(filename=credentials_path)
+    spreadsheet = client.open_by_key(spreadsheet_key)
+    return spreadsheet.worksheet(title) if title else spreadsheet.sheet1
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeAPIError(Exception):
+    """خطأ بنفس شكل gspread.exceptions.APIError (response.status_code)"""
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.response = FakeResponse(status_code)
+
+
+FAKE_NUMBER = re.compile(r'[+-]?(\d+\.?\d*|\.\d+)')
+FAKE_DATE = re.compile(r'(\d{4})-(\d{2})-(\d{2})( \d{2}:\d{2}:\d{2})?')
+
+
+def displayed_value(value, value_input_option):
+    """القيمة كما تعيدها get_all_values بعد كتابتها (ورقة بلغة en_US).
+
+    RAW تُحفظ كنص كما هي؛ USER_ENTERED تُفسر مثل الكتابة في الخلية: بادئة ' تعني نصاً حرفياً،
+    والأرقام والتواريخ تُحوَّل ('0012' ← 12، '2024-05-01' ← 5/1/2024).
+    """
+    text = str(value)
+    if value_input_option != 'USER_ENTERED':
+        return text
+    if text.startswith("'"):
+        return text[1:]
+    if FAKE_NUMBER.fullmatch(text):
+        number = float(text)
+        return str(int(number)) if number.is_integer() else str(number)
+    match = FAKE_DATE.fullmatch(text)
+    if match:
+        year, month, day, time_part = match.groups()
+        return f"{int(month)}/{int(day)}/{year}" + (time_part or '')
+    return text
+
+
+class FakeWorksheet:
+    """ورقة في الذاكرة بدوال gspread المستخدمة في المزامنة، مع تأخير لكل طلب وأخطاء مصطنعة.
+
+    القيم تُحفظ كما تعرضها الورقة (displayed_value)، فتحويل USER_ENTERED للأرقام والتواريخ يظهر هنا.
+    failures: رموز HTTP تُرفع بالترتيب في الطلبات التالية (None = طلب ناجح).
+    """
+
+    def __init__(self, title='Sheet1', latency=0.0, failures=()):
+        self.title = title
+        self.latency = latency
+        self.failures = list(failures)
+        self.rows = []
+        self.calls = Counter()
+
+    def _request(self, name):
+        self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failures:
+            status = self.failures.pop(0)
+            if status is not None:
+                raise FakeAPIError(status)
+
+    def get_all_values(self):
+        self._request('get_all_values')
+        return [list(row) for row in self.rows]
+
+    def append_rows(self, values, value_input_option='RAW'):
+        self._request('append_rows')
+        start = len(self.rows) + 1
+        self.rows.extend([displayed_value(value, value_input_option) for value in row] for row in values)
+        return {'updates': {'updatedRange': f"'{self.title}'!A{start}:{LAST_COLUMN}{len(self.rows)}",
+                            'updatedRows': len(values)}}
+
+    def batch_update(self, data, value_input_option='RAW'):
+        self._request('batch_update')
+        for item in data:
+            number = first_row(item['range'])
+            for offset, row in enumerate(item['values']):
+                while len(self.rows) < number + offset:
+                    self.rows.append([])
+                self.rows[number + offset - 1] = [displayed_value(value, value_input_option) for value in row]
+        return {'totalUpdatedRows': sum(len(item['values']) for item in data)}
+
+
+def main(argv=None):
+    """قياس المزامنة على ورقة تجريبية: عدد الطلبات والزمن مقارنة بطلب لكل صف"""
+    import shutil
+    import tempfile
+    from datetime import date as date_type
+    from datetime import datetime, timedelta
+
+    from core import AttendanceCore, AttendanceError
+    from synthetic import generate_dataset
+
+    parser = argparse.ArgumentParser(description="قياس مزامنة Google Sheets على ورقة تجريبية")
+    parser.add_argument('--employees', type=int, default=500)
+    parser.add_argument('--punches', type=int, default=5000)
+    parser.add_argument('--sync-every', type=int, default=500, help="عدد الحركات بين كل مزامنة")
+    parser.add_argument('--latency', type=float, default=0.2, help="زمن كل طلب للورقة بالثواني")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    data_dir = tempfile.mkdtemp(prefix='sheets-bench-')
+    try:
+        generate_dataset(data_dir, args.employees, 1 / 365, date_type.today() - timedelta(days=1), args.seed)
+        core = AttendanceCore('json', data_dir)
+        worksheet = FakeWorksheet(latency=args.latency)
+        sync = SheetSync(core, worksheet, sleep=lambda seconds: None)
+
+        emp_ids = sorted(core.employees)
+        now = datetime.now()
+        start = time.perf_counter()
+        for n in range(args.punches):
+            emp_id = rng.choice(emp_ids)
+            at = (now + timedelta(seconds=n)).strftime('%Y-%m-%d %H:%M:%S')
+            try:
+                if emp_id in core.open_sessions:
+                    core.apply_check_out(emp_id, at)
+                else:
+                    core.apply_check_in(emp_id, at)
+            except AttendanceError:
+                continue
+            if (n + 1) % args.sync_every == 0:
+                sync.sync_once()
+        sync.sync_once()
+        elapsed = time.perf_counter() - start
+
+        requests = sum(worksheet.calls.values())
+        print(f"{args.punches} حركة، {sync.rows_sent} صف مرسل، {len(worksheet.rows) - 1} صف في الورقة")
+        print(f"الطلبات: {requests} ({dict(worksheet.calls)}) في {elapsed:.1f} ثانية")
+        print(f"طلب لكل صف: {args.punches} طلب ≈ {args.punches * args.latency:.0f} ثانية")
+        core.storage.close()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""ملفات أشهر الحضور بتنسيق ثنائي مضغوط بالأعمدة (بديل أسرع من JSON للتاريخ الطويل).
+
+التنسيق (ترتيب البايتات little-endian):
+    رأس ثابت 24 بايت: MAGIC (8) | الإصدار u16 | خيارات u16 | crc32 للبيانات u32 | طول البيانات u64
+    البيانات (مضغوطة zlib): طول الوصف u32 | وصف JSON (التواريخ، الأكواد، الأوقات النصية، العدد)
+                             | رقم التاريخ u32[n] | رقم الموظف u32[n] | الحضور i64[n] | الانصراف i64[n]
+
+نوع الملف يُعرف من الرأس (storage.read_shard يقرأ الثنائي وJSON) وليس من الامتداد، وأي تلف في
+البيانات يظهر كخطأ SnapshotError بدلاً من تحميل بيانات ناقصة.
+
+تحويل يدوي: python snapfile.py to-json 2024-05.snap 2024-05.json  (أو to-snap للعكس)
+"""
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections import defaultdict
+
+from models import Session
+
+MAGIC = b'\x89ATTSNP\n'
+VERSION = 1
+HEADER = struct.Struct('<8sHHIQ')
+
+FLAG_ZLIB = 1
+
+# الأوقات: رقم الثواني، أو NULL (بدون وقت)، أو TEXT + رقم النص (قيمة لم يمكن قراءتها كوقت)
+NULL = -2 ** 63
+TEXT = NULL + 1
+
+
+class SnapshotError(ValueError):
+    """ملف لقطة غير صالح (رأس غير معروف، إصدار أحدث، أو تلف في البيانات)"""
+
+
+def is_snapshot(path):
+    """هل يبدأ الملف برأس اللقطة الثنائية"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except FileNotFoundError:
+        return False
+
+
+def _little_endian(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def encode_shard(shard):
+    """بايتات اللقطة لشهر: shard هو {التاريخ: {الكود: [(الحضور، الانصراف)]}} بأوقات parse_time"""
+    dates = []
+    emp_ids = []
+    emp_index = {}
+    texts = []
+    date_col = array('I')
+    emp_col = array('I')
+    start_col = array('q')
+    end_col = array('q')
+
+    def encode_time(value):
+        if value is None:
+            return NULL
+        if isinstance(value, int):
+            return value
+        texts.append(value)
+        return TEXT + len(texts) - 1
+
+    for date in sorted(shard):
+        date_no = len(dates)
+        dates.append(date)
+        for emp_id, records in shard[date].items():
+            emp_no = emp_index.get(emp_id)
+            if emp_no is None:
+                emp_no = emp_index[emp_id] = len(emp_ids)
+                emp_ids.append(emp_id)
+            for start, end in records:
+                date_col.append(date_no)
+                emp_col.append(emp_no)
+                start_col.append(encode_time(start))
+                end_col.append(encode_time(end))
+
+    meta = json.dumps({'dates': dates, 'emp_ids': emp_ids, 'texts': texts, 'count': len(date_col)},
+                      ensure_ascii=False).encode('utf-8')
+    payload = b''.join([struct.pack('<I', len(meta)), meta]
+                       + [_little_endian(column).tobytes() for column in (date_col, emp_col, start_col, end_col)])
+    payload = zlib.compress(payload, 1)
+    return HEADER.pack(MAGIC, VERSION, FLAG_ZLIB, zlib.crc32(payload), len(payload)) + payload
+
+
+def decode_shard(data):
+    """عكس encode_shard: {التاريخ: {الكود: [Session]}}"""
+    if len(data) < HEADER.size:
+        raise SnapshotError("ملف اللقطة ناقص")
+    magic, version, flags, checksum, length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("ليس ملف لقطة")
+    if version > VERSION:
+        raise SnapshotError(f"إصدار ملف اللقطة ({version}) أحدث من البرنامج")
+    payload = data[HEADER.size:HEADER.size + length]
+    if len(payload) != length or zlib.crc32(payload) != checksum:
+        raise SnapshotError("ملف اللقطة تالف (checksum)")
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+
+    meta_length = struct.unpack_from('<I', payload)[0]
+    meta = json.loads(payload[4:4 + meta_length].decode('utf-8'))
+    count = meta['count']
+    offset = 4 + meta_length
+    columns = []
+    for typecode in ('I', 'I', 'q', 'q'):
+        column = array(typecode)
+        size = column.itemsize * count
+        column.frombytes(payload[offset:offset + size])
+        columns.append(_little_endian(column))
+        offset += size
+
+    dates = meta['dates']
+    emp_ids = [sys.intern(emp_id) for emp_id in meta['emp_ids']]
+    texts = meta['texts']
+
+    # القيم الأصغر من special ليست أوقاتاً عادية (NULL أو TEXT + رقم)
+    special = TEXT + len(texts)
+
+    def decode_time(value):
+        if value == NULL:
+            return None
+        if value < special:
+            return texts[value - TEXT]
+        return value
+
+    shard = {}
+    records = None
+    last = None
+    for date_no, emp_no, start, end in zip(*columns):
+        if (date_no, emp_no) != last:
+            last = (date_no, emp_no)
+            day = shard.get(dates[date_no])
+            if day is None:
+                day = shard[dates[date_no]] = defaultdict(list)
+            records = day[emp_ids[emp_no]]
+        if start < special or end < special:
+            records.append(Session.from_epochs(decode_time(start), decode_time(end)))
+        else:
+            records.append(Session.from_epochs(start, end))
+    return shard
+
+
+def write_shard(path, shard):
+    """كتابة لقطة شهر بشكل آمن (ملف مؤقت ثم استبدال)"""
+    data = encode_shard(shard)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def shard_to_json(shard):
+    """قاموس JSON بنفس تنسيق ملفات الأشهر النصية"""
+    return {date: {emp_id: [record.to_dict() for record in records] for emp_id, records in employees.items()}
+            for date, employees in shard.items()}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 3 or argv[0] not in ('to-json', 'to-snap'):
+        print("الاستخدام: python snapfile.py to-json|to-snap INPUT OUTPUT")
+        return 2
+    from storage import read_shard
+
+    command, source, target = argv
+    shard = read_shard(source)
+    if command == 'to-json':
+        with open(target, 'w', encoding='utf-8') as f:
+            json.dump(shard_to_json(shard), f, indent=4, ensure_ascii=False)
+    else:
+        write_shard(target, {date: {emp_id: [(record.start, record.end) for record in records]
+                                    for emp_id, records in employees.items()}
+                             for date, employees in shard.items()})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,957 @@
+import itertools
+import json
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+import snapfile
+from archive import ArchiveStore
+from journal import PunchJournal
+from metrics import registry, timed
+from models import Session, format_time, intern_id, parse_time
+
+# امتداد ملفات الأشهر لكل تنسيق (التنسيق الفعلي عند القراءة يُعرف من رأس الملف)
+SHARD_EXTENSIONS = {'json': '.json', 'binary': '.snap'}
+
+
+def new_attendance():
+    """هيكل فارغ لسجلات الحضور: التاريخ ← كود الموظف ← قائمة الجلسات"""
+    return defaultdict(lambda: defaultdict(list))
+
+
+def convert_old_data(old_data):
+    """تحويل البيانات القديمة إلى الهيكل الجديد"""
+    new_data = new_attendance()
+    for date, employees in old_data.items():
+        for emp_id, records in employees.items():
+            emp_id = intern_id(emp_id)
+            if isinstance(records, dict):
+                if 'check_in' in records:
+                    new_data[date][emp_id].append(Session.from_dict(records))
+            elif isinstance(records, list):
+                for record in records:
+                    if 'check_in' in record:
+                        new_data[date][emp_id].append(Session.from_dict(record))
+    return new_data
+
+
+def merge_attendance(attendance, live):
+    """إضافة السجلات الحية فوق سجلات الأرشيف لنفس الأيام (الجلسة الحية تحل محل جلسة الأرشيف بنفس وقت الحضور)"""
+    for date, employees in live.items():
+        day = attendance[date]
+        for emp_id, records in employees.items():
+            existing = day.get(emp_id)
+            if not existing:
+                day[emp_id] = records
+                continue
+            positions = {record.start: i for i, record in enumerate(existing)}
+            for record in records:
+                i = positions.get(record.start)
+                if i is None:
+                    existing.append(record)
+                else:
+                    existing[i] = record
+    return attendance
+
+
+def archive_shards(attendance):
+    """سجلات محملة {التاريخ: {الكود: [Session]}} بصيغة ArchiveStore.write_year (شهر ← أيامه)"""
+    shards = {}
+    for date, employees in attendance.items():
+        if employees:
+            shards.setdefault(month_of(date), {})[date] = {
+                emp_id: [(record.start, record.end) for record in records] for emp_id, records in employees.items()}
+    return shards
+
+
+def month_of(date):
+    """الشهر (YYYY-MM) الذي ينتمي له تاريخ بصيغة YYYY-MM-DD"""
+    return date[:7]
+
+
+def months_between(start_date, end_date):
+    """قائمة الأشهر (YYYY-MM) التي تغطيها فترة بين تاريخين"""
+    year, month = int(start_date[:4]), int(start_date[5:7])
+    last = month_of(end_date)
+    months = []
+    while True:
+        current = f"{year:04d}-{month:02d}"
+        if current > last:
+            return months
+        months.append(current)
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+
+
+def write_json(path, data):
+    """كتابة ملف JSON بشكل آمن (ملف مؤقت ثم استبدال)"""
+    tmp_path = path + '.tmp'
+    with registry.timer('json_encode'):
+        text = json.dumps(data, indent=4, ensure_ascii=False)
+    with registry.timer('disk_write'):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+def read_shard(path):
+    """قراءة ملف شهر بأي تنسيق حسب رأسه: لقطة ثنائية أو JSON (يعيد {التاريخ: {الكود: [Session]}})"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(snapfile.MAGIC)] == snapfile.MAGIC:
+        with registry.timer('snap_decode'):
+            return snapfile.decode_shard(data)
+
+    with registry.timer('json_decode'):
+        shard = json.loads(data.decode('utf-8'))
+    # قراءة الأوقات (strptime) منفصلة عن قراءة JSON لمعرفة أيهما أبطأ
+    with registry.timer('parse_sessions'):
+        return convert_old_data(shard)
+
+
+def write_shard(path, shard, shard_format):
+    """كتابة شهر {التاريخ: {الكود: [(الحضور، الانصراف)]}} بالتنسيق المطلوب"""
+    if shard_format == 'binary':
+        with registry.timer('snap_write'):
+            snapfile.write_shard(path, shard)
+        return
+    write_json(path, {
+        date: {emp_id: [{'check_in': format_time(start), 'check_out': format_time(end)}
+                        for start, end in records]
+               for emp_id, records in employees.items()}
+        for date, employees in shard.items()})
+
+
+class JsonStorage:
+    """تخزين البيانات في ملفات مقسمة حسب الشهر مع سجل إلحاقي للحركات.
+
+    shard_format: تنسيق كتابة ملفات الأشهر، 'json' (نصي) أو 'binary' (لقطة snapfile مضغوطة أسرع
+    بكثير في التحميل). القراءة تقبل التنسيقين دائماً، فتغيير الإعداد يحول كل شهر عند حفظه التالي.
+    """
+
+    def __init__(self, data_dir='data', compact_threshold=500, shard_format='json', read_only=False):
+        if shard_format not in SHARD_EXTENSIONS:
+            raise ValueError(f"تنسيق غير معروف: {shard_format}")
+        self.data_dir = data_dir
+        self.shard_format = shard_format
+        # قارئ فقط (مثل لوحة الويب) بجانب البرنامج أو الخدمة التي تملك الكتابة: لا ترحيل ولا فتح للسجل
+        self.read_only = read_only
+        self.employees_path = os.path.join(data_dir, 'employees.json')
+        self.tombstones_path = os.path.join(data_dir, 'tombstones.json')
+        self.legacy_attendance_path = os.path.join(data_dir, 'attendance.json')
+        self.shards_dir = os.path.join(data_dir, 'attendance')
+        self.manifest_path = os.path.join(self.shards_dir, 'manifest.json')
+        self.compact_threshold = compact_threshold
+        # عدد الحركات في السجل الذي يبدأ عنده الضغط التالي (يتأجل بعد فشل لقطة بدلاً من إعادتها مع كل حركة)
+        self.next_compaction = compact_threshold
+        # آخر خطأ في كتابة لقطة الضغط الخلفي (None إذا نجحت)
+        self.compaction_error = None
+        self.journal = PunchJournal(os.path.join(data_dir, 'attendance.journal'))
+        # السنوات المغلقة المؤرشفة (للقراءة فقط، تُفتح عند الحاجة)
+        self.archive = ArchiveStore(data_dir)
+        # لقطة mmap للعمليات المتوازية: تُحدث مع كل كتابة شهر إذا كان مجلدها موجوداً (mapsnap.py build).
+        # نفس mapsnap.mapped_dir؛ mapsnap (ومعه multiprocessing) لا يُستورد إلا عند استخدام اللقطة
+        self.mapped_dir = os.path.join(data_dir, 'mapped')
+        self.employees = {}
+        self.attendance = new_attendance()
+        self.loaded_months = set()
+        # الأشهر التي تغيرت منذ آخر لقطة (الأشهر الأخرى لا يعاد كتابتها)
+        self.dirty_months = set()
+        # الأشهر التي بها جلسات مفتوحة حسب آخر لقطة
+        self.open_months = set()
+        # attendance.json القديم مقروءاً في الذاكرة (قارئ فقط قبل أن يقسمه البرنامج لملفات شهرية)
+        self.legacy_attendance = None
+        # رقم آخر لقطة كُتبت لكل ملف: اللقطات قد تُكتب من أكثر من خيط (الضغط/الحفظ في الخلفية)
+        # فلا يُسمح للقطة أقدم أن تكتب فوق ملف كتبته لقطة أحدث
+        self.snapshot_seq = itertools.count(1)
+        self.written_seq = {}
+        self.write_lock = threading.Lock()
+
+    def shard_path(self, month, shard_format=None):
+        return os.path.join(self.shards_dir, month + SHARD_EXTENSIONS[shard_format or self.shard_format])
+
+    def existing_shard_path(self, month):
+        """ملف الشهر الموجود على القرص (بالتنسيق الحالي أولاً)، أو None"""
+        for shard_format in [self.shard_format] + [name for name in SHARD_EXTENSIONS if name != self.shard_format]:
+            path = self.shard_path(month, shard_format)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def months(self):
+        """كل الأشهر المحفوظة على القرص"""
+        months = set()
+        if self.legacy_attendance is not None:
+            months.update(month_of(date) for date in self.legacy_attendance)
+        try:
+            names = os.listdir(self.shards_dir)
+        except FileNotFoundError:
+            return sorted(months)
+        for name in names:
+            month, extension = os.path.splitext(name)
+            if extension in SHARD_EXTENSIONS.values() and name != 'manifest.json':
+                months.add(month)
+        return sorted(months)
+
+    def load(self):
+        """تحميل الشهر الحالي والأشهر التي بها جلسات مفتوحة فقط (باقي الأشهر عند الحاجة)"""
+        self.employees = self.load_employees()
+        # عملية أخرى قد تكون أرشفت سنة أو أعادت كتابة أرشيف منذ التحميل السابق
+        self.archive.reload()
+
+        self.legacy_attendance = None
+        legacy = not os.path.exists(self.manifest_path) and os.path.exists(self.legacy_attendance_path)
+        if not self.read_only:
+            if legacy:
+                self._split_legacy_file()
+            os.makedirs(self.shards_dir, exist_ok=True)
+        elif legacy:
+            # القارئ لا يقسم الملف على القرص (هذه مهمة البرنامج أو الخدمة): يُقرأ كاملاً في الذاكرة
+            self.legacy_attendance = self._read_legacy_file()
+
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.open_months = set(json.load(f).get('open_months', []))
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.open_months = set()
+        if self.legacy_attendance is not None:
+            self.open_months = {month_of(date) for date, employees in self.legacy_attendance.items()
+                                if any(record.is_open for records in employees.values() for record in records)}
+
+        # الحركات المسجلة بعد آخر لقطة تحتاج أشهرها في الذاكرة قبل إعادة تطبيقها
+        entries = self.journal_entries()
+        months = {month_of(datetime.now().strftime('%Y-%m-%d'))} | self.open_months
+        months.update(month_of(entry['date']) for entry in entries)
+
+        self.attendance = self.load_months(months)
+        self.loaded_months = set(months)
+
+        for entry in entries:
+            self.apply_journal_entry(entry)
+        if not self.read_only:
+            self.journal.open()
+
+        return self.employees, self.attendance, self.loaded_months
+
+    def journal_entries(self):
+        """حركات السجل بعد آخر لقطة بالترتيب، كل حركة قاموس (الدفعات مفككة)"""
+        entries = []
+        for entry in self.journal.replay():
+            if entry['op'] == 'batch':
+                entries.extend({'op': op, 'date': date, 'emp': emp_id, 'in': check_in, 'at': at}
+                               for op, date, emp_id, check_in, at in entry['punches'])
+            else:
+                entries.append(entry)
+        return entries
+
+    def load_employees(self):
+        try:
+            with open(self.employees_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @timed('open_session')
+    def open_session(self, emp_id):
+        """(التاريخ، وقت الحضور) لحضور الموظف المفتوح، أو None، بدون تحميل الجلسات (استعلام سريع).
+
+        تُقرأ فقط أشهر manifest التي بها جلسات مفتوحة ويُبحث فيها عن الموظف على JSON مباشرة بدون تحويل
+        أوقات كل جلسات الشهر، ثم تُطبق حركاته في السجل. ملف attendance.json القديم (قبل أن يقسمه البرنامج
+        أو الخدمة) يُقرأ كاملاً لأن أشهره غير معروفة قبل قراءته.
+        """
+        session = None
+        for shard in self._open_shards():
+            for date in sorted(shard):
+                records = shard[date].get(emp_id)
+                for record in [records] if isinstance(records, dict) else records or ():
+                    if record.get('check_in') and not record.get('check_out'):
+                        session = (date, record['check_in'])
+
+        for entry in self.journal_entries():
+            if entry['emp'] != emp_id:
+                continue
+            if entry['op'] == 'in':
+                session = (entry['date'], entry['at'])
+            elif entry['op'] == 'out' and session == (entry['date'], entry['in']):
+                session = None
+        return session
+
+    def _open_shards(self):
+        """الأشهر التي بها جلسات مفتوحة بصيغة JSON الخام {التاريخ: {الكود: [{'check_in', 'check_out'}]}}"""
+        if not os.path.exists(self.manifest_path) and os.path.exists(self.legacy_attendance_path):
+            try:
+                with open(self.legacy_attendance_path, 'r', encoding='utf-8') as f:
+                    yield json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                pass
+            return
+
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                open_months = json.load(f).get('open_months', [])
+        except (FileNotFoundError, json.JSONDecodeError):
+            open_months = []
+        for month in sorted(open_months):
+            path = self.existing_shard_path(month)
+            if path is None:
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                if data[:len(snapfile.MAGIC)] == snapfile.MAGIC:
+                    # من اللقطة الثنائية تكفي الجلسات المفتوحة
+                    shard = {date: {emp_id: [record.to_dict() for record in records if record.is_open]
+                                    for emp_id, records in employees.items()}
+                             for date, employees in snapfile.decode_shard(data).items()}
+                else:
+                    shard = json.loads(data.decode('utf-8'))
+            except (FileNotFoundError, ValueError):
+                continue
+            yield shard
+
+    def data_version(self):
+        """بصمة رخيصة لحالة الملفات تتغير مع كل حفظ (إلحاق بالسجل أو لقطة أو حفظ الموظفين أو أرشفة)"""
+        version = [self.archive.version()]
+        for path in (self.employees_path, self.tombstones_path, self.manifest_path,
+                     self.journal.path, self.journal.old_path):
+            try:
+                stat = os.stat(path)
+                version.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                version.append(None)
+        return tuple(version)
+
+    def load_months(self, months):
+        """قراءة ملفات أشهر محددة (من الملفات الحية ثم من الأرشيف للأشهر المؤرشفة)"""
+        live = new_attendance()
+        if self.legacy_attendance is not None:
+            live.update({date: employees for date, employees in self.legacy_attendance.items()
+                         if month_of(date) in months})
+        for month in sorted(months):
+            path = self.existing_shard_path(month)
+            if path is None:
+                continue
+            try:
+                live.update(read_shard(path))
+            except FileNotFoundError:
+                # نُقل للأرشيف بعد البحث عنه؛ الأرشيف يُقرأ بعده
+                continue
+            except ValueError:
+                # JSON أو لقطة تالفة
+                continue
+        attendance = new_attendance()
+        attendance.update(self.archive.read_months(months))
+        return merge_attendance(attendance, live)
+
+    def pinned_months(self):
+        """أشهر لا يجوز إخراجها من الذاكرة: المتغيرة منذ آخر لقطة والتي بها جلسات مفتوحة"""
+        return self.dirty_months | self.open_months
+
+    def archivable_years(self):
+        """السنوات السابقة للسنة الحالية التي لها ملفات حية وليس بها جلسات مفتوحة"""
+        current = datetime.now().strftime('%Y')
+        open_years = {month[:4] for month in self.open_months}
+        return sorted({month[:4] for month in self.months() if month[:4] < current} - open_years)
+
+    @timed('archive_year')
+    def archive_year(self, year):
+        """نقل كل أشهر سنة مغلقة إلى أرشيفها المضغوط ثم حذف ملفاتها الحية (خيط الحفظ)؛ يعيد الفهرس"""
+        year = str(year)
+        self.journal.wait_for_compaction()
+        with self.write_lock:
+            if any(month[:4] == year for month in self.open_months):
+                raise ValueError(f"السنة {year} بها جلسات مفتوحة")
+            live_months = [month for month in self.months() if month[:4] == year]
+            archived = [month for month in self.archive.months() if month[:4] == year]
+            shards = archive_shards(self.load_months(live_months + archived))
+            index = self.archive.write_year(year, shards)
+            for month, shard in shards.items():
+                self._write_mapped(month, shard)
+            for month in live_months:
+                for shard_format in SHARD_EXTENSIONS:
+                    path = self.shard_path(month, shard_format)
+                    if os.path.exists(path):
+                        os.remove(path)
+        return index
+
+    def _read_legacy_file(self):
+        """سجلات ملف attendance.json القديم، أو None إذا كان تالفاً"""
+        try:
+            with open(self.legacy_attendance_path, 'r', encoding='utf-8') as f:
+                return convert_old_data(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            # تالف، أو قسمه البرنامج للتو (القارئ يرى ملفات الأشهر عند التحديث التالي)
+            return None
+
+    def _split_legacy_file(self):
+        """ترحيل ملف attendance.json القديم إلى ملفات شهرية (مرة واحدة)"""
+        attendance = self._read_legacy_file()
+        if attendance is None:
+            return
+        self.attendance = attendance
+
+        os.makedirs(self.shards_dir, exist_ok=True)
+        self.dirty_months = {month_of(date) for date in self.attendance}
+        self._write_snapshot(self._take_snapshot())
+        os.replace(self.legacy_attendance_path, self.legacy_attendance_path + '.bak')
+
+    def apply_journal_entry(self, entry):
+        """تطبيق حركة من سجل الحركات على البيانات (بدون أثر عند التكرار)"""
+        self.dirty_months.add(month_of(entry['date']))
+        if entry['op'] == 'in':
+            records = self.attendance[entry['date']][intern_id(entry['emp'])]
+            start = parse_time(entry['at'])
+            if not any(record.start == start for record in records):
+                records.append(Session(entry['at']))
+        elif entry['op'] == 'out':
+            start = parse_time(entry['in'])
+            for record in self.attendance.get(entry['date'], {}).get(entry['emp'], []):
+                if record.start == start and record.end is None:
+                    record.check_out = entry['at']
+                    break
+
+    def _take_snapshot(self):
+        """نسخة من الأشهر المتغيرة فقط مع قائمة الأشهر التي بها جلسات مفتوحة.
+
+        النسخة تحفظ الأوقات كأرقام فقط؛ تحويلها لنصوص وكتابتها يتم في خيط الضغط.
+        """
+        shards = {month: {} for month in self.dirty_months}
+        with_open = set()
+        for date, employees in self.attendance.items():
+            month = month_of(date)
+            shard = shards.get(month)
+            if shard is not None and employees:
+                shard[date] = {emp_id: [(record.start, record.end) for record in records]
+                               for emp_id, records in employees.items()}
+                if month not in with_open and any(record.is_open
+                                                  for records in employees.values()
+                                                  for record in records):
+                    with_open.add(month)
+
+        self.open_months = (self.open_months - set(shards)) | with_open
+        self.dirty_months = set()
+        return {'seq': next(self.snapshot_seq), 'shards': shards, 'open_months': sorted(self.open_months)}
+
+    def _write_snapshot(self, snapshot):
+        for month, shard in snapshot['shards'].items():
+            self._write_file(self.shard_path(month), snapshot['seq'], lambda: shard,
+                             lambda path, data: self._write_shard(month, data))
+        self._write_file(self.manifest_path, snapshot['seq'], lambda: {'open_months': snapshot['open_months']})
+
+    def _write_shard(self, month, shard):
+        """كتابة الشهر بالتنسيق الحالي وحذف نسخته بالتنسيق الآخر إن وجدت"""
+        write_shard(self.shard_path(month), shard, self.shard_format)
+        for shard_format in SHARD_EXTENSIONS:
+            if shard_format != self.shard_format and os.path.exists(self.shard_path(month, shard_format)):
+                os.remove(self.shard_path(month, shard_format))
+        self._write_mapped(month, shard)
+
+    def _write_mapped(self, month, shard):
+        """تحديث لقطة mmap للشهر إذا كانت مفعلة"""
+        if os.path.isdir(self.mapped_dir):
+            import mapsnap
+
+            with registry.timer('mapped_write'):
+                mapsnap.write_month(os.path.join(self.mapped_dir, month + mapsnap.EXTENSION), shard)
+
+    def build_mapped(self):
+        """بناء لقطة mmap لكل الأشهر الحية والمؤرشفة (مرة واحدة لتفعيلها، بعد load)؛ يعيد عدد الأشهر"""
+        os.makedirs(self.mapped_dir, exist_ok=True)
+        months = sorted(set(self.months()) | set(self.archive.months()) | self.loaded_months)
+        with self.write_lock:
+            for month in months:
+                if month in self.loaded_months:
+                    # الأشهر المحملة من الذاكرة: فيها حركات السجل التي لم تُكتب في ملف الشهر بعد
+                    attendance = {date: employees for date, employees in self.attendance.items()
+                                  if month_of(date) == month}
+                else:
+                    attendance = self.load_months([month])
+                self._write_mapped(month, archive_shards(attendance).get(month, {}))
+        return len(months)
+
+    def _purge_mapped(self, emp_ids):
+        """إعادة كتابة لقطات mmap للأشهر المؤرشفة فقط التي بها الموظفون بعد مسحهم من الأرشيف"""
+        if not os.path.isdir(self.mapped_dir):
+            return
+        import mapsnap
+
+        live = set(self.months()) | self.loaded_months
+        for month in sorted(set(self.archive.months()) - live):
+            path = os.path.join(self.mapped_dir, month + mapsnap.EXTENSION)
+            try:
+                mapped = mapsnap.MappedMonth(path)
+            except (FileNotFoundError, ValueError):
+                continue
+            try:
+                present = any(mapped.find(emp_id) is not None for emp_id in emp_ids)
+            finally:
+                mapped.close()
+            if present:
+                with self.write_lock:
+                    self._write_mapped(month, archive_shards(self.load_months([month])).get(month, {}))
+
+    def _write_file(self, path, seq, build, write=write_json):
+        with self.write_lock:
+            if self.written_seq.get(path, 0) > seq:
+                return
+            write(path, build())
+            self.written_seq[path] = seq
+
+    def save(self, employees, attendance):
+        """حفظ الموظفين والأشهر المتغيرة وتفريغ سجل الحركات"""
+        self.write(self.snapshot(employees, attendance))
+
+    @timed('save_snapshot')
+    def snapshot(self, employees, attendance):
+        """لقطة في الذاكرة لما يحتاج للحفظ (سريعة، في خيط الواجهة)؛ الكتابة نفسها في write"""
+        self.employees, self.attendance = employees, attendance
+        self.journal.wait_for_compaction()
+        snapshot = self._take_snapshot()
+        snapshot['employees'] = {emp_id: dict(data) for emp_id, data in employees.items()}
+        # الحركات بعد اللقطة تذهب لسجل جديد فلا تضيع إذا وصلت أثناء الكتابة
+        snapshot['rotated'] = self.journal.rotate()
+        return snapshot
+
+    @timed('save_write')
+    def write(self, snapshot):
+        """كتابة لقطة على القرص (يمكن تشغيلها في خيط خلفي)"""
+        try:
+            self._write_file(self.employees_path, snapshot['seq'], lambda: snapshot['employees'])
+            self._write_snapshot(snapshot)
+        except Exception:
+            # مثل فشل لقطة الضغط: الجزء القديم يعود للسجل (وإلا يرفض rotate كل تدوير تالٍ)
+            # وأشهر اللقطة تعود متغيرة للحفظ التالي
+            self.dirty_months.update(snapshot['shards'])
+            if snapshot['rotated']:
+                self.journal.restore_rotated()
+            raise
+        if snapshot['rotated']:
+            self.journal.drop_rotated()
+
+    def save_employees(self, employees, tombstones=None):
+        """حفظ بيانات الموظفين فقط (والمحذوفين قبلها إن وجدوا، فلا يعود موظف محذوف بعد انقطاع)"""
+        seq = next(self.snapshot_seq)
+        if tombstones is not None:
+            self._write_file(self.tombstones_path, seq,
+                             lambda: {emp_id: dict(tombstone) for emp_id, tombstone in tombstones.items()})
+        self._write_file(self.employees_path, seq,
+                         lambda: {emp_id: dict(data) for emp_id, data in employees.items()})
+
+    def load_tombstones(self):
+        """الموظفون المحذوفون الذين لم تُمسح سجلاتهم بعد: الكود ← (employee, deleted_at)"""
+        try:
+            with open(self.tombstones_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def forget_employees(self, emp_ids):
+        """سجلات الموظفين حُذفت من الأشهر المحملة في الذاكرة: تُعاد كتابتها في الحفظ التالي (خيط الواجهة)"""
+        self.dirty_months.update(self.loaded_months)
+
+    def purge_employees(self, emp_ids):
+        """مسح سجلات موظفين من الأشهر غير المحملة على القرص، بقراءة وكتابة كل شهر مرة واحدة للدفعة.
+
+        تعمل في خيط الحفظ الخلفي؛ الأشهر المحملة تُكتب من الذاكرة عبر forget_employees والحفظ التالي.
+        """
+        emp_ids = {str(emp_id) for emp_id in emp_ids}
+        self.journal.wait_for_compaction()
+        purged = 0
+        for month in self.months():
+            if month in self.loaded_months:
+                continue
+            with self.write_lock:
+                shard = read_shard(self.existing_shard_path(month))
+                if not any(emp_id in employees for employees in shard.values() for emp_id in emp_ids):
+                    continue
+                for employees in shard.values():
+                    for emp_id in emp_ids:
+                        purged += len(employees.pop(emp_id, ()))
+                self._write_shard(month, {date: {emp: [(record.start, record.end) for record in records]
+                                                 for emp, records in employees.items()}
+                                          for date, employees in shard.items() if employees})
+        purged += self.archive.purge_employees(emp_ids)
+        self._purge_mapped(emp_ids)
+        return purged
+
+    def export_json(self, path):
+        """تصدير كل الحضور (كل الأشهر) في ملف JSON واحد بتنسيق attendance.json القديم.
+
+        نفس الملف يمكن استيراده بوضعه في مجلد بيانات جديد كـ attendance.json.
+        """
+        attendance = self.load_months((set(self.months()) | set(self.archive.months())) - self.loaded_months)
+        attendance.update({date: employees for date, employees in self.attendance.items()
+                           if month_of(date) in self.loaded_months})
+        write_json(path, {date: {emp_id: [record.to_dict() for record in records]
+                                 for emp_id, records in employees.items()}
+                          for date, employees in sorted(attendance.items()) if employees})
+        return path
+
+    def record_check_in(self, date, emp_id, record):
+        """حفظ حركة حضور واحدة"""
+        self.dirty_months.add(month_of(date))
+        self._record({'op': 'in', 'date': date, 'emp': emp_id, 'at': record.check_in})
+
+    def record_check_out(self, date, emp_id, record):
+        """حفظ حركة انصراف واحدة"""
+        self.dirty_months.add(month_of(date))
+        self._record({'op': 'out', 'date': date, 'emp': emp_id,
+                      'in': record.check_in, 'at': record.check_out})
+
+    def record_punches(self, ops):
+        """حفظ دفعة حركات (من الاستيراد) في سطر واحد بالسجل"""
+        self.dirty_months.update({month_of(op[1]) for op in ops})
+        punches = [[kind, date, emp_id, check_in, at] for kind, date, emp_id, _, _, check_in, at in ops]
+        self._record({'op': 'batch', 'punches': punches}, weight=len(punches))
+
+    def _record(self, entry, weight=1):
+        self.journal.append(entry, weight=weight)
+
+        if self.journal.entries_count >= self.next_compaction and not self.journal.compacting:
+            registry.count('journal_compactions')
+            self.next_compaction = self.compact_threshold
+            snapshot = self._take_snapshot()
+            if not self.journal.start_compaction(snapshot, self._write_snapshot,
+                                                 lambda error: self._compaction_failed(snapshot, error)):
+                self.dirty_months.update(snapshot['shards'])
+
+    def _compaction_failed(self, snapshot, error):
+        """فشل لقطة الضغط (خيط الضغط): أشهرها تعود متغيرة للحفظ التالي، والمحاولة التالية بعد دفعة حركات جديدة"""
+        self.dirty_months.update(snapshot['shards'])
+        self.compaction_error = error
+        self.next_compaction = self.journal.entries_count + self.compact_threshold
+
+    def close(self):
+        self.journal.close()
+
+
+class SqliteStorage:
+    """تخزين البيانات في قاعدة SQLite مفهرسة (تحميل الأشهر عند الحاجة)"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS employees (
+            emp_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            department TEXT NOT NULL DEFAULT '',
+            monthly_salary REAL NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS tombstones (
+            emp_id TEXT PRIMARY KEY,
+            employee TEXT NOT NULL,
+            deleted_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY,
+            emp_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            check_in TEXT NOT NULL,
+            check_out TEXT NOT NULL DEFAULT ''
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_emp_date
+            ON attendance (emp_id, date, check_in);
+        CREATE INDEX IF NOT EXISTS idx_attendance_date
+            ON attendance (date);
+        CREATE INDEX IF NOT EXISTS idx_attendance_open
+            ON attendance (emp_id) WHERE check_out = '';
+    """
+
+    def __init__(self, data_dir='data', read_only=False):
+        self.data_dir = data_dir
+        self.db_path = os.path.join(data_dir, 'attendance.db')
+        self.read_only = read_only
+        self.conn = None
+        # السنوات المغلقة المؤرشفة: صفوفها تُحذف من القاعدة وتُقرأ من الأرشيف عند الحاجة
+        self.archive = ArchiveStore(data_dir)
+
+    def connect(self):
+        """فتح الاتصال مرة واحدة (إنشاء القاعدة أو ترحيل JSON عند أول تشغيل، إلا في وضع القراءة فقط)"""
+        if self.conn is not None:
+            return
+        if self.read_only:
+            # القاعدة يجب أن يكون أنشأها البرنامج أو الخدمة
+            self.conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, check_same_thread=False)
+            return
+
+        is_new = not os.path.exists(self.db_path)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+
+        if is_new:
+            migrate_json_to_sqlite(self.data_dir)
+
+    def load(self):
+        """تحميل الموظفين والشهر الحالي والأشهر التي بها جلسات مفتوحة فقط"""
+        self.connect()
+        employees = self.load_employees()
+        self.archive.reload()
+
+        months = {month_of(datetime.now().strftime('%Y-%m-%d'))}
+        months.update(row[0] for row in self.conn.execute(
+            "SELECT DISTINCT substr(date, 1, 7) FROM attendance WHERE check_out = ''"))
+
+        return employees, self.load_months(months), set(months)
+
+    def load_employees(self):
+        self.connect()
+        employees = {}
+        for emp_id, name, department, monthly_salary in self.conn.execute(
+                'SELECT emp_id, name, department, monthly_salary FROM employees'):
+            employees[emp_id] = {
+                'name': name,
+                'department': department,
+                'monthly_salary': monthly_salary
+            }
+        return employees
+
+    @timed('open_session')
+    def open_session(self, emp_id):
+        """(التاريخ، وقت الحضور) لحضور الموظف المفتوح، أو None، بدون تحميل الجلسات (استعلام سريع)"""
+        self.connect()
+        return self.conn.execute(
+            "SELECT date, check_in FROM attendance WHERE emp_id = ? AND check_out = '' "
+            "ORDER BY date DESC, id DESC LIMIT 1", (emp_id,)).fetchone()
+
+    def load_months(self, months):
+        """تحميل سجلات أشهر محددة فقط باستخدام فهرس التاريخ (والأرشيف للأشهر المؤرشفة)"""
+        live = new_attendance()
+        for month in sorted(months):
+            rows = self.conn.execute(
+                'SELECT date, emp_id, check_in, check_out FROM attendance '
+                'WHERE date BETWEEN ? AND ? ORDER BY date, id',
+                (month + '-01', month + '-31'))
+            for date, emp_id, check_in, check_out in rows:
+                live[date][intern_id(emp_id)].append(Session(check_in, check_out))
+        attendance = new_attendance()
+        attendance.update(self.archive.read_months(months))
+        return merge_attendance(attendance, live)
+
+    def pinned_months(self):
+        """لا شيء: كل حركة تُكتب في القاعدة فوراً"""
+        return set()
+
+    def archivable_years(self):
+        """السنوات السابقة للسنة الحالية التي لها صفوف في القاعدة وليس بها جلسات مفتوحة"""
+        current = datetime.now().strftime('%Y')
+        years = {row[0] for row in self.conn.execute(
+            'SELECT DISTINCT substr(date, 1, 4) FROM attendance WHERE date < ?', (current,))}
+        open_years = {row[0] for row in self.conn.execute(
+            "SELECT DISTINCT substr(date, 1, 4) FROM attendance WHERE check_out = ''")}
+        return sorted(years - open_years)
+
+    @timed('archive_year')
+    def archive_year(self, year):
+        """نقل صفوف سنة مغلقة إلى أرشيفها المضغوط ثم حذفها من القاعدة (باتصال منفصل للخيط الخلفي)"""
+        year = str(year)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            # القراءة والحذف في معاملة كتابة واحدة فلا تضيع حركة مستوردة للسنة أثناء الأرشفة
+            conn.execute('BEGIN IMMEDIATE')
+            bounds = (year + '-01-01', year + '-12-31')
+            if conn.execute("SELECT 1 FROM attendance WHERE check_out = '' AND date BETWEEN ? AND ? LIMIT 1",
+                            bounds).fetchone():
+                raise ValueError(f"السنة {year} بها جلسات مفتوحة")
+            months = {row[0] for row in conn.execute(
+                'SELECT DISTINCT substr(date, 1, 7) FROM attendance WHERE date BETWEEN ? AND ?', bounds)}
+            months.update(month for month in self.archive.months() if month[:4] == year)
+
+            attendance = new_attendance()
+            attendance.update(self.archive.read_months(months))
+            live = new_attendance()
+            for date, emp_id, check_in, check_out in conn.execute(
+                    'SELECT date, emp_id, check_in, check_out FROM attendance '
+                    'WHERE date BETWEEN ? AND ? ORDER BY date, id', bounds):
+                live[date][intern_id(emp_id)].append(Session(check_in, check_out))
+            index = self.archive.write_year(year, archive_shards(merge_attendance(attendance, live)))
+            conn.execute('DELETE FROM attendance WHERE date BETWEEN ? AND ?', bounds)
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        return index
+
+    def save(self, employees, attendance):
+        """حفظ كل ما في الذاكرة (الموظفين والأشهر المحملة)"""
+        self.write(self.snapshot(employees, attendance))
+
+    @timed('save_snapshot')
+    def snapshot(self, employees, attendance):
+        """نسخة في الذاكرة من الصفوف المطلوب حفظها (الأوقات كأرقام تُحوَّل لنصوص في write).
+
+        الأشهر المؤرشفة المحملة للتقارير لا تُعاد للقاعدة؛ الحركات الجديدة فيها تُكتب مباشرة كصفوف.
+        """
+        archived = self.archive.months()
+        return {
+            'employees': self._employee_rows(employees),
+            'attendance': [(emp_id, date, record.start, record.end)
+                           for date, day in attendance.items() if month_of(date) not in archived
+                           for emp_id, records in day.items()
+                           for record in records],
+        }
+
+    @timed('save_write')
+    def write(self, snapshot, batch_size=2000):
+        """كتابة لقطة باتصال منفصل وعلى دفعات صغيرة حتى لا تنتظر الحركات الجديدة طويلاً"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        try:
+            with conn:
+                if 'tombstones' in snapshot:
+                    self._write_tombstones(conn, snapshot['tombstones'])
+                self._write_employees(conn, snapshot['employees'])
+            rows = snapshot['attendance']
+            for i in range(0, len(rows), batch_size):
+                with conn:
+                    self._write_attendance(conn, [
+                        (emp_id, date, format_time(start), format_time(end))
+                        for emp_id, date, start, end in rows[i:i + batch_size]])
+        finally:
+            conn.close()
+
+    def save_employees(self, employees, tombstones=None):
+        """حفظ بيانات الموظفين فقط (والمحذوفين في نفس المعاملة إن وجدوا)"""
+        snapshot = {'employees': self._employee_rows(employees), 'attendance': []}
+        if tombstones is not None:
+            snapshot['tombstones'] = self._tombstone_rows(tombstones)
+        self.write(snapshot)
+
+    def load_tombstones(self):
+        """الموظفون المحذوفون الذين لم تُمسح سجلاتهم بعد: الكود ← (employee, deleted_at)"""
+        try:
+            rows = self.conn.execute('SELECT emp_id, employee, deleted_at FROM tombstones').fetchall()
+        except sqlite3.OperationalError:
+            # قاعدة أقدم مفتوحة للقراءة فقط قبل أن يضيف البرنامج الجدول
+            return {}
+        return {emp_id: {'employee': json.loads(employee), 'deleted_at': deleted_at}
+                for emp_id, employee, deleted_at in rows}
+
+    def data_version(self):
+        """رقم يزيد مع كل معاملة حفظ من اتصال آخر (PRAGMA data_version لنفس الاتصال) مع بصمة فهارس الأرشيف"""
+        self.connect()
+        return self.conn.execute('PRAGMA data_version').fetchone()[0], self.archive.version()
+
+    def forget_employees(self, emp_ids):
+        """لا شيء: الصفوف تُحذف مباشرة من القاعدة في purge_employees"""
+
+    def purge_employees(self, emp_ids):
+        """حذف كل سجلات الموظفين من القاعدة في معاملة واحدة (باتصال منفصل للخيط الخلفي)"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                before = conn.total_changes
+                conn.executemany('DELETE FROM attendance WHERE emp_id = ?', [(str(emp_id),) for emp_id in emp_ids])
+                purged = conn.total_changes - before
+        finally:
+            conn.close()
+        return purged + self.archive.purge_employees(emp_ids)
+
+    def record_check_in(self, date, emp_id, record):
+        """حفظ حركة حضور واحدة (صف واحد)"""
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR IGNORE INTO attendance (emp_id, date, check_in, check_out) VALUES (?, ?, ?, ?)',
+                (emp_id, date, record.check_in, record.check_out))
+
+    def record_check_out(self, date, emp_id, record):
+        """حفظ حركة انصراف واحدة باستخدام فهرس الجلسات المفتوحة"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE attendance SET check_out = ? "
+                "WHERE emp_id = ? AND date = ? AND check_in = ? AND check_out = ''",
+                (record.check_out, emp_id, date, record.check_in))
+
+    def record_punches(self, ops):
+        """حفظ دفعة حركات (من الاستيراد) في معاملة واحدة"""
+        # جلسة حضورها وانصرافها في نفس الدفعة تُدرج مكتملة بدلاً من إدراجها ثم تحديثها
+        inserts = {}
+        updates = []
+        for kind, date, emp_id, record, _, check_in, at in ops:
+            if kind == 'in':
+                inserts[id(record)] = [emp_id, date, check_in, '']
+            elif id(record) in inserts:
+                inserts[id(record)][3] = at
+            else:
+                updates.append((at, emp_id, date, check_in))
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO attendance (emp_id, date, check_in, check_out) VALUES (?, ?, ?, ?)',
+                list(inserts.values()))
+            self.conn.executemany(
+                "UPDATE attendance SET check_out = ? "
+                "WHERE emp_id = ? AND date = ? AND check_in = ? AND check_out = ''",
+                updates)
+
+    @staticmethod
+    def _employee_rows(employees):
+        return [(emp_id, data['name'], data.get('department', ''), data.get('monthly_salary', 0))
+                for emp_id, data in employees.items()]
+
+    @staticmethod
+    def _tombstone_rows(tombstones):
+        return [(emp_id, json.dumps(tombstone['employee'], ensure_ascii=False), tombstone['deleted_at'])
+                for emp_id, tombstone in tombstones.items()]
+
+    @staticmethod
+    def _write_employees(conn, rows):
+        conn.executemany(
+            'INSERT INTO employees (emp_id, name, department, monthly_salary) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (emp_id) DO UPDATE SET name = excluded.name, '
+            'department = excluded.department, monthly_salary = excluded.monthly_salary',
+            rows)
+        existing = {row[0] for row in conn.execute('SELECT emp_id FROM employees')}
+        conn.executemany('DELETE FROM employees WHERE emp_id = ?',
+                         [(emp_id,) for emp_id in existing - {row[0] for row in rows}])
+
+    @staticmethod
+    def _write_tombstones(conn, rows):
+        conn.execute('DELETE FROM tombstones')
+        conn.executemany('INSERT INTO tombstones (emp_id, employee, deleted_at) VALUES (?, ?, ?)', rows)
+
+    @staticmethod
+    def _write_attendance(conn, rows):
+        conn.executemany(
+            'INSERT INTO attendance (emp_id, date, check_in, check_out) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (emp_id, date, check_in) DO UPDATE SET check_out = excluded.check_out',
+            rows)
+
+    def close(self):
+        self.conn.close()
+
+
+def migrate_json_to_sqlite(data_dir):
+    """ترحيل البيانات الموجودة في data/*.json (مع سجل الحركات والموظفين المحذوفين) إلى SQLite مرة واحدة"""
+    json_storage = JsonStorage(data_dir)
+    if not (os.path.exists(json_storage.employees_path)
+            or os.path.exists(json_storage.legacy_attendance_path)
+            or os.path.exists(json_storage.shards_dir)):
+        return
+
+    employees, attendance, loaded_months = json_storage.load()
+    attendance.update(json_storage.load_months(set(json_storage.months()) - loaded_months))
+    tombstones = json_storage.load_tombstones()
+    json_storage.close()
+
+    # write يكتب باتصال خاص به، فلا حاجة لاتصال القاعدة المفتوح
+    storage = SqliteStorage(data_dir)
+    snapshot = storage.snapshot(employees, attendance)
+    # المحذوفون الذين لم تُمسح سجلاتهم بعد يبقون قابلين للاسترجاع والمسح بعد الترحيل
+    snapshot['tombstones'] = storage._tombstone_rows(tombstones)
+    storage.write(snapshot)
+
+
+STORAGE_BACKENDS = {
+    'json': JsonStorage,
+    'sqlite': SqliteStorage,
+}
+
+
+def open_storage(kind='json', data_dir='data', shard_format='json', read_only=False):
+    """إنشاء وحدة التخزين المطلوبة ('json' أو 'sqlite'؛ shard_format لملفات الأشهر في 'json' فقط)"""
+    if kind == 'json':
+        return JsonStorage(data_dir, shard_format=shard_format, read_only=read_only)
+    return STORAGE_BACKENDS[kind](data_dir, read_only=read_only)
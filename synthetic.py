@@ -0,0 +1,132 @@
+"""توليد بيانات تجريبية واقعية (employees.json و attendance.json) بأحجام مختلفة لقياس الأداء.
+
+الحضور يُكتب بالتنسيق القديم (ملف attendance.json واحد) فيمر أول تحميل بنفس مسار الترحيل
+و convert_old_data، ونسبة من الأيام تُكتب بالصيغة الأقدم (قاموس جلسة واحدة بدلاً من قائمة).
+
+التشغيل: python synthetic.py data_bench --employees 1000 --years 2
+"""
+import argparse
+import json
+import os
+import random
+from datetime import date as date_type
+from datetime import datetime, timedelta
+
+FIRST_NAMES = ['محمد', 'أحمد', 'محمود', 'مصطفى', 'علي', 'عمر', 'يوسف', 'خالد', 'إبراهيم', 'حسن',
+               'فاطمة', 'مريم', 'نور', 'سارة', 'آية', 'هدى', 'منى', 'ياسمين', 'دينا', 'رنا']
+LAST_NAMES = ['عبد الله', 'السيد', 'حسين', 'إبراهيم', 'عبد الرحمن', 'سالم', 'فؤاد', 'الشريف',
+              'النجار', 'منصور', 'عثمان', 'شاكر', 'زكي', 'فهمي', 'رمضان']
+DEPARTMENTS = ['الإنتاج', 'المبيعات', 'المخازن', 'الحسابات', 'الصيانة', 'الجودة', 'الأمن', 'الإدارة']
+
+# بداية الوردية (ساعة) ونسبة الموظفين فيها
+SHIFTS = [(8, 0.6), (14, 0.3), (22, 0.1)]
+
+# يوم الراحة الأسبوعي (الجمعة)
+WEEKEND = {4}
+
+
+def make_employees(count, rng):
+    """قاموس الموظفين: الكود ← (الاسم، القسم، الراتب الشهري)"""
+    employees = {}
+    for n in range(count):
+        emp_id = str(1001 + n)
+        employees[emp_id] = {
+            'name': f"{rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            'department': rng.choice(DEPARTMENTS),
+            'monthly_salary': float(rng.randrange(3000, 15001, 100)),
+        }
+    return employees
+
+
+def day_sessions(day, shift, rng, max_sessions):
+    """جلسات موظف في يوم: وردية مقسمة أحياناً على أكثر من جلسة (استراحة بين الجلسات)"""
+    start = datetime(day.year, day.month, day.day, shift) + timedelta(minutes=rng.randint(-30, 45))
+    worked = rng.randint(6 * 60, 9 * 60)
+    count = 1 if max_sessions == 1 else rng.choices(range(1, max_sessions + 1),
+                                                    [8] + [2] * (max_sessions - 1))[0]
+    sessions = []
+    for n in range(count):
+        minutes = worked // count
+        end = start + timedelta(minutes=minutes, seconds=rng.randint(0, 59))
+        sessions.append((start, end))
+        start = end + timedelta(minutes=rng.randint(15, 60))
+    return sessions
+
+
+def iter_attendance(employees, start, end, rng, attendance_rate=0.9, max_sessions=3,
+                    legacy_rate=0.1, open_rate=0.01):
+    """(التاريخ، {الكود: جلسات}) لكل يوم عمل في الفترة بصيغة الملفات المحفوظة.
+
+    آخر يوم فيه جلسات مفتوحة (بدون انصراف) بنسبة open_rate، ونسبة legacy_rate من الأيام ذات الجلسة
+    الواحدة تُكتب كقاموس واحد مثل الملفات القديمة.
+    """
+    shifts = {emp_id: rng.choices([hour for hour, _ in SHIFTS], [weight for _, weight in SHIFTS])[0]
+              for emp_id in employees}
+    day = start
+    while day <= end:
+        if day.weekday() not in WEEKEND:
+            records = {}
+            for emp_id in employees:
+                if rng.random() >= attendance_rate:
+                    continue
+                sessions = [{'check_in': check_in.strftime('%Y-%m-%d %H:%M:%S'),
+                             'check_out': check_out.strftime('%Y-%m-%d %H:%M:%S')}
+                            for check_in, check_out in day_sessions(day, shifts[emp_id], rng, max_sessions)]
+                if day == end and rng.random() < open_rate:
+                    sessions[-1]['check_out'] = ''
+                if len(sessions) == 1 and rng.random() < legacy_rate:
+                    records[emp_id] = sessions[0]
+                else:
+                    records[emp_id] = sessions
+            yield day.strftime('%Y-%m-%d'), records
+        day += timedelta(days=1)
+
+
+def generate_dataset(data_dir, employees=100, years=1, end=None, seed=0, **options):
+    """كتابة employees.json و attendance.json في مجلد فارغ؛ تعيد عدد الموظفين والأيام والجلسات.
+
+    options تمرر إلى iter_attendance (attendance_rate, max_sessions, legacy_rate, open_rate).
+    الحضور يُكتب يوماً بيوم فلا تحتاج الأحجام الكبيرة لتجميع الملف كله في الذاكرة.
+    """
+    rng = random.Random(seed)
+    end = end or date_type.today()
+    start = end - timedelta(days=round(365.25 * years) - 1)
+
+    os.makedirs(data_dir, exist_ok=True)
+    staff = make_employees(employees, rng)
+    with open(os.path.join(data_dir, 'employees.json'), 'w', encoding='utf-8') as f:
+        json.dump(staff, f, indent=4, ensure_ascii=False)
+
+    days = 0
+    sessions = 0
+    with open(os.path.join(data_dir, 'attendance.json'), 'w', encoding='utf-8') as f:
+        f.write('{')
+        for date, records in iter_attendance(staff, start, end, rng, **options):
+            f.write(',\n' if days else '\n')
+            f.write(f"{json.dumps(date)}: {json.dumps(records, ensure_ascii=False)}")
+            days += 1
+            sessions += sum(len(value) if isinstance(value, list) else 1 for value in records.values())
+        f.write('\n}\n')
+
+    return {'employees': employees, 'days': days, 'sessions': sessions}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="توليد بيانات حضور تجريبية")
+    parser.add_argument('data_dir')
+    parser.add_argument('--employees', type=int, default=100)
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--attendance-rate', type=float, default=0.9)
+    parser.add_argument('--max-sessions', type=int, default=3)
+    parser.add_argument('--legacy-rate', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    summary = generate_dataset(args.data_dir, args.employees, args.years, seed=args.seed,
+                               attendance_rate=args.attendance_rate, max_sessions=args.max_sessions,
+                               legacy_rate=args.legacy_rate)
+    print(f"{summary['employees']} موظف، {summary['days']} يوم، {summary['sessions']} جلسة")
+
+
+if __name__ == '__main__':
+    main()
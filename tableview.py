@@ -0,0 +1,97 @@
+from metrics import timed
+
+
+class TableView:
+    """طبقة عرض فوق Treeview: تطبق الفروق فقط (إضافة/تعديل/حذف بمعرف ثابت) وتعرض الصفوف على صفحات.
+
+    الصفوف الكاملة محفوظة هنا، ويتم إدراج صفحة أولى فقط في الجدول ثم صفحات أخرى عند الاقتراب من
+    نهاية التمرير، فتكلفة التحديث تتناسب مع ما تغير وما هو ظاهر وليس مع حجم النتيجة كلها.
+    """
+
+    def __init__(self, tree, scrollbar=None, page_size=500, load_threshold=0.9):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.page_size = page_size
+        self.load_threshold = load_threshold
+
+        self.order = []         # معرفات كل الصفوف بالترتيب
+        self.rows = {}          # المعرف ← (القيم، الوسوم)
+        self.displayed = []     # المعرفات المدرجة فعلاً في الجدول (أول len منها من order)
+        self.displayed_rows = {}
+        self.loading = False
+
+        if scrollbar is not None:
+            tree.configure(yscrollcommand=self.on_scroll)
+
+    def __len__(self):
+        return len(self.order)
+
+    def values(self):
+        """قيم كل الصفوف بالترتيب (بما فيها غير المعروضة بعد) للتصدير"""
+        return [self.rows[iid][0] for iid in self.order]
+
+    def clear(self):
+        if self.displayed:
+            self.tree.delete(*self.displayed)
+        self.order = []
+        self.rows = {}
+        self.displayed = []
+        self.displayed_rows = {}
+
+    @timed('table_render')
+    def set_rows(self, rows):
+        """استبدال محتوى الجدول بالصفوف (المعرف، القيم، الوسوم) مع تطبيق الفروق فقط"""
+        self.order = []
+        self.rows = {}
+        for iid, values, tags in rows:
+            iid = str(iid)
+            self.order.append(iid)
+            self.rows[iid] = (tuple(values), tuple(tags))
+
+        # الاحتفاظ بعدد الصفوف المعروضة حالياً حتى لا يقفز موضع التمرير
+        count = min(len(self.order), max(self.page_size, len(self.displayed)))
+        self._render(self.order[:count])
+
+    def _render(self, target):
+        target_set = set(target)
+        gone = [iid for iid in self.displayed if iid not in target_set]
+        if gone:
+            self.tree.delete(*gone)
+            for iid in gone:
+                del self.displayed_rows[iid]
+
+        kept = [iid for iid in self.displayed if iid in target_set]
+        in_order = kept == [iid for iid in target if iid in self.displayed_rows]
+
+        for index, iid in enumerate(target):
+            row = self.rows[iid]
+            old = self.displayed_rows.get(iid)
+            if old is None:
+                self.tree.insert('', index, iid=iid, values=row[0], tags=row[1])
+            else:
+                if old != row:
+                    self.tree.item(iid, values=row[0], tags=row[1])
+                if not in_order:
+                    self.tree.move(iid, '', index)
+            self.displayed_rows[iid] = row
+
+        self.displayed = list(target)
+
+    def render_more(self):
+        """إدراج الصفحة التالية من الصفوف في نهاية الجدول"""
+        self.loading = False
+        start = len(self.displayed)
+        page = self.order[start:start + self.page_size]
+        for iid in page:
+            row = self.rows[iid]
+            self.tree.insert('', 'end', iid=iid, values=row[0], tags=row[1])
+            self.displayed_rows[iid] = row
+        self.displayed.extend(page)
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if (not self.loading and len(self.displayed) < len(self.order)
+                and float(last) >= self.load_threshold):
+            # التحميل بعد انتهاء حدث التمرير الحالي وليس بداخله
+            self.loading = True
+            self.tree.after_idle(self.render_more)
@@ -1,11 +1,20 @@
-import streamlit as st
-import pandas as pd
-from datetime import datetime, timedelta
-import json
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+from datetime import datetime
 import os
-from collections import defaultdict
+from client import AttendanceClient
+from core import AttendanceCore, AttendanceError
+from indexes import period_bounds, period_of
+from metrics import registry as metrics
+from sheets_sync import SheetSync, open_worksheet
+import servicelock
+from tableview import TableView
+from worker import BackgroundWorker
+import csv
+import exports
+import payslips
 
-class EmployeeAttendanceSystem:
+class EmployeeAttendanceSystem(AttendanceCore):
     def __init__(self, root):
         self.root = root
         self.root.title("نظام حضور وانصراف الموظفين")
@@ -15,67 +24,99 @@ class EmployeeAttendanceSystem:
         # كلمة السر للإدارة (يمكن تغييرها)
         self.admin_password = "a2cf1543"
         
-        # إنشاء مجلد البيانات إذا لم يكن موجوداً
-        if not os.path.exists('data'):
-            os.makedirs('data')
+        # نوع التخزين: 'json' (ملفات JSON مع سجل حركات) أو 'sqlite' (قاعدة مفهرسة)
+        self.storage_backend = 'json'
         
-        # تحميل البيانات
-        self.load_data()
+        # تنسيق ملفات الأشهر: 'json' (نصي) أو 'binary' (لقطة مضغوطة تُحمل أسرع بكثير)
+        self.shard_format = 'json'
+        
+        # عنوان خدمة الحضور المحلية (مثل 'http://127.0.0.1:8765') عند تشغيل عدة أجهزة على نفس البيانات؛
+        # None = هذا الجهاز يملك التخزين بنفسه
+        self.service_url = None
+        
+        # قياس أزمنة العمليات (يمكن تفعيله/تعطيله من تبويب الأداء في واجهة المدير)
+        self.metrics_enabled = False
+        metrics.enabled = self.metrics_enabled
+        
+        # مزامنة سجل الحضور اليومي مع Google Sheets: مفتاح الجدول (None = بدون مزامنة) وملف حساب الخدمة
+        self.sheets_key = None
+        self.sheets_credentials = os.path.join('data', 'service_account.json')
+        self.sheets_interval = 60
+        self.sheet_sync = None
+        
+        # مهلة انتظار توقف الكتابة قبل البحث عن الموظف (بالمللي ثانية)
+        self.lookup_delay_ms = 150
+        self.lookup_job = None
+        
+        # الحفظ والتصدير في خيوط خلفية (طابور لكل منهما) حتى لا تتوقف الواجهة
+        self.save_worker = BackgroundWorker(self.root, 'storage-writer')
+        self.export_worker = BackgroundWorker(self.root, 'report-export')
+        self.root.protocol('WM_DELETE_WINDOW', self.on_close)
+        
+        if not self.service_url:
+            # الخدمة تعمل على نفس مجلد البيانات: الجهاز يتصل بها بدلاً من فتح البيانات للكتابة بجانبها
+            self.service_url = servicelock.holder_url('data') or None
+        
+        if self.service_url:
+            # جهاز متصل بالخدمة التي تملك التخزين: الحضور والانصراف والبحث وواجهة المدير عبرها
+            self.kiosk = AttendanceClient(self.service_url)
+        else:
+            # إنشاء مجلد البيانات وتحميل البيانات
+            AttendanceCore.__init__(self, self.storage_backend, 'data', self.shard_format)
+            self.kiosk = self
+            # مسح سجلات المحذوفين الذين انتهت مدة استرجاعهم (في الخلفية)
+            self.start_purge()
+            if self.sheets_key:
+                self.start_sheet_sync()
         
         # إنشاء واجهة المستخدم
         self.create_login_page()
     
-    def load_data(self):
-        """تحميل بيانات الموظفين وسجلات الحضور"""
-        try:
-            with open('data/employees.json', 'r', encoding='utf-8') as f:
-                self.employees = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.employees = {}
-        
-        try:
-            with open('data/attendance.json', 'r', encoding='utf-8') as f:
-                old_data = json.load(f)
-                self.attendance = self.convert_old_data(old_data)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.attendance = defaultdict(lambda: defaultdict(list))
-    
-    def convert_old_data(self, old_data):
-        """تحويل البيانات القديمة إلى الهيكل الجديد"""
-        new_data = defaultdict(lambda: defaultdict(list))
-        for date, employees in old_data.items():
-            for emp_id, records in employees.items():
-                if isinstance(records, dict):
-                    if 'check_in' in records:
-                        new_data[date][emp_id].append({
-                            'check_in': records['check_in'],
-                            'check_out': records.get('check_out', '')
-                        })
-                elif isinstance(records, list):
-                    for record in records:
-                        if 'check_in' in record:
-                            new_data[date][emp_id].append({
-                                'check_in': record['check_in'],
-                                'check_out': record.get('check_out', '')
-                            })
-        return new_data
-    
     def save_data(self):
-        """حفظ البيانات في الملفات"""
-        with open('data/employees.json', 'w', encoding='utf-8') as f:
-            json.dump(self.employees, f, indent=4, ensure_ascii=False)
-        
-        with open('data/attendance.json', 'w', encoding='utf-8') as f:
-            normal_dict = {date: dict(employees) for date, employees in self.attendance.items()}
-            json.dump(normal_dict, f, indent=4, ensure_ascii=False)
+        """حفظ البيانات في الملفات: اللقطة في الذاكرة هنا والكتابة على القرص في الخلفية"""
+        snapshot = self.storage.snapshot(self.employees, self.attendance)
+        self.save_worker.submit(self.storage.write, snapshot, on_error=self.save_failed)
+    
+    def save_employees(self):
+        """حفظ الموظفين والمحذوفين في الخلفية"""
+        self.save_worker.submit(self.storage.save_employees, dict(self.employees), dict(self.tombstones),
+                                on_error=self.save_failed)
+    
+    def start_purge(self):
+        """مسح سجلات المحذوفين المستحقين: من الذاكرة فوراً ومن ملفات الأشهر في خيط الحفظ"""
+        due = self.due_tombstones()
+        if not due:
+            return
+        self.drop_history(due)
+        self.save_worker.submit(self.storage.purge_employees, due,
+                                on_done=lambda _: self.finish_purge(due), on_error=self.save_failed)
+    
+    def start_sheet_sync(self):
+        """بدء مزامنة الصفوف المتغيرة مع Google Sheets في خيط خلفي"""
+        try:
+            worksheet = open_worksheet(self.sheets_credentials, self.sheets_key)
+        except Exception as e:
+            messagebox.showerror("خطأ", f"تعذر الاتصال بـ Google Sheets: {str(e)}")
+            return
+        self.sheet_sync = SheetSync(self, worksheet, self.sheets_interval)
+        self.sheet_sync.start()
     
-    def calculate_hourly_rate(self, monthly_salary):
-        """حساب سعر الساعة من سعر الساعه"""
-        return round(monthly_salary / 26, 2)
+    def save_failed(self, error):
+        messagebox.showerror("خطأ", f"تعذر حفظ البيانات: {str(error)}")
     
-    def calculate_salary(self, hourly_rate, hours):
-        """حساب الراتب من سعر الساعة وعدد الساعات"""
-        return round(hourly_rate * hours, 2)
+    def on_close(self):
+        """حفظ أخير وانتظار المهام الخلفية قبل إغلاق البرنامج"""
+        if self.kiosk is self:
+            self.save_data()
+        if self.sheet_sync is not None:
+            self.sheet_sync.stop()
+        self.save_worker.wait_idle()
+        self.export_worker.wait_idle()
+        self.save_worker.close()
+        self.export_worker.close()
+        if self.kiosk is self:
+            self.storage.close()
+        self.root.destroy()
     
     def create_login_page(self):
         """إنشاء صفحة تسجيل الدخول"""
@@ -136,15 +177,6 @@ class EmployeeAttendanceSystem:
             messagebox.showerror("خطأ", "كلمة السر غير صحيحة")
             self.password_entry.focus()
     
-    def has_open_checkin(self, emp_id):
-        """التحقق من وجود حضور مفتوح (بدون انصراف) للموظف في أي يوم"""
-        for date in self.attendance:
-            if emp_id in self.attendance[date]:
-                for record in self.attendance[date][emp_id]:
-                    if record.get('check_in') and not record.get('check_out'):
-                        return True, date
-        return False, None
-    
     def create_attendance_ui(self):
         """إنشاء واجهة الموظف (الحضور والانصراف)"""
         for widget in self.root.winfo_children():
@@ -163,6 +195,13 @@ class EmployeeAttendanceSystem:
         self.emp_id_entry = ttk.Entry(input_frame, width=20, font=('Arial', 12))
         self.emp_id_entry.grid(row=0, column=1, padx=10, pady=10, sticky='w')
         
+        # قائمة الإكمال التلقائي (بالكود أو الاسم) تظهر بجانب خانة الإدخال
+        self.suggestions_list = tk.Listbox(input_frame, width=35, height=6, font=('Arial', 11),
+                                           activestyle='dotbox', exportselection=False)
+        self.suggestions_list.grid(row=0, column=2, rowspan=3, padx=10, pady=10, sticky='nw')
+        self.suggestions_list.grid_remove()
+        self.suggestion_ids = []
+        
         ttk.Label(input_frame, text="اسم الموظف:", font=('Arial', 12)).grid(row=1, column=0, padx=10, pady=10, sticky='e')
         self.emp_name_label = ttk.Label(input_frame, text="", width=20, font=('Arial', 12))
         self.emp_name_label.grid(row=1, column=1, padx=10, pady=10, sticky='w')
@@ -182,7 +221,12 @@ class EmployeeAttendanceSystem:
                                       width=15, style='Accent.TButton')
         self.check_out_btn.pack(side='left', padx=10)
         
-        self.emp_id_entry.bind('<KeyRelease>', self.update_employee_info)
+        self.emp_id_entry.bind('<KeyRelease>', self.schedule_employee_lookup)
+        self.emp_id_entry.bind('<Down>', self.focus_suggestions)
+        self.emp_id_entry.bind('<Escape>', lambda event: self.hide_suggestions())
+        self.suggestions_list.bind('<Return>', self.choose_suggestion)
+        self.suggestions_list.bind('<Double-Button-1>', self.choose_suggestion)
+        self.suggestions_list.bind('<Escape>', lambda event: self.hide_suggestions())
         
         daily_frame = ttk.LabelFrame(self.root, text="سجل الحضور اليومي", padding=(15, 10))
         daily_frame.pack(fill='both', expand=True, padx=20, pady=10)
@@ -206,7 +250,8 @@ class EmployeeAttendanceSystem:
         
         scrollbar = ttk.Scrollbar(daily_frame, orient='vertical', command=self.daily_tree.yview)
         scrollbar.pack(side='right', fill='y')
-        self.daily_tree.configure(yscrollcommand=scrollbar.set)
+        self.daily_table = TableView(self.daily_tree, scrollbar)
+        self.daily_tree.tag_configure('total', background='#e6f7ff', font=('Arial', 10, 'bold'))
         
         back_btn = ttk.Button(self.root, text="العودة", command=self.create_login_page,
                             style='Accent.TButton')
@@ -234,8 +279,16 @@ class EmployeeAttendanceSystem:
         self.reports_tab = ttk.Frame(self.notebook)
         self.notebook.add(self.reports_tab, text='التقارير')
         
+        self.on_site_tab = ttk.Frame(self.notebook)
+        self.notebook.add(self.on_site_tab, text='المتواجدون الآن')
+        
+        self.metrics_tab = ttk.Frame(self.notebook)
+        self.notebook.add(self.metrics_tab, text='الأداء')
+        
         self.create_management_tab()
         self.create_reports_tab()
+        self.create_on_site_tab()
+        self.create_metrics_tab()
         
         back_btn = ttk.Button(self.root, text="العودة", command=self.create_login_page,
                             style='Accent.TButton')
@@ -288,7 +341,7 @@ class EmployeeAttendanceSystem:
         
         scrollbar = ttk.Scrollbar(emp_list_frame, orient='vertical', command=self.emp_tree.yview)
         scrollbar.pack(side='right', fill='y')
-        self.emp_tree.configure(yscrollcommand=scrollbar.set)
+        self.emp_table = TableView(self.emp_tree, scrollbar)
         
         del_btn_frame = ttk.Frame(emp_list_frame)
         del_btn_frame.pack(fill='x', pady=5)
@@ -297,8 +350,152 @@ class EmployeeAttendanceSystem:
                            style='Accent.TButton')
         del_btn.pack(side='right', padx=5, ipadx=10, ipady=5)
         
+        restore_btn = ttk.Button(del_btn_frame, text="استرجاع آخر موظف محذوف", command=self.restore_last_employee,
+                               style='Accent.TButton')
+        restore_btn.pack(side='right', padx=5, ipadx=10, ipady=5)
+        
+        archive_btn = ttk.Button(del_btn_frame, text="أرشفة السنوات المغلقة", command=self.archive_closed_years,
+                               style='Accent.TButton')
+        archive_btn.pack(side='right', padx=5, ipadx=10, ipady=5)
+        
+        import_btn = ttk.Button(del_btn_frame, text="استيراد بصمات الساعات", command=self.import_punch_log,
+                              style='Accent.TButton')
+        import_btn.pack(side='right', padx=5, ipadx=10, ipady=5)
+        
         self.update_employees_list()
     
+    def create_on_site_tab(self):
+        """إنشاء تبويب الموظفين المتواجدين حالياً (حضور بدون انصراف)"""
+        on_site_frame = ttk.LabelFrame(self.on_site_tab, text="الموظفون المتواجدون حالياً", padding=(15, 10))
+        on_site_frame.pack(fill='both', expand=True, padx=20, pady=10)
+        
+        columns = ('emp_id', 'emp_name', 'department', 'check_in')
+        self.on_site_tree = ttk.Treeview(on_site_frame, columns=columns, show='headings', height=10)
+        
+        self.on_site_tree.heading('emp_id', text='كود الموظف')
+        self.on_site_tree.heading('emp_name', text='اسم الموظف')
+        self.on_site_tree.heading('department', text='القسم')
+        self.on_site_tree.heading('check_in', text='وقت الحضور')
+        
+        for col in columns:
+            self.on_site_tree.column(col, width=150, anchor='center')
+        
+        self.on_site_tree.pack(fill='both', expand=True, padx=5, pady=5)
+        
+        scrollbar = ttk.Scrollbar(on_site_frame, orient='vertical', command=self.on_site_tree.yview)
+        scrollbar.pack(side='right', fill='y')
+        self.on_site_table = TableView(self.on_site_tree, scrollbar)
+        
+        refresh_btn = ttk.Button(on_site_frame, text="تحديث", command=self.update_on_site_list,
+                               style='Accent.TButton')
+        refresh_btn.pack(side='right', padx=5, ipadx=10, ipady=5)
+        
+        self.update_on_site_list()
+    
+    def update_on_site_list(self):
+        """تحديث قائمة المتواجدين من فهرس الجلسات المفتوحة"""
+        try:
+            rows = self.kiosk.on_site_rows()
+        except AttendanceError as e:
+            messagebox.showerror("خطأ", str(e))
+            return
+        self.on_site_table.set_rows(rows)
+    
+    def create_metrics_tab(self):
+        """إنشاء تبويب قياسات الأداء (أزمنة العمليات وتسجيل cProfile)"""
+        control_frame = ttk.LabelFrame(self.metrics_tab, text="القياس", padding=(15, 10))
+        control_frame.pack(fill='x', padx=20, pady=10)
+        
+        self.metrics_var = tk.BooleanVar(value=metrics.enabled)
+        ttk.Checkbutton(control_frame, text="تفعيل قياس الأزمنة", variable=self.metrics_var,
+                        command=self.toggle_metrics).pack(side='right', padx=10)
+        
+        self.profile_btn = ttk.Button(control_frame, command=self.toggle_profile, style='Accent.TButton',
+                                      text="إيقاف تسجيل cProfile" if metrics.profiling else "بدء تسجيل cProfile")
+        self.profile_btn.pack(side='right', padx=5, ipadx=10, ipady=5)
+        
+        ttk.Button(control_frame, text="حفظ القياسات (Prometheus)", command=self.export_metrics,
+                   style='Accent.TButton').pack(side='right', padx=5, ipadx=10, ipady=5)
+        ttk.Button(control_frame, text="تصفير", command=self.reset_metrics,
+                   style='Accent.TButton').pack(side='right', padx=5, ipadx=10, ipady=5)
+        ttk.Button(control_frame, text="تحديث", command=self.update_metrics_list,
+                   style='Accent.TButton').pack(side='right', padx=5, ipadx=10, ipady=5)
+        
+        metrics_frame = ttk.LabelFrame(self.metrics_tab, text="أزمنة العمليات (آخر 1024 قياس)", padding=(15, 10))
+        metrics_frame.pack(fill='both', expand=True, padx=20, pady=10)
+        
+        columns = ('operation', 'count', 'p50', 'p95', 'p99', 'total')
+        self.metrics_tree = ttk.Treeview(metrics_frame, columns=columns, show='headings', height=10)
+        
+        self.metrics_tree.heading('operation', text='العملية')
+        self.metrics_tree.heading('count', text='العدد')
+        self.metrics_tree.heading('p50', text='p50 (ms)')
+        self.metrics_tree.heading('p95', text='p95 (ms)')
+        self.metrics_tree.heading('p99', text='p99 (ms)')
+        self.metrics_tree.heading('total', text='الإجمالي (s)')
+        
+        for col in columns:
+            self.metrics_tree.column(col, width=120, anchor='center')
+        
+        self.metrics_tree.pack(fill='both', expand=True, padx=5, pady=5)
+        
+        scrollbar = ttk.Scrollbar(metrics_frame, orient='vertical', command=self.metrics_tree.yview)
+        scrollbar.pack(side='right', fill='y')
+        self.metrics_table = TableView(self.metrics_tree, scrollbar)
+        
+        self.profile_text = tk.Text(self.metrics_tab, height=8, font=('Courier', 9), wrap='none')
+        self.profile_text.pack(fill='x', padx=20, pady=5)
+        
+        self.update_metrics_list()
+    
+    def update_metrics_list(self):
+        """تحديث جدول أزمنة العمليات من سجل القياسات"""
+        rows = []
+        for name, count, p50, p95, p99, total in metrics.summary():
+            rows.append((name, (name, count, round(p50 * 1000, 3), round(p95 * 1000, 3),
+                                round(p99 * 1000, 3), round(total, 3)), ()))
+        self.metrics_table.set_rows(rows)
+    
+    def toggle_metrics(self):
+        metrics.enabled = self.metrics_var.get()
+        self.update_metrics_list()
+    
+    def reset_metrics(self):
+        metrics.reset()
+        self.update_metrics_list()
+    
+    def toggle_profile(self):
+        """بدء/إيقاف تسجيل cProfile لخيط الواجهة؛ عند الإيقاف يُحفظ الملف ويُعرض ملخصه"""
+        if not metrics.profiling:
+            metrics.start_profile()
+            self.profile_btn.config(text="إيقاف تسجيل cProfile")
+            return
+        
+        path = os.path.join('data', f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof")
+        summary = metrics.stop_profile(path)
+        self.profile_btn.config(text="بدء تسجيل cProfile")
+        self.profile_text.delete('1.0', 'end')
+        self.profile_text.insert('end', f"{path}\n{summary}")
+    
+    def export_metrics(self):
+        """حفظ القياسات في ملف نصي بتنسيق Prometheus"""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".prom",
+            initialfile="metrics.prom",
+            filetypes=[("Prometheus Text", "*.prom"), ("Text Files", "*.txt")],
+            title="حفظ القياسات"
+        )
+        
+        if not file_path:
+            return
+        
+        try:
+            metrics.write_prometheus(file_path)
+        except OSError as e:
+            messagebox.showerror("خطأ", f"تعذر حفظ القياسات: {str(e)}")
+            return
+        messagebox.showinfo("تم", f"تم حفظ القياسات في {file_path}")
+    
     def create_reports_tab(self):
         """إنشاء تبويب التقارير"""
         report_type_frame = ttk.LabelFrame(self.reports_tab, text="نوع التقرير", padding=(20, 15))
@@ -310,6 +507,10 @@ class EmployeeAttendanceSystem:
                        value='daily', command=self.update_report_ui).pack(side='right', padx=15)
         ttk.Radiobutton(report_type_frame, text="تقرير شهري", variable=self.report_type, 
                        value='monthly', command=self.update_report_ui).pack(side='right', padx=15)
+        ttk.Radiobutton(report_type_frame, text="كشف الرواتب", variable=self.report_type, 
+                       value='payroll', command=self.update_report_ui).pack(side='right', padx=15)
+        ttk.Radiobutton(report_type_frame, text="تكلفة الأقسام", variable=self.report_type, 
+                       value='department', command=self.update_report_ui).pack(side='right', padx=15)
         
         self.report_criteria_frame = ttk.LabelFrame(self.reports_tab, text="معايير التقرير", padding=(20, 15))
         self.report_criteria_frame.pack(fill='x', padx=20, pady=10)
@@ -322,7 +523,8 @@ class EmployeeAttendanceSystem:
         
         scrollbar = ttk.Scrollbar(report_result_frame, orient='vertical', command=self.report_tree.yview)
         scrollbar.pack(side='right', fill='y')
-        self.report_tree.configure(yscrollcommand=scrollbar.set)
+        self.report_table = TableView(self.report_tree, scrollbar)
+        self.report_tree.tag_configure('total', background='#e6f7ff', font=('Arial', 10, 'bold'))
         
         export_frame = ttk.Frame(report_result_frame)
         export_frame.pack(fill='x', pady=5)
@@ -335,12 +537,21 @@ class EmployeeAttendanceSystem:
                              style='Accent.TButton')
         excel_btn.pack(side='right', padx=5, ipadx=10, ipady=5)
         
+        all_excel_btn = ttk.Button(export_frame, text="Excel لكل الموظفين", command=self.export_all_employees_excel,
+                                 style='Accent.TButton')
+        all_excel_btn.pack(side='right', padx=5, ipadx=10, ipady=5)
+        
+        self.export_status = ttk.Label(export_frame, text="", font=('Arial', 10))
+        self.export_status.pack(side='left', padx=5)
+        
         self.update_report_ui()
     
     def update_report_ui(self):
         """تحديث واجهة التقارير بناءً على نوع التقرير المحدد"""
         for widget in self.report_criteria_frame.winfo_children():
             widget.destroy()
+        self.report_table.clear()
+        self.report_rows = []
         
         if self.report_type.get() == 'daily':
             ttk.Label(self.report_criteria_frame, text="تاريخ التقرير:", font=('Arial', 12)).pack(side='right', padx=10)
@@ -367,7 +578,7 @@ class EmployeeAttendanceSystem:
             for col in self.report_tree['columns']:
                 self.report_tree.column(col, width=100, anchor='center')
         
-        else:
+        elif self.report_type.get() == 'monthly':
             date_frame = ttk.Frame(self.report_criteria_frame)
             date_frame.pack(side='right', padx=10)
             
@@ -402,69 +613,174 @@ class EmployeeAttendanceSystem:
             
             for col in self.report_tree['columns']:
                 self.report_tree.column(col, width=120, anchor='center')
+        
+        elif self.report_type.get() == 'department':
+            ttk.Label(self.report_criteria_frame, text="الفترة التي تشمل:", font=('Arial', 12)).pack(side='right', padx=10)
+            
+            self.report_date = ttk.Entry(self.report_criteria_frame, width=15, font=('Arial', 12))
+            self.report_date.insert(0, datetime.now().strftime('%Y-%m-%d'))
+            self.report_date.pack(side='right', padx=10)
+            
+            self.report_granularity = tk.StringVar(value='month')
+            for value, text in (('week', "أسبوع"), ('month', "شهر"), ('year', "سنة")):
+                ttk.Radiobutton(self.report_criteria_frame, text=text, variable=self.report_granularity,
+                               value=value).pack(side='right', padx=5)
+            
+            ttk.Button(self.report_criteria_frame, text="عرض التقرير", command=self.generate_department_report,
+                     style='Accent.TButton').pack(side='right', padx=10, ipadx=10, ipady=5)
+            
+            self.report_tree['columns'] = ('department', 'employees', 'days', 'hours', 'salary')
+            
+            for col in self.report_tree['columns']:
+                self.report_tree.heading(col, text='')
+            
+            self.report_tree.heading('department', text='القسم')
+            self.report_tree.heading('employees', text='عدد الموظفين')
+            self.report_tree.heading('days', text='أيام العمل')
+            self.report_tree.heading('hours', text='عدد الساعات')
+            self.report_tree.heading('salary', text='الراتب')
+            
+            for col in self.report_tree['columns']:
+                self.report_tree.column(col, width=120, anchor='center')
+        
+        else:
+            date_frame = ttk.Frame(self.report_criteria_frame)
+            date_frame.pack(side='right', padx=10)
+            
+            ttk.Label(date_frame, text="من تاريخ:", font=('Arial', 10)).grid(row=0, column=0, padx=5)
+            self.start_date = ttk.Entry(date_frame, width=12, font=('Arial', 10))
+            self.start_date.insert(0, datetime.now().replace(day=1).strftime('%Y-%m-%d'))
+            self.start_date.grid(row=0, column=1, padx=5)
+            
+            ttk.Label(date_frame, text="إلى تاريخ:", font=('Arial', 10)).grid(row=1, column=0, padx=5)
+            self.end_date = ttk.Entry(date_frame, width=12, font=('Arial', 10))
+            self.end_date.insert(0, datetime.now().strftime('%Y-%m-%d'))
+            self.end_date.grid(row=1, column=1, padx=5)
+            
+            ttk.Button(self.report_criteria_frame, text="عرض التقرير", command=self.generate_payroll_report,
+                     style='Accent.TButton').pack(side='right', padx=10, ipadx=10, ipady=5)
+            
+            ttk.Button(self.report_criteria_frame, text="كشوف رواتب PDF لكل الموظفين", command=self.generate_payslips,
+                     style='Accent.TButton').pack(side='right', padx=10, ipadx=10, ipady=5)
+            
+            self.report_tree['columns'] = ('emp_id', 'emp_name', 'department', 'days', 'hours', 'salary')
+            
+            for col in self.report_tree['columns']:
+                self.report_tree.heading(col, text='')
+            
+            self.report_tree.heading('emp_id', text='كود الموظف')
+            self.report_tree.heading('emp_name', text='اسم الموظف')
+            self.report_tree.heading('department', text='القسم')
+            self.report_tree.heading('days', text='أيام العمل')
+            self.report_tree.heading('hours', text='عدد الساعات')
+            self.report_tree.heading('salary', text='الراتب')
+            
+            for col in self.report_tree['columns']:
+                self.report_tree.column(col, width=110, anchor='center')
     
     def update_employees_list(self):
         """تحديث قائمة الموظفين"""
-        for item in self.emp_tree.get_children():
-            self.emp_tree.delete(item)
-        
-        for emp_id, emp_data in self.employees.items():
-            monthly_salary = emp_data.get('monthly_salary', 0)
-            hourly_rate = self.calculate_hourly_rate(monthly_salary) if monthly_salary else 0
-            
-            self.emp_tree.insert('', 'end', values=(
-                emp_id, 
-                emp_data['name'], 
-                emp_data.get('department', ''),
-                monthly_salary,
-                hourly_rate
-            ))
+        try:
+            rows = self.kiosk.employee_rows()
+        except AttendanceError as e:
+            messagebox.showerror("خطأ", str(e))
+            return
+        self.emp_table.set_rows(rows)
+    
+    def local_only(self):
+        """عمليات تقرأ الملفات أو كل الجلسات مباشرة تعمل فقط على الجهاز الذي يملك البيانات"""
+        if self.kiosk is self:
+            return True
+        messagebox.showerror("خطأ", "هذه العملية متاحة فقط على جهاز خدمة الحضور")
+        return False
     
     def update_daily_attendance(self):
         """تحديث سجل الحضور اليومي"""
-        for item in self.daily_tree.get_children():
-            self.daily_tree.delete(item)
-        
         today = datetime.now().strftime('%Y-%m-%d')
+        try:
+            rows = self.kiosk.daily_rows(today)
+        except AttendanceError:
+            # تعذر الوصول للخدمة: يبقى آخر سجل معروض
+            return
+        self.daily_table.set_rows(rows)
+    
+    def schedule_employee_lookup(self, event=None):
+        """تأجيل البحث حتى يتوقف المستخدم عن الكتابة (بحث واحد للكتابة السريعة)"""
+        if event is not None and event.keysym in ('Up', 'Down', 'Return', 'Escape', 'Tab'):
+            return
+        if self.lookup_job is not None:
+            self.root.after_cancel(self.lookup_job)
+        self.lookup_job = self.root.after(self.lookup_delay_ms, self.run_employee_lookup)
+    
+    def run_employee_lookup(self):
+        self.lookup_job = None
+        if not self.emp_id_entry.winfo_exists():
+            return
+        self.update_employee_info()
+        self.update_suggestions()
+    
+    def update_suggestions(self):
+        """عرض الموظفين الذين يبدأ كودهم أو اسمهم بالنص المكتوب"""
+        text = self.emp_id_entry.get()
+        try:
+            matches = self.kiosk.search_employees(text) if text else []
+        except AttendanceError:
+            matches = []
+        if [emp_id for emp_id, name in matches] == [text]:
+            matches = []
+        
+        self.suggestion_ids = [emp_id for emp_id, name in matches]
+        self.suggestions_list.delete(0, 'end')
+        for emp_id, name in matches:
+            self.suggestions_list.insert('end', f"{emp_id} - {name}")
+        
+        if matches:
+            self.suggestions_list.grid()
+        else:
+            self.suggestions_list.grid_remove()
+    
+    def hide_suggestions(self):
+        self.suggestion_ids = []
+        self.suggestions_list.delete(0, 'end')
+        self.suggestions_list.grid_remove()
+    
+    def focus_suggestions(self, event=None):
+        """الانتقال بالسهم لأسفل من خانة الكود إلى قائمة الاقتراحات"""
+        if self.suggestion_ids:
+            self.suggestions_list.focus_set()
+            self.suggestions_list.selection_clear(0, 'end')
+            self.suggestions_list.selection_set(0)
+            self.suggestions_list.activate(0)
+        return 'break'
+    
+    def choose_suggestion(self, event=None):
+        """اختيار موظف من القائمة ووضع كوده في خانة الإدخال"""
+        selection = self.suggestions_list.curselection()
+        if not selection:
+            return
+        emp_id = self.suggestion_ids[selection[0]]
         
-        if today in self.attendance:
-            for emp_id, records in self.attendance[today].items():
-                if emp_id in self.employees:
-                    emp_name = self.employees[emp_id]['name']
-                    total_hours = 0
-                    
-                    for i, record in enumerate(records, 1):
-                        check_in = record.get('check_in', '')
-                        check_out = record.get('check_out', '')
-                        
-                        hours = ''
-                        if check_in and check_out:
-                            try:
-                                time_in = datetime.strptime(check_in, '%Y-%m-%d %H:%M:%S')
-                                time_out = datetime.strptime(check_out, '%Y-%m-%d %H:%M:%S')
-                                delta = time_out - time_in
-                                hours = round(delta.total_seconds() / 3600, 2)
-                                total_hours += hours
-                            except ValueError:
-                                hours = ''
-                        
-                        self.daily_tree.insert('', 'end', 
-                            values=(f"{emp_id} ({i})", emp_name, check_in, check_out, hours))
-                    
-                    if total_hours > 0:
-                        self.daily_tree.insert('', 'end', 
-                            values=(f"{emp_id} (الإجمالي)", emp_name, "", "", total_hours),
-                            tags=('total',))
-                        self.daily_tree.tag_configure('total', background='#e6f7ff', font=('Arial', 10, 'bold'))
+        self.emp_id_entry.delete(0, 'end')
+        self.emp_id_entry.insert(0, emp_id)
+        self.emp_id_entry.focus_set()
+        self.hide_suggestions()
+        self.update_employee_info()
     
     def update_employee_info(self, event=None):
         """تحديث معلومات الموظف عند إدخال الكود"""
         emp_id = self.emp_id_entry.get()
-        if emp_id in self.employees:
-            self.emp_name_label.config(text=self.employees[emp_id]['name'])
+        try:
+            status = self.kiosk.employee_status(emp_id) if emp_id else None
+        except AttendanceError as e:
+            self.emp_name_label.config(text="")
+            self.emp_status_label.config(text=str(e), foreground='red')
+            return
+        
+        if status is not None:
+            self.emp_name_label.config(text=status['name'])
             
-            has_open, open_date = self.has_open_checkin(emp_id)
-            if has_open:
+            open_date = status['open_date']
+            if open_date:
                 if open_date == datetime.now().strftime('%Y-%m-%d'):
                     self.emp_status_label.config(text="متحضر اليوم", foreground='green')
                 else:
@@ -485,28 +801,16 @@ class EmployeeAttendanceSystem:
         """تسجيل الحضور"""
         emp_id = self.emp_id_entry.get()
         
-        if not emp_id:
-            messagebox.showerror("خطأ", "يرجى إدخال كود الموظف")
+        try:
+            self.kiosk.check_in_employee(emp_id)
+        except AttendanceError as e:
+            messagebox.showerror("خطأ", str(e))
             return
-        
-        if emp_id not in self.employees:
-            messagebox.showerror("خطأ", "كود الموظف غير مسجل")
+        except OSError as e:
+            # السجل لم يقبل الكتابة: الحركة معلقة وتُعاد كتابتها مع الحركة التالية أو الحفظ
+            messagebox.showerror("خطأ", f"تعذر حفظ الحركة على القرص: {e}")
             return
         
-        has_open, open_date = self.has_open_checkin(emp_id)
-        if has_open:
-            messagebox.showerror("خطأ", f"الموظف متحضر بالفعل من تاريخ {open_date}\nيجب تسجيل الانصراف أولاً")
-            return
-        
-        today = datetime.now().strftime('%Y-%m-%d')
-        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        self.attendance[today][emp_id].append({
-            'check_in': now,
-            'check_out': ''
-        })
-        
-        self.save_data()
         messagebox.showinfo("تم", "تم تسجيل الحضور بنجاح")
         self.update_daily_attendance()
         self.update_employee_info()
@@ -515,35 +819,17 @@ class EmployeeAttendanceSystem:
         """تسجيل الانصراف"""
         emp_id = self.emp_id_entry.get()
         
-        if not emp_id:
-            messagebox.showerror("خطأ", "يرجى إدخال كود الموظف")
+        try:
+            result = self.kiosk.check_out_employee(emp_id)
+        except AttendanceError as e:
+            messagebox.showerror("خطأ", str(e))
             return
-        
-        if emp_id not in self.employees:
-            messagebox.showerror("خطأ", "كود الموظف غير مسجل")
+        except OSError as e:
+            # السجل لم يقبل الكتابة: الحركة معلقة وتُعاد كتابتها مع الحركة التالية أو الحفظ
+            messagebox.showerror("خطأ", f"تعذر حفظ الحركة على القرص: {e}")
             return
         
-        found_record = None
-        found_date = None
-        
-        for date in sorted(self.attendance.keys(), reverse=True):
-            if emp_id in self.attendance[date]:
-                for record in reversed(self.attendance[date][emp_id]):
-                    if record['check_in'] and not record['check_out']:
-                        found_record = record
-                        found_date = date
-                        break
-                if found_record:
-                    break
-        
-        if not found_record:
-            messagebox.showerror("خطأ", "لا يوجد حضور مسجل يحتاج إلى انصراف")
-            return
-        
-        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        found_record['check_out'] = now
-        self.save_data()
-        
+        found_date = result['date']
         if found_date != datetime.now().strftime('%Y-%m-%d'):
             messagebox.showinfo("تم", f"تم تسجيل الانصراف بنجاح\nتم إغلاق جلسة الحضور من تاريخ {found_date}")
         else:
@@ -559,27 +845,17 @@ class EmployeeAttendanceSystem:
         emp_dept = self.new_emp_dept.get()
         emp_salary = self.new_emp_salary.get()
         
-        if not emp_id or not emp_name:
-            messagebox.showerror("خطأ", "يرجى إدخال كود الموظف واسمه")
-            return
-        
-        if emp_id in self.employees:
-            messagebox.showerror("خطأ", "كود الموظف مسجل مسبقاً")
-            return
-        
         try:
             monthly_salary = float(emp_salary) if emp_salary else 0
         except ValueError:
             messagebox.showerror("خطأ", "الراتب يجب أن يكون رقماً")
             return
         
-        self.employees[emp_id] = {
-            'name': emp_name,
-            'department': emp_dept,
-            'monthly_salary': monthly_salary
-        }
-        
-        self.save_data()
+        try:
+            self.kiosk.create_employee(emp_id, emp_name, emp_dept, monthly_salary)
+        except AttendanceError as e:
+            messagebox.showerror("خطأ", str(e))
+            return
         
         messagebox.showinfo("تم", "تم إضافة الموظف بنجاح")
         
@@ -590,6 +866,41 @@ class EmployeeAttendanceSystem:
         
         self.update_employees_list()
     
+    def import_punch_log(self):
+        """استيراد سجل بصمات من ملف وعرض ملخص النتيجة"""
+        if not self.local_only():
+            return
+        
+        file_path = filedialog.askopenfilename(
+            filetypes=[("Punch Logs", "*.csv *.jsonl"), ("CSV Files", "*.csv"), ("JSON Lines", "*.jsonl")],
+            title="استيراد بصمات الساعات"
+        )
+        
+        if not file_path:
+            return
+        
+        try:
+            summary = self.import_punches(file_path)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            messagebox.showerror("خطأ", f"حدث خطأ أثناء الاستيراد: {str(e)}")
+            return
+        
+        message = (f"عدد السطور: {summary['rows']}\n"
+                   f"حضور: {summary['check_ins']}\n"
+                   f"انصراف: {summary['check_outs']}\n"
+                   f"مكرر: {summary['duplicates']}\n"
+                   f"مرفوض: {len(summary['rejected'])}")
+        
+        if summary['rejected']:
+            rejected_path = os.path.splitext(file_path)[0] + '.rejected.csv'
+            with open(rejected_path, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['line', 'emp_id', 'time', 'reason'])
+                writer.writerows(summary['rejected'])
+            message += f"\nتم حفظ السطور المرفوضة في {rejected_path}"
+        
+        messagebox.showinfo("تم", message)
+    
     def delete_employee(self):
         """حذف موظف"""
         selected_item = self.emp_tree.selection()
@@ -598,24 +909,72 @@ class EmployeeAttendanceSystem:
             messagebox.showerror("خطأ", "يرجى اختيار موظف للحذف")
             return
         
-        emp_id = self.emp_tree.item(selected_item)['values'][0]
+        emp_id = selected_item[0]
         
         if not messagebox.askyesno("تأكيد", f"هل أنت متأكد من حذف الموظف {emp_id}؟"):
             return
         
-        del self.employees[emp_id]
+        # الحذف فوري؛ السجلات تُمسح في الخلفية بعد مدة الاسترجاع
+        try:
+            delay_days = self.kiosk.retire_employee(emp_id)
+        except AttendanceError as e:
+            messagebox.showerror("خطأ", str(e))
+            return
         
-        for date in list(self.attendance.keys()):
-            if emp_id in self.attendance[date]:
-                del self.attendance[date][emp_id]
-            
-            if not self.attendance[date]:
-                del self.attendance[date]
+        messagebox.showinfo("تم", f"تم حذف الموظف بنجاح\nيمكن استرجاعه خلال {delay_days} أيام")
+        self.update_employees_list()
+        self.update_on_site_list()
+        if self.kiosk is self:
+            self.start_purge()
+    
+    def restore_last_employee(self):
+        """استرجاع آخر موظف محذوف لم تُمسح سجلاته بعد"""
+        try:
+            candidate = self.kiosk.last_deleted_employee()
+        except AttendanceError as e:
+            messagebox.showerror("خطأ", str(e))
+            return
+        if candidate is None:
+            messagebox.showerror("خطأ", "لا يوجد موظف محذوف يمكن استرجاعه")
+            return
         
-        self.save_data()
+        emp_id = candidate['emp_id']
+        if not messagebox.askyesno("تأكيد", f"هل تريد استرجاع الموظف {emp_id} ({candidate['name']})؟"):
+            return
         
-        messagebox.showinfo("تم", "تم حذف الموظف بنجاح")
+        try:
+            self.kiosk.restore_deleted_employee(emp_id)
+        except AttendanceError as e:
+            messagebox.showerror("خطأ", str(e))
+            return
+        
+        messagebox.showinfo("تم", "تم استرجاع الموظف بنجاح")
         self.update_employees_list()
+        self.update_on_site_list()
+    
+    def archive_closed_years(self):
+        """نقل السنوات المغلقة إلى أرشيف مضغوط في الخلفية ثم إخراجها من الذاكرة"""
+        if not self.local_only():
+            return
+        
+        years = self.closed_years()
+        if not years:
+            messagebox.showinfo("معلومة", "لا توجد سنوات مغلقة للأرشفة")
+            return
+        
+        if not messagebox.askyesno("تأكيد", f"أرشفة السنوات {', '.join(years)}؟\n"
+                                   "تبقى متاحة للتقارير وتُقرأ من الأرشيف عند الحاجة"):
+            return
+        
+        # اللقطة قبل الأرشفة في نفس طابور الحفظ فتُؤرشف الأشهر بآخر حالة
+        self.save_data()
+        self.save_worker.submit(lambda: [self.storage.archive_year(year) for year in years],
+                                on_done=self.archive_done, on_error=self.save_failed)
+    
+    def archive_done(self, indexes):
+        self.release_archived()
+        sessions = sum(index['sessions'] for index in indexes)
+        messagebox.showinfo("تم", f"تمت أرشفة {len(indexes)} سنة ({sessions} جلسة)")
     
     def generate_daily_report(self):
         """توليد التقرير اليومي"""
@@ -627,45 +986,16 @@ class EmployeeAttendanceSystem:
             messagebox.showerror("خطأ", "صيغة التاريخ غير صحيحة. استخدم YYYY-MM-DD")
             return
         
-        for item in self.report_tree.get_children():
-            self.report_tree.delete(item)
-        
-        if report_date in self.attendance:
-            for emp_id, records in self.attendance[report_date].items():
-                if emp_id in self.employees:
-                    emp_name = self.employees[emp_id]['name']
-                    monthly_salary = self.employees[emp_id].get('monthly_salary', 0)
-                    hourly_rate = self.calculate_hourly_rate(monthly_salary) if monthly_salary else 0
-                    total_hours = 0
-                    
-                    for i, record in enumerate(records, 1):
-                        check_in = record.get('check_in', '')
-                        check_out = record.get('check_out', '')
-                        
-                        hours = ''
-                        salary = ''
-                        if check_in and check_out:
-                            try:
-                                time_in = datetime.strptime(check_in, '%Y-%m-%d %H:%M:%S')
-                                time_out = datetime.strptime(check_out, '%Y-%m-%d %H:%M:%S')
-                                delta = time_out - time_in
-                                hours = round(delta.total_seconds() / 3600, 2)
-                                total_hours += hours
-                                salary = self.calculate_salary(hourly_rate, hours)
-                            except ValueError:
-                                hours = ''
-                                salary = ''
-                        
-                        self.report_tree.insert('', 'end', 
-                            values=(f"{emp_id} ({i})", emp_name, check_in, check_out, hours, salary))
-                    
-                    if total_hours > 0:
-                        total_salary = self.calculate_salary(hourly_rate, total_hours)
-                        self.report_tree.insert('', 'end', 
-                            values=(f"{emp_id} (الإجمالي)", emp_name, "", "", total_hours, total_salary),
-                            tags=('total',))
-                        self.report_tree.tag_configure('total', background='#e6f7ff', font=('Arial', 10, 'bold'))
+        try:
+            rows = self.kiosk.daily_report_rows(report_date, epochs=True)
+        except AttendanceError as e:
+            messagebox.showerror("خطأ", str(e))
+            return
+        if rows is not None:
+            self.show_report(rows)
         else:
+            self.report_table.clear()
+            self.report_rows = []
             messagebox.showinfo("معلومة", "لا توجد بيانات للتاريخ المحدد")
     
     def generate_monthly_report(self):
@@ -678,10 +1008,6 @@ class EmployeeAttendanceSystem:
             messagebox.showerror("خطأ", "يرجى إدخال كود الموظف")
             return
         
-        if emp_id not in self.employees:
-            messagebox.showerror("خطأ", "كود الموظف غير مسجل")
-            return
-        
         try:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
@@ -694,67 +1020,133 @@ class EmployeeAttendanceSystem:
             messagebox.showerror("خطأ", "صيغة التاريخ غير صحيحة. استخدم YYYY-MM-DD")
             return
         
-        for item in self.report_tree.get_children():
-            self.report_tree.delete(item)
+        try:
+            rows, total_period_hours = self.kiosk.monthly_report_rows(emp_id, start_date_str, end_date_str,
+                                                                      epochs=True)
+        except AttendanceError as e:
+            messagebox.showerror("خطأ", str(e))
+            return
+        self.show_report(rows)
+        
+        if total_period_hours <= 0:
+            messagebox.showinfo("معلومة", "لا توجد بيانات للفترة المحددة")
+    
+    def generate_payslips(self):
+        """كشف راتب PDF لكل موظف لفترة التقرير في مجلد واحد مع ملف بيان (على عدة عمليات)"""
+        if not self.local_only():
+            return
         
-        monthly_salary = self.employees[emp_id].get('monthly_salary', 0)
-        hourly_rate = self.calculate_hourly_rate(monthly_salary) if monthly_salary else 0
+        start_date_str = self.start_date.get()
+        end_date_str = self.end_date.get()
         
-        total_period_hours = 0
-        total_period_salary = 0
-        daily_totals = defaultdict(float)
+        try:
+            if datetime.strptime(start_date_str, '%Y-%m-%d') > datetime.strptime(end_date_str, '%Y-%m-%d'):
+                messagebox.showerror("خطأ", "تاريخ البداية يجب أن يكون أقل من تاريخ النهاية")
+                return
+        except ValueError:
+            messagebox.showerror("خطأ", "صيغة التاريخ غير صحيحة. استخدم YYYY-MM-DD")
+            return
         
-        current_date = start_date
-        while current_date <= end_date:
-            date_str = current_date.strftime('%Y-%m-%d')
+        out_dir = filedialog.askdirectory(title="اختر مجلد حفظ كشوف الرواتب")
+        if not out_dir:
+            return
+        
+        self.ensure_loaded(start_date_str, end_date_str)
+        
+        slips = []
+        for emp_id, emp_data in self.employees.items():
+            monthly_salary = emp_data.get('monthly_salary', 0)
+            hourly_rate = self.calculate_hourly_rate(monthly_salary) if monthly_salary else 0
+            days = self.period_days(emp_id, start_date_str, end_date_str, hourly_rate)
+            slips.append({
+                'emp_id': emp_id,
+                'name': emp_data['name'],
+                'department': emp_data.get('department', ''),
+                'hourly_rate': hourly_rate,
+                'start_date': start_date_str,
+                'end_date': end_date_str,
+                'days': days,
+                'hours': sum(values[3] for values in days),
+                'salary': sum(values[4] for values in days),
+            })
+        
+        self.set_export_status("جاري إنشاء كشوف الرواتب...")
+        self.export_worker.submit(
+            payslips.generate_payslips, out_dir, slips,
+            on_done=lambda manifest: self.payslips_finished(out_dir, manifest),
+            on_error=self.export_failed,
+            on_progress=self.export_progress)
+    
+    def payslips_finished(self, out_dir, manifest):
+        self.set_export_status("")
+        message = f"تم إنشاء {manifest['count']} كشف راتب في {out_dir}"
+        if manifest['failed']:
+            message += f"\nتعذر إنشاء {manifest['failed']} كشف (التفاصيل في {payslips.MANIFEST_NAME})"
+        messagebox.showinfo("تم", message)
+    
+    def generate_payroll_report(self):
+        """توليد كشف رواتب كل الموظفين للفترة المحددة"""
+        start_date_str = self.start_date.get()
+        end_date_str = self.end_date.get()
+        
+        try:
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
             
-            if date_str in self.attendance and emp_id in self.attendance[date_str]:
-                day_total = 0
-                
-                for record in self.attendance[date_str][emp_id]:
-                    check_in = record.get('check_in', '')
-                    check_out = record.get('check_out', '')
-                    
-                    hours = 0
-                    if check_in and check_out:
-                        try:
-                            time_in = datetime.strptime(check_in, '%Y-%m-%d %H:%M:%S')
-                            time_out = datetime.strptime(check_out, '%Y-%m-%d %H:%M:%S')
-                            delta = time_out - time_in
-                            hours = round(delta.total_seconds() / 3600, 2)
-                            day_total += hours
-                        except ValueError:
-                            pass
+            if start_date > end_date:
+                messagebox.showerror("خطأ", "تاريخ البداية يجب أن يكون أقل من تاريخ النهاية")
+                return
                 
-                if day_total > 0:
-                    daily_totals[date_str] = day_total
-                    total_period_hours += day_total
-                    day_salary = self.calculate_salary(hourly_rate, day_total)
-                    total_period_salary += day_salary
-                    
-                    first_checkin = self.attendance[date_str][emp_id][0].get('check_in', '')
-                    last_checkout = ''
-                    for record in reversed(self.attendance[date_str][emp_id]):
-                        if record.get('check_out'):
-                            last_checkout = record.get('check_out', '')
-                            break
-                    
-                    self.report_tree.insert('', 'end', 
-                        values=(date_str, first_checkin, last_checkout, day_total, day_salary))
-            
-            current_date += timedelta(days=1)
-        
-        if total_period_hours > 0:
-            self.report_tree.insert('', 'end', 
-                values=(f"الإجمالي ({start_date_str} إلى {end_date_str})", "", "", total_period_hours, total_period_salary),
-                tags=('total',))
-            self.report_tree.tag_configure('total', background='#e6f7ff', font=('Arial', 10, 'bold'))
-        else:
+        except ValueError:
+            messagebox.showerror("خطأ", "صيغة التاريخ غير صحيحة. استخدم YYYY-MM-DD")
+            return
+        
+        try:
+            rows = self.kiosk.payroll_report_rows(start_date_str, end_date_str)
+        except AttendanceError as e:
+            messagebox.showerror("خطأ", str(e))
+            return
+        self.show_report(rows)
+        
+        if not rows:
             messagebox.showinfo("معلومة", "لا توجد بيانات للفترة المحددة")
     
+    def generate_department_report(self):
+        """توليد تكلفة الأقسام للأسبوع أو الشهر أو السنة التي تشمل التاريخ"""
+        report_date = self.report_date.get()
+        
+        try:
+            datetime.strptime(report_date, '%Y-%m-%d')
+        except ValueError:
+            messagebox.showerror("خطأ", "صيغة التاريخ غير صحيحة. استخدم YYYY-MM-DD")
+            return
+        
+        try:
+            rows, period = self.kiosk.department_report_rows(self.report_granularity.get(), report_date)
+        except AttendanceError as e:
+            messagebox.showerror("خطأ", str(e))
+            return
+        self.show_report(rows)
+        
+        if not rows:
+            messagebox.showinfo("معلومة", f"لا توجد بيانات للفترة {period}")
+    
+    def show_report(self, rows):
+        """عرض صفوف تقرير من النواة؛ القيم الأصلية (أوقات بالثواني وأرقام) تبقى لتصدير Excel"""
+        self.report_rows = rows
+        columns, _ = exports.REPORT_HEADERS[self.report_type.get()]
+        self.report_table.set_rows((iid, exports.display_values(values, columns), tags)
+                                   for iid, values, tags in rows)
+    
+    def department_period(self):
+        """الفترة المختارة في تقرير الأقسام وأول وآخر تاريخ فيها"""
+        granularity = self.report_granularity.get()
+        period = period_of(self.report_date.get(), granularity)
+        return (period,) + period_bounds(period, granularity)
+    
     def export_pdf(self):
-        """تصدير التقرير إلى PDF"""
-        if not self.report_tree.get_children():
+        """تصدير التقرير إلى PDF (الكتابة في الخلفية)"""
+        if not self.report_table:
             messagebox.showerror("خطأ", "لا توجد بيانات للتصدير")
             return
         
@@ -767,60 +1159,23 @@ class EmployeeAttendanceSystem:
         if not file_path:
             return
         
-        pdf = FPDF()
-        pdf.add_page()
-        
-        try:
-            pdf.add_font('Arial', '', 'arial.ttf', uni=True)
-            pdf.set_font('Arial', '', 12)
-        except:
-            pdf.set_font('Arial', '', 12)
-        
         if self.report_type.get() == 'daily':
             title = f"تقرير الحضور اليومي - {self.report_date.get()}"
+        elif self.report_type.get() == 'payroll':
+            title = f"كشف الرواتب للفترة - {self.start_date.get()} إلى {self.end_date.get()}"
+        elif self.report_type.get() == 'department':
+            title = f"تكلفة الأقسام - {self.department_period()[0]}"
         else:
             title = f"تقرير الحضور للفترة - {self.start_date.get()} إلى {self.end_date.get()} للموظف {self.monthly_emp_id.get()}"
         
-        pdf.cell(0, 10, title, 0, 1, 'C')
-        pdf.ln(10)
+        headers, col_widths = exports.REPORT_HEADERS[self.report_type.get()]
         
-        if self.report_type.get() == 'daily':
-            col_widths = [25, 35, 35, 35, 25, 25]
-            headers = ['كود الموظف', 'اسم الموظف', 'وقت الحضور', 'وقت الانصراف', 'الساعات', 'الراتب']
-        else:
-            col_widths = [35, 35, 35, 25, 25]
-            headers = ['التاريخ', 'وقت الحضور', 'وقت الانصراف', 'الساعات', 'الراتب']
-        
-        for i, header in enumerate(headers):
-            pdf.cell(col_widths[i], 10, header, 1, 0, 'C')
-        pdf.ln()
-        
-        for item in self.report_tree.get_children():
-            values = self.report_tree.item(item)['values']
-            
-            if "الإجمالي" in str(values[0]):
-                continue
-            
-            for i, value in enumerate(values):
-                pdf.cell(col_widths[i], 10, str(value), 1, 0, 'C')
-            pdf.ln()
-        
-        for item in self.report_tree.get_children():
-            values = self.report_tree.item(item)['values']
-            if "الإجمالي" in str(values[0]):
-                pdf.set_font('Arial', 'B', 12)
-                pdf.cell(sum(col_widths[:-2]), 10, "الإجمالي:", 1, 0, 'R')
-                pdf.cell(col_widths[-2], 10, str(values[-2]), 1, 0, 'C')
-                pdf.cell(col_widths[-1], 10, str(values[-1]), 1, 0, 'C')
-                pdf.set_font('Arial', '', 12)
-                break
-        
-        pdf.output(file_path)
-        messagebox.showinfo("تم", f"تم تصدير التقرير إلى {file_path}")
+        self.start_export(exports.write_pdf_report, file_path, title, headers, col_widths,
+                          self.report_table.values())
     
     def export_excel(self):
-        """تصدير التقرير إلى Excel"""
-        if not self.report_tree.get_children():
+        """تصدير التقرير إلى Excel (الكتابة في الخلفية)"""
+        if not self.report_table:
             messagebox.showerror("خطأ", "لا توجد بيانات للتصدير")
             return
         
@@ -833,25 +1188,79 @@ class EmployeeAttendanceSystem:
         if not file_path:
             return
         
-        data = []
-        columns = []
+        columns, _ = exports.REPORT_HEADERS[self.report_type.get()]
+        self.start_export(exports.write_excel_report, file_path, columns,
+                          [values for _, values, _ in self.report_rows])
+    
+    def export_all_employees_excel(self):
+        """ملف Excel بورقة لكل موظف لفترة التقرير الحالية (يُكتب بالتدفق في الخلفية)"""
+        if not self.local_only():
+            return
         
         if self.report_type.get() == 'daily':
-            columns = ['كود الموظف', 'اسم الموظف', 'وقت الحضور', 'وقت الانصراف', 'الساعات', 'الراتب']
+            start_date_str = end_date_str = self.report_date.get()
+        elif self.report_type.get() == 'department':
+            try:
+                _, start_date_str, end_date_str = self.department_period()
+            except ValueError:
+                messagebox.showerror("خطأ", "صيغة التاريخ غير صحيحة. استخدم YYYY-MM-DD")
+                return
         else:
-            columns = ['التاريخ', 'وقت الحضور', 'وقت الانصراف', 'الساعات', 'الراتب']
+            start_date_str, end_date_str = self.start_date.get(), self.end_date.get()
         
-        for item in self.report_tree.get_children():
-            values = self.report_tree.item(item)['values']
-            data.append(values)
+        try:
+            if datetime.strptime(start_date_str, '%Y-%m-%d') > datetime.strptime(end_date_str, '%Y-%m-%d'):
+                messagebox.showerror("خطأ", "تاريخ البداية يجب أن يكون أقل من تاريخ النهاية")
+                return
+        except ValueError:
+            messagebox.showerror("خطأ", "صيغة التاريخ غير صحيحة. استخدم YYYY-MM-DD")
+            return
         
-        df = pd.DataFrame(data, columns=columns)
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=[("Excel Files", "*.xlsx")],
+            title="حفظ حضور كل الموظفين كـ Excel"
+        )
         
-        try:
-            df.to_excel(file_path, index=False, engine='openpyxl')
-            messagebox.showinfo("تم", f"تم تصدير التقرير إلى {file_path}")
-        except Exception as e:
-            messagebox.showerror("خطأ", f"حدث خطأ أثناء التصدير: {str(e)}")
+        if not file_path:
+            return
+        
+        self.ensure_loaded(start_date_str, end_date_str)
+        
+        # مراجع الجلسات تؤخذ هنا في خيط الواجهة؛ الخيط الخلفي يقرأ منها فقط
+        employees = []
+        for emp_id, emp_data in self.employees.items():
+            monthly_salary = emp_data.get('monthly_salary', 0)
+            hourly_rate = self.calculate_hourly_rate(monthly_salary) if monthly_salary else 0
+            employees.append((emp_id, emp_data, hourly_rate,
+                              exports.employee_sessions(self.session_index, emp_id, start_date_str, end_date_str)))
+        
+        self.start_export(exports.write_employees_workbook, file_path, employees)
+    
+    def start_export(self, write_report, file_path, *args):
+        """تشغيل التصدير في خيط التصدير؛ الحضور والانصراف يستمران أثناءه بشكل طبيعي"""
+        self.set_export_status("جاري التصدير...")
+        self.export_worker.submit(
+            write_report, file_path, *args,
+            on_done=self.export_finished,
+            on_error=self.export_failed,
+            on_progress=self.export_progress)
+    
+    def set_export_status(self, text):
+        # قد تكون واجهة المدير أُغلقت قبل انتهاء التصدير
+        if self.export_status.winfo_exists():
+            self.export_status.config(text=text)
+    
+    def export_progress(self, fraction, text=''):
+        self.set_export_status(text or f"جاري التصدير... {int(fraction * 100)}%")
+    
+    def export_finished(self, file_path):
+        self.set_export_status("")
+        messagebox.showinfo("تم", f"تم تصدير التقرير إلى {file_path}")
+    
+    def export_failed(self, error):
+        self.set_export_status("")
+        messagebox.showerror("خطأ", f"حدث خطأ أثناء التصدير: {str(error)}")
 
 # تشغيل التطبيق
 if __name__ == "__main__":
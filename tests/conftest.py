@@ -0,0 +1,26 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_data_dir(tmp_path):
+    """مجلد بيانات بملف attendance.json القديم: {التاريخ: {الكود: [(الحضور، الانصراف)]}}"""
+
+    def make(employees, attendance, name='data'):
+        data_dir = tmp_path / name
+        data_dir.mkdir()
+        with open(data_dir / 'employees.json', 'w', encoding='utf-8') as f:
+            json.dump(employees, f, ensure_ascii=False)
+        with open(data_dir / 'attendance.json', 'w', encoding='utf-8') as f:
+            json.dump({date: {emp_id: [{'check_in': check_in, 'check_out': check_out}
+                                       for check_in, check_out in records]
+                              for emp_id, records in day.items()}
+                       for date, day in attendance.items()}, f, ensure_ascii=False)
+        return str(data_dir)
+
+    return make
@@ -0,0 +1,88 @@
+import os
+
+from archive import ArchiveStore
+from core import AttendanceCore
+from models import parse_time
+
+EMPLOYEES = {
+    '1001': {'name': 'أحمد', 'department': 'الإنتاج', 'monthly_salary': 4000},
+    '1002': {'name': 'منى', 'department': 'الجودة', 'monthly_salary': 5000},
+}
+
+
+def session(check_in, check_out):
+    return parse_time(check_in), parse_time(check_out)
+
+
+def shards():
+    return {
+        '2022-01': {'2022-01-03': {'1001': [session('2022-01-03 08:00:00', '2022-01-03 16:00:00')],
+                                   '1002': [session('2022-01-03 09:00:00', '2022-01-03 13:30:00')]}},
+        '2022-02': {'2022-02-07': {'1001': [session('2022-02-07 08:00:00', '2022-02-07 12:00:00'),
+                                            session('2022-02-07 13:00:00', '2022-02-07 17:00:00')]}},
+    }
+
+
+def test_write_year_and_read_months(tmp_path):
+    store = ArchiveStore(str(tmp_path))
+    index = store.write_year(2022, shards())
+    assert index['file'] == '2022.1.arch'
+    assert (index['first_date'], index['last_date'], index['sessions'], index['hours']) == \
+        ('2022-01-03', '2022-02-07', 4, 20.5)
+    assert index['employees'] == {'1001': [2, 3, 16.0], '1002': [1, 1, 4.5]}
+
+    # قارئ جديد يقرأ الفهرس من القرص، ويفتح أشهر الأرشيف المطلوبة فقط
+    store = ArchiveStore(str(tmp_path))
+    assert store.months() == {'2022-01': '2022', '2022-02': '2022'}
+    attendance = store.read_months(['2022-02', '2023-01'])
+    assert list(attendance) == ['2022-02-07']
+    assert [(record.check_in, record.check_out) for record in attendance['2022-02-07']['1001']] == \
+        [('2022-02-07 08:00:00', '2022-02-07 12:00:00'), ('2022-02-07 13:00:00', '2022-02-07 17:00:00')]
+    assert store.read_year('2022') == shards()
+
+    # إعادة الكتابة بإصدار جديد وحذف ملف الإصدار السابق
+    assert store.write_year('2022', {'2022-01': shards()['2022-01']})['generation'] == 2
+    assert sorted(os.listdir(store.dir)) == ['2022.2.arch', '2022.index.json']
+    assert store.months() == {'2022-01': '2022'}
+
+
+def test_purge_employees_rewrites_only_archives_that_list_them(tmp_path):
+    store = ArchiveStore(str(tmp_path))
+    store.write_year(2022, shards())
+    store.write_year(2021, {'2021-12': {'2021-12-01': {
+        '1001': [session('2021-12-01 08:00:00', '2021-12-01 09:00:00')]}}})
+
+    assert store.purge_employees(['1002']) == 1
+    assert store.indexes['2022']['generation'] == 2
+    assert store.indexes['2021']['generation'] == 1
+    assert store.indexes['2022']['employees'] == {'1001': [2, 3, 16.0]}
+    assert '1002' not in store.read_months(['2022-01'])['2022-01-03']
+
+    assert store.purge_employees(['1001']) == 4
+    assert store.indexes['2022']['sessions'] == 0
+    assert store.read_months(['2022-01', '2022-02', '2021-12']) == {}
+
+
+def test_reader_sees_archive_written_by_another_process(make_data_dir):
+    data_dir = make_data_dir(EMPLOYEES, {
+        '2022-05-02': {'1001': [('2022-05-02 08:00:00', '2022-05-02 16:00:00')]},
+        '2023-05-02': {'1002': [('2023-05-02 08:00:00', '2023-05-02 12:00:00')]},
+    })
+    writer = AttendanceCore('json', data_dir)
+    writer.storage.archive_year('2022')
+
+    reader = AttendanceCore('json', data_dir, read_only=True)
+    try:
+        assert reader.monthly_report_rows('1001', '2022-05-01', '2022-05-31')[1] == 8.0
+        version = reader.storage.data_version()
+
+        # الكاتب يؤرشف سنة أخرى ويحذف ملفاتها الحية
+        writer.storage.archive_year('2023')
+        writer.storage.close()
+        assert reader.storage.data_version() != version
+
+        reader.refresh()
+        assert reader.storage.archive.years() == ['2022', '2023']
+        assert reader.monthly_report_rows('1002', '2023-05-01', '2023-05-31')[1] == 4.0
+    finally:
+        reader.storage.close()
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from openpyxl import load_workbook
+
+import exports
+from core import AttendanceCore
+
+EMPLOYEES = {
+    '2024-01-01': {'name': '2024-02-03', 'department': '2024-02-03 08:00:00', 'monthly_salary': 4000},
+}
+
+ATTENDANCE = {
+    # جلسة تبدأ بعد منتصف الليل لكنها مسجلة في آخر يوم الفترة
+    '2024-03-31': {'2024-01-01': [('2024-03-31 20:00:00', '2024-03-31 23:00:00'),
+                                  ('2024-04-01 00:30:00', '2024-04-01 02:00:00')]},
+    '2024-04-01': {'2024-01-01': [('2024-04-01 08:00:00', '2024-04-01 16:00:00')]},
+}
+
+
+def test_employee_sessions_selects_by_date_key(make_data_dir):
+    core = AttendanceCore('json', make_data_dir(EMPLOYEES, ATTENDANCE))
+    try:
+        core.ensure_loaded('2024-03-01', '2024-04-30')
+        sessions = exports.employee_sessions(core.session_index, '2024-01-01', '2024-03-01', '2024-03-31')
+        assert [(day, record.check_in) for day, record in sessions] == [
+            ('2024-03-31', '2024-03-31 20:00:00'), ('2024-03-31', '2024-04-01 00:30:00')]
+        assert [day for day, _ in exports.employee_sessions(
+            core.session_index, '2024-01-01', '2024-04-01', '2024-04-30')] == ['2024-04-01']
+    finally:
+        core.storage.close()
+
+
+def test_excel_report_converts_only_date_and_time_columns(make_data_dir, tmp_path):
+    core = AttendanceCore('json', make_data_dir(EMPLOYEES, ATTENDANCE))
+    try:
+        rows = core.daily_report_rows('2024-03-31', epochs=True)
+        assert [exports.display_values(values, exports.REPORT_HEADERS['daily'][0]) for _, values, _ in rows] == \
+            [values for _, values, _ in core.daily_report_rows('2024-03-31')]
+        monthly, _ = core.monthly_report_rows('2024-01-01', '2024-03-01', '2024-04-30', epochs=True)
+    finally:
+        core.storage.close()
+    path = str(tmp_path / 'daily.xlsx')
+    headers, _ = exports.REPORT_HEADERS['daily']
+    exports.write_excel_report(path, headers, [values for _, values, _ in rows])
+
+    sheet = load_workbook(path).active
+    first = [cell.value for cell in sheet[2]]
+    assert first[:2] == ['2024-01-01 (1)', '2024-02-03']
+    assert first[2:] == [datetime(2024, 3, 31, 20, 0), datetime(2024, 3, 31, 23, 0), 3.0, 461.55]
+    # صف الإجمالي بدون أوقات
+    assert [cell.value for cell in sheet[4]][2:4] == [None, None]
+
+    headers, _ = exports.REPORT_HEADERS['monthly']
+    exports.write_excel_report(path, headers, [values for _, values, _ in monthly])
+    assert [cell.value for cell in load_workbook(path).active[3]] == [
+        datetime(2024, 4, 1), datetime(2024, 4, 1, 8, 0), datetime(2024, 4, 1, 16, 0), 8.0, 1230.8]
+
+    exports.write_excel_report(path, ['التاريخ', 'القسم'], [('2024-03-31', '2024-02-03 08:00:00')])
+    assert [cell.value for cell in load_workbook(path).active[2]] == [datetime(2024, 3, 31), '2024-02-03 08:00:00']
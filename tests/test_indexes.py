@@ -0,0 +1,58 @@
+from indexes import EmployeeSearchIndex, normalize_search_text
+
+EMPLOYEES = {
+    '1001': {'name': 'أحمد محمد علي'},
+    '1002': {'name': 'مُنى إبراهيم'},
+    '1003': {'name': 'فاطمة الزهراء'},
+    'AB7': {'name': 'إيمان أحمد'},
+    '2001': {'name': 'مصطفى'},
+}
+
+
+def built(employees):
+    index = EmployeeSearchIndex()
+    index.build(employees)
+    return index
+
+
+def test_normalize_search_text():
+    assert normalize_search_text('  أَحْمـــد  ') == 'احمد'
+    assert normalize_search_text('إيمان آمنة فاطمة مصطفى') == 'ايمان امنه فاطمه مصطفي'
+    assert normalize_search_text('AB7') == 'ab7'
+
+
+def test_prefix_search_ignores_arabic_letter_forms_and_marks():
+    index = built(EMPLOYEES)
+    # بداية الاسم أو أي كلمة فيه، بأي شكل للألف وبدون تشكيل (النتائج بترتيب المفاتيح: 'احمد' قبل 'احمد محمد علي')
+    assert index.search('احمد') == ['AB7', '1001']
+    assert index.search('أَحـمد') == ['AB7', '1001']
+    assert index.search('محمد ع') == ['1001']
+    assert index.search('منى ابر') == ['1002']
+    assert index.search('فاطمة الزهر') == ['1003']
+    assert index.search('مصطفي') == ['2001']
+    assert index.search('ab') == ['AB7']
+    assert index.search('100') == ['1001', '1002', '1003']
+    assert index.search('100', limit=2) == ['1001', '1002']
+    # جزء من وسط كلمة لا يطابق، والنص الفارغ لا يعيد شيئاً
+    assert index.search('حمد') == []
+    assert index.search('  ') == []
+
+
+def test_add_and_remove_match_a_full_build():
+    index = built({emp_id: data for emp_id, data in EMPLOYEES.items() if emp_id != 'AB7'})
+    index.add('AB7', EMPLOYEES['AB7'])
+    assert (index.keys, index.emp_ids) == (built(EMPLOYEES).keys, built(EMPLOYEES).emp_ids)
+    assert index.search('احمد') == ['AB7', '1001']
+
+    index.remove('1001', EMPLOYEES['1001'])
+    assert index.search('احمد') == ['AB7']
+    assert index.search('علي') == []
+
+    # تعديل الاسم: حذف بالبيانات القديمة وإضافة بالجديدة
+    index.remove('1002', EMPLOYEES['1002'])
+    index.add('1002', {'name': 'منى علي'})
+    assert index.search('ابراهيم') == []
+    assert index.search('علي') == ['1002']
+    remaining = {emp_id: data for emp_id, data in EMPLOYEES.items() if emp_id not in ('1001', '1002')}
+    remaining['1002'] = {'name': 'منى علي'}
+    assert (index.keys, index.emp_ids) == (built(remaining).keys, built(remaining).emp_ids)
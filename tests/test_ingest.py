@@ -0,0 +1,158 @@
+import pytest
+
+import ingest
+from core import AttendanceCore
+
+EMPLOYEES = {
+    '1001': {'name': 'أحمد', 'department': 'الإنتاج', 'monthly_salary': 4000},
+    '1002': {'name': 'منى', 'department': 'الجودة', 'monthly_salary': 5000},
+}
+
+
+def write_punches(tmp_path, lines, name='punches.csv'):
+    path = tmp_path / name
+    path.write_text('emp_id,time,type\n' + ''.join(line + '\n' for line in lines), encoding='utf-8')
+    return str(path)
+
+
+def sessions(core, emp_id, date):
+    return [(record.check_in, record.check_out) for record in core.attendance[date][emp_id]]
+
+
+def test_pairing_sorts_per_employee_and_infers_direction(make_data_dir, tmp_path):
+    core = AttendanceCore('json', make_data_dir(EMPLOYEES, {}))
+    try:
+        result = core.import_punches(write_punches(tmp_path, [
+            '1002,2024-05-01 17:00:00,out',
+            '1001,2024-05-01 08:00:00,',
+            '1002,2024-05-01 09:00:00,in',
+            '1001,2024-05-01 16:30:00,',
+            # الوردية الليلية: الانصراف في اليوم التالي يغلق جلسة يومها
+            '1001,2024-05-01T22:00:00,حضور',
+            '1001,2024-05-02 06:00:00,انصراف',
+        ]))
+        assert (result['rows'], result['check_ins'], result['check_outs'], result['duplicates']) == (6, 3, 3, 0)
+        assert result['rejected'] == []
+        assert sessions(core, '1001', '2024-05-01') == [('2024-05-01 08:00:00', '2024-05-01 16:30:00'),
+                                                        ('2024-05-01 22:00:00', '2024-05-02 06:00:00')]
+        assert sessions(core, '1002', '2024-05-01') == [('2024-05-01 09:00:00', '2024-05-01 17:00:00')]
+        assert core.open_sessions == {}
+    finally:
+        core.storage.close()
+
+
+def test_double_taps_within_dedupe_window(make_data_dir, tmp_path):
+    core = AttendanceCore('json', make_data_dir(EMPLOYEES, {}))
+    try:
+        result = core.import_punches(write_punches(tmp_path, [
+            '1001,2024-05-01 08:00:00,in',
+            '1001,2024-05-01 08:00:40,in',
+            f'1001,2024-05-01 08:0{ingest.DEDUPE_SECONDS // 60}:00,',
+            '1001,2024-05-01 16:00:00,out',
+            '1001,2024-05-01 16:02:00,',
+        ]))
+        # ضغطتان خلال المهلة مكررتان؛ بعد المهلة الضغطة بدون نوع حضور جديد
+        assert (result['check_ins'], result['check_outs'], result['duplicates']) == (2, 1, 2)
+        assert sessions(core, '1001', '2024-05-01') == [('2024-05-01 08:00:00', '2024-05-01 16:00:00'),
+                                                        ('2024-05-01 16:02:00', '')]
+    finally:
+        core.storage.close()
+
+
+def test_rejection_reasons(make_data_dir, tmp_path):
+    core = AttendanceCore('json', make_data_dir(EMPLOYEES, {}))
+    try:
+        result = core.import_punches(write_punches(tmp_path, [
+            '9999,2024-05-01 08:00:00,in',
+            '1001,2024-05-01 25:00:00,in',
+            '1001,2024-05-01 08:00:00,break',
+            '1002,2024-05-01 07:00:00,out',
+            '1001,2024-05-01 08:00:00,in',
+            '1001,2024-05-01 09:00:00,in',
+        ]))
+        assert [(line_no, reason) for line_no, _, _, reason in result['rejected']] == [
+            (2, ingest.REJECT_UNKNOWN_EMPLOYEE),
+            (3, ingest.REJECT_BAD_TIME),
+            (4, ingest.REJECT_BAD_TYPE),
+            (5, ingest.REJECT_NOT_IN),
+            (7, ingest.REJECT_ALREADY_IN),
+        ]
+
+        result = core.import_punches(write_punches(tmp_path, ['1001,2024-05-01 07:30:00,out'], 'late.csv'))
+        assert [reason for _, _, _, reason in result['rejected']] == [ingest.REJECT_OUT_OF_ORDER]
+    finally:
+        core.storage.close()
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_reimport_is_idempotent(make_data_dir, tmp_path, backend):
+    data_dir = make_data_dir(EMPLOYEES, {})
+    path = write_punches(tmp_path, [
+        '1001,2024-05-01 08:00:00,in',
+        '1001,2024-05-01 16:00:00,out',
+        '1002,2024-05-01 09:00:00,in',
+    ])
+    core = AttendanceCore(backend, data_dir)
+    try:
+        first = core.import_punches(path)
+        again = core.import_punches(path)
+        assert (first['check_ins'], first['check_outs'], first['duplicates']) == (2, 1, 0)
+        assert (again['check_ins'], again['check_outs'], again['duplicates'], again['rejected']) == (0, 0, 3, [])
+    finally:
+        core.storage.close()
+
+    core = AttendanceCore(backend, data_dir)
+    try:
+        again = core.import_punches(path)
+        assert (again['check_ins'], again['check_outs'], again['duplicates']) == (0, 0, 3)
+        assert sessions(core, '1001', '2024-05-01') == [('2024-05-01 08:00:00', '2024-05-01 16:00:00')]
+        assert sessions(core, '1002', '2024-05-01') == [('2024-05-01 09:00:00', '')]
+    finally:
+        core.storage.close()
+
+
+def test_jsonl_rows_that_are_not_objects_are_rejected(make_data_dir, tmp_path):
+    path = tmp_path / 'punches.jsonl'
+    path.write_text('[1, 2]\n"x"\n7\nnot json\n{"emp_id": "1001", "time": "2024-05-01 08:00:00", "type": "in"}\n',
+                    encoding='utf-8')
+    assert list(ingest.read_punch_file(str(path)))[:4] == [(1, '', '', None), (2, '', '', None),
+                                                           (3, '', '', None), (4, '', '', None)]
+
+    core = AttendanceCore('json', make_data_dir(EMPLOYEES, {}))
+    try:
+        result = core.import_punches(str(path))
+        assert (result['rows'], result['check_ins']) == (5, 1)
+        assert [line_no for line_no, _, _, _ in result['rejected']] == [1, 2, 3, 4]
+    finally:
+        core.storage.close()
+
+
+def test_check_in_overlapping_a_closed_session_is_rejected(make_data_dir, tmp_path):
+    core = AttendanceCore('json', make_data_dir(EMPLOYEES, {}))
+    try:
+        core.import_punches(write_punches(tmp_path, [
+            '1001,2024-05-01 08:00:00,in',
+            '1001,2024-05-01 16:00:00,out',
+            '1002,2024-05-01 22:00:00,in',
+            '1002,2024-05-02 06:00:00,out',
+        ]))
+        result = core.import_punches(write_punches(tmp_path, [
+            # نفس الجلسة المحفوظة (مكررة) ثم حضور داخلها
+            '1001,2024-05-01 08:00:00,in',
+            '1001,2024-05-01 12:00:00,in',
+            '1001,2024-05-01 13:00:00,out',
+            # حضور داخل وردية ليلية محفوظة في اليوم السابق
+            '1002,2024-05-02 05:00:00,in',
+            # بعد انتهاء الجلسة المحفوظة: مقبول
+            '1001,2024-05-01 17:00:00,in',
+        ], 'overlap.csv'))
+        assert [(line_no, reason) for line_no, _, _, reason in result['rejected']] == [
+            (3, ingest.REJECT_OUT_OF_ORDER),
+            (4, ingest.REJECT_NOT_IN),
+            (5, ingest.REJECT_OUT_OF_ORDER),
+        ]
+        assert (result['check_ins'], result['duplicates']) == (1, 1)
+        assert sessions(core, '1001', '2024-05-01') == [('2024-05-01 08:00:00', '2024-05-01 16:00:00'),
+                                                        ('2024-05-01 17:00:00', '')]
+    finally:
+        core.storage.close()
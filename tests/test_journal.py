@@ -0,0 +1,142 @@
+import os
+import threading
+
+import pytest
+
+from core import AttendanceCore
+from journal import PunchJournal
+
+EMPLOYEES = {str(emp_id): {'name': f'موظف {emp_id}', 'department': '', 'monthly_salary': 3000}
+             for emp_id in range(1001, 1011)}
+
+
+def test_failed_compaction_restores_rotated_segment(tmp_path):
+    journal = PunchJournal(str(tmp_path / 'attendance.journal'), commit_interval=0)
+    journal.open()
+    try:
+        for i in range(3):
+            journal.append({'op': 'in', 'n': i})
+        errors = []
+
+        def fail(snapshot):
+            journal.append({'op': 'in', 'n': 3})
+            raise OSError('القرص ممتلئ')
+
+        assert journal.start_compaction({}, fail, errors.append)
+        journal.wait_for_compaction()
+
+        assert [str(e) for e in errors] == ['القرص ممتلئ']
+        assert not os.path.exists(journal.old_path)
+        assert journal.entries_count == 4
+        assert [entry['n'] for entry in journal.replay()] == [0, 1, 2, 3]
+        # السجل ما زال مفتوحاً للكتابة والتدوير
+        journal.append({'op': 'in', 'n': 4})
+        assert journal.rotate()
+        journal.drop_rotated()
+    finally:
+        journal.close()
+
+
+def test_storage_does_not_retry_failed_snapshot_on_every_punch(make_data_dir, monkeypatch):
+    data_dir = make_data_dir(EMPLOYEES, {})
+    core = AttendanceCore('json', data_dir)
+    storage = core.storage
+    storage.compact_threshold = storage.next_compaction = 4
+    snapshots = []
+
+    def fail(snapshot):
+        snapshots.append(snapshot)
+        raise OSError('القرص ممتلئ')
+
+    monkeypatch.setattr(storage, '_write_snapshot', fail)
+    try:
+        for emp_id in EMPLOYEES:
+            date = core.check_in_employee(emp_id)['date']
+            storage.journal.wait_for_compaction()
+        # محاولة عند 4 حركات ثم بعد 4 حركات جديدة، وليس مع كل حركة فوق الحد
+        assert [len(snapshot['shards'][date[:7]][date]) for snapshot in snapshots] == [4, 8]
+        assert isinstance(storage.compaction_error, OSError)
+        assert not os.path.exists(storage.journal.old_path)
+        assert storage.next_compaction == 8 + 4
+        assert storage.journal.entries_count == len(EMPLOYEES)
+    finally:
+        storage.close()
+
+    # كل الحركات تُعاد من السجل عند الفتح التالي
+    core = AttendanceCore('json', data_dir)
+    try:
+        for emp_id in EMPLOYEES:
+            assert core.employee_status(emp_id)['open_date'] is not None
+    finally:
+        core.storage.close()
+
+
+def test_failed_fsync_is_raised_to_waiters_and_retried(tmp_path, monkeypatch):
+    import journal as journal_module
+
+    journal = PunchJournal(str(tmp_path / 'attendance.journal'), commit_interval=0)
+    journal.open()
+    fsync = os.fsync
+    failures = [OSError('القرص ممتلئ')]
+
+    def flaky_fsync(fd):
+        if failures:
+            raise failures.pop()
+        fsync(fd)
+
+    try:
+        journal.append({'op': 'in', 'n': 0})
+        monkeypatch.setattr(journal_module.os, 'fsync', flaky_fsync)
+        errors = []
+
+        def punch():
+            try:
+                journal.append({'op': 'in', 'n': 1})
+            except OSError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=punch, daemon=True)
+        thread.start()
+        thread.join(5)
+        # المنتظر يحصل على الخطأ بدلاً من الانتظار للأبد
+        assert not thread.is_alive()
+        assert [str(e) for e in errors] == ['القرص ممتلئ']
+        assert isinstance(journal.error, OSError)
+
+        # الحركة التالية تعيد كتابة المعلقة بالترتيب، بدون سطر جزئي أو مكرر
+        journal.append({'op': 'in', 'n': 2})
+        assert journal.error is None
+        assert [entry['n'] for entry in journal.replay()] == [0, 1, 2]
+    finally:
+        journal.close()
+
+
+def test_failed_save_restores_rotated_segment(make_data_dir, monkeypatch):
+    data_dir = make_data_dir(EMPLOYEES, {})
+    core = AttendanceCore('json', data_dir)
+    storage = core.storage
+    try:
+        core.check_in_employee('1001')
+
+        def fail(snapshot):
+            raise OSError('القرص ممتلئ')
+
+        monkeypatch.setattr(storage, '_write_snapshot', fail)
+        with pytest.raises(OSError):
+            core.save_data()
+        assert not os.path.exists(storage.journal.old_path)
+        assert storage.dirty_months
+
+        monkeypatch.undo()
+        core.check_in_employee('1002')
+        core.save_data()
+        assert not os.path.exists(storage.journal.old_path)
+        assert storage.journal.entries_count == 0
+    finally:
+        storage.close()
+
+    core = AttendanceCore('json', data_dir)
+    try:
+        assert sorted(core.open_sessions) == ['1001', '1002']
+    finally:
+        core.storage.close()
@@ -0,0 +1,84 @@
+import pytest
+
+import mapsnap
+from core import AttendanceCore
+from models import parse_time
+
+EMPLOYEES = {
+    '1001': {'name': 'أحمد', 'department': 'الإنتاج', 'monthly_salary': 4000},
+    '1002': {'name': 'منى', 'department': 'الجودة', 'monthly_salary': 5000},
+}
+
+ATTENDANCE = {
+    '2024-05-01': {'1001': [('2024-05-01 08:00:00', '2024-05-01 16:00:00')]},
+    '2024-05-02': {'1001': [('2024-05-02 08:00:00', '2024-05-02 12:00:00'),
+                            ('2024-05-02 13:00:00', '2024-05-02 17:30:00')],
+                   '1002': [('2024-05-02 09:00:00', '')]},
+    '2024-05-20': {'1001': [('2024-05-20 08:00:00', '2024-05-20 10:00:00')]},
+}
+
+
+def shard():
+    return {date: {emp_id: [(parse_time(check_in), parse_time(check_out)) for check_in, check_out in records]
+                   for emp_id, records in employees.items()}
+            for date, employees in ATTENDANCE.items()}
+
+
+def test_sessions_slice_by_date(tmp_path):
+    path = str(tmp_path / '2024-05.map')
+    mapsnap.write_month(path, shard())
+    month = mapsnap.MappedMonth(path)
+    try:
+        assert month.employee_ids() == ['1001', '1002']
+        assert month.find('1003') is None
+        assert [date for date, _, _ in month.sessions('1001')] == ['2024-05-01', '2024-05-02', '2024-05-02',
+                                                                    '2024-05-20']
+        assert month.sessions('1001', '2024-05-02', '2024-05-19') == [
+            ('2024-05-02', parse_time('2024-05-02 08:00:00'), parse_time('2024-05-02 12:00:00')),
+            ('2024-05-02', parse_time('2024-05-02 13:00:00'), parse_time('2024-05-02 17:30:00')),
+        ]
+        # حدود لا تطابق تاريخاً محفوظاً
+        assert month.sessions('1001', '2024-04-01', '2024-05-01')[0][0] == '2024-05-01'
+        assert month.sessions('1001', '2024-05-03', '2024-05-19') == []
+        assert month.sessions('1001', '2024-05-21', '2024-05-31') == []
+        assert month.sessions('1002') == [('2024-05-02', parse_time('2024-05-02 09:00:00'), None)]
+    finally:
+        month.close()
+
+
+def test_invalid_files_are_rejected(tmp_path):
+    path = str(tmp_path / '2024-05.map')
+    mapsnap.write_month(path, shard())
+    with open(path, 'rb') as f:
+        data = f.read()
+    for broken in (data[:mapsnap.HEADER.size - 1], data[:-8], b'x' * len(data)):
+        with open(path, 'wb') as f:
+            f.write(broken)
+        with pytest.raises(mapsnap.MappedSnapshotError):
+            mapsnap.MappedMonth(path)
+
+
+def test_reader_keeps_old_snapshot_until_refresh(make_data_dir, tmp_path):
+    data_dir = make_data_dir(EMPLOYEES, ATTENDANCE)
+    core = AttendanceCore('json', data_dir)
+    try:
+        core.storage.build_mapped()
+        attendance = mapsnap.MappedAttendance(data_dir)
+        try:
+            assert '2024-05' in attendance.months()
+            assert mapsnap.employee_hours(attendance, '1001', '2024-05-01', '2024-05-31') == (3, 18.5)
+            assert attendance.month('2024-06') is None
+
+            # الكاتب يستبدل ملف الشهر؛ القارئ يكمل من النسخة التي فتحها حتى refresh
+            punches = tmp_path / 'punches.csv'
+            punches.write_text('emp_id,time,type\n1001,2024-05-25 08:00:00,in\n1001,2024-05-25 09:30:00,out\n',
+                               encoding='utf-8')
+            core.import_punches(str(punches))
+            core.save_data()
+            assert mapsnap.employee_hours(attendance, '1001', '2024-05-01', '2024-05-31') == (3, 18.5)
+            attendance.refresh()
+            assert mapsnap.employee_hours(attendance, '1001', '2024-05-01', '2024-05-31') == (4, 20.0)
+        finally:
+            attendance.close()
+    finally:
+        core.storage.close()
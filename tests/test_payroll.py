@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from core import AttendanceCore
+
+EMPLOYEES = {
+    '1001': {'name': 'أحمد', 'department': 'الإنتاج', 'monthly_salary': 4321},
+    '1002': {'name': 'منى', 'department': 'الجودة', 'monthly_salary': 5173},
+    '1003': {'name': 'سعيد', 'department': '', 'monthly_salary': 0},
+}
+
+
+def night_shifts():
+    attendance = {
+        # جلسة تعبر منتصف الليل، ثم جلسة تبدأ بعده لكنها مسجلة في نفس اليوم
+        '2024-03-10': {'1001': [('2024-03-10 21:46:00', '2024-03-10 23:49:49'),
+                                ('2024-03-11 00:25:49', '2024-03-11 02:29:26')]},
+        '2024-03-11': {'1001': [('2024-03-11 22:00:00', '2024-03-12 06:17:13')]},
+        # يوم آخر الفترة كل جلساته بعد منتصف الليل
+        '2024-03-31': {'1002': [('2024-04-01 00:10:00', '2024-04-01 05:55:55')]},
+        # خارج الفترة
+        '2024-04-01': {'1002': [('2024-04-01 08:00:00', '2024-04-01 16:00:00')]},
+    }
+    rng = random.Random(3)
+    for day in range(1, 31):
+        date = f'2024-03-{day:02d}'
+        for emp_id in ('1002', '1003'):
+            start = rng.randrange(6 * 3600, 10 * 3600)
+            end = start + rng.randrange(3600, 9 * 3600)
+            attendance.setdefault(date, {}).setdefault(emp_id, []).append(
+                (f'{date} {start // 3600:02d}:{start // 60 % 60:02d}:{start % 60:02d}',
+                 f'{date} {end // 3600:02d}:{end // 60 % 60:02d}:{end % 60:02d}'))
+    return attendance
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_payroll_matches_period_report(make_data_dir, backend):
+    core = AttendanceCore(backend, make_data_dir(EMPLOYEES, night_shifts()))
+    try:
+        payroll = core.compute_payroll('2024-03-01', '2024-03-31').set_index('emp_id')
+        for emp_id in EMPLOYEES:
+            rows, hours = core.monthly_report_rows(emp_id, '2024-03-01', '2024-03-31')
+            day_rows = [values for _, values, tags in rows if 'total' not in tags]
+            row = payroll.loc[emp_id]
+            assert row['days'] == len(day_rows)
+            assert row['hours'] == hours
+            assert row['salary'] == sum(values[4] for values in day_rows)
+
+        # الجلسة بعد منتصف الليل محسوبة في يومها المسجل، والجلسة العابرة لمنتصف الليل كاملة
+        assert payroll.loc['1001', 'days'] == 2
+        assert payroll.loc['1001', 'hours'] == 2.06 + 2.06 + 8.29
+        # اليوم الذي كل جلساته بعد منتصف الليل يدخل في الفترة التي بها تاريخه
+        assert core.monthly_report_rows('1002', '2024-03-31', '2024-03-31')[1] == 5.77
+    finally:
+        core.storage.close()
+
+
+def test_payroll_report_rows_total(make_data_dir):
+    core = AttendanceCore('json', make_data_dir(EMPLOYEES, night_shifts()))
+    try:
+        rows = core.payroll_report_rows('2024-03-01', '2024-03-31')
+        values = [values for _, values, tags in rows if 'total' not in tags]
+        total = rows[-1][1]
+        assert total[3] == sum(row[3] for row in values)
+        assert core.payroll_report_rows('2023-01-01', '2023-01-31') == []
+    finally:
+        core.storage.close()
+
+
+def test_department_cost_matches_payroll(make_data_dir):
+    core = AttendanceCore('json', make_data_dir(EMPLOYEES, night_shifts()))
+    try:
+        rows, period = core.department_report_rows('month', '2024-03-15')
+        payroll = core.compute_payroll('2024-03-01', '2024-03-31')
+        payroll['department'] = payroll['department'].replace('', 'بدون قسم')
+        salaries = payroll[payroll['days'] > 0].groupby('department')['salary'].sum()
+
+        values = {values[0]: values for _, values, tags in rows if 'total' not in tags}
+        assert period == '2024-03'
+        assert {department: values[department][4] for department in values} == \
+            {department: round(salary, 2) for department, salary in salaries.items()}
+        assert rows[-1][1][4] == round(sum(salaries), 2)
+    finally:
+        core.storage.close()
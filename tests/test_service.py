@@ -0,0 +1,131 @@
+import pytest
+
+from core import AttendanceCore
+from models import parse_time
+from service import AttendanceService
+
+EMPLOYEES = {
+    '1001': {'name': 'أحمد', 'department': 'الإنتاج', 'monthly_salary': 4000},
+    '1002': {'name': 'منى', 'department': 'الجودة', 'monthly_salary': 5000},
+}
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_failed_batch_write_is_rolled_back(make_data_dir, monkeypatch, backend):
+    data_dir = make_data_dir(EMPLOYEES, {})
+    core = AttendanceCore(backend, data_dir)
+    service = AttendanceService(core)
+    try:
+        service.punch('in', '1001')
+        record_punches = core.storage.record_punches
+
+        def fail(ops):
+            raise OSError('القرص ممتلئ')
+
+        monkeypatch.setattr(core.storage, 'record_punches', fail)
+        with pytest.raises(OSError):
+            service.punch('in', '1002')
+        with pytest.raises(OSError):
+            service.punch('out', '1001')
+
+        # الحركات التي لم تُحفظ لا تبقى في الذاكرة ولا في الفهارس
+        assert service.employee_status('1002')['open_date'] is None
+        assert service.employee_status('1001')['open_date'] is not None
+        assert list(core.open_sessions) == ['1001']
+        date = core.open_sessions['1001'][0]
+        assert '1002' not in core.attendance[date]
+        assert core.session_index.by_employee.get('1002') is None
+        assert core.daily_totals.get('1002', date) is None
+        assert core.daily_totals.get('1001', date).last_check_out is None
+
+        monkeypatch.setattr(core.storage, 'record_punches', record_punches)
+        service.punch('in', '1002')
+    finally:
+        service.close()
+
+    core = AttendanceCore(backend, data_dir)
+    try:
+        assert sorted(core.open_sessions) == ['1001', '1002']
+        assert [len(core.attendance[date][emp_id]) for emp_id in ('1001', '1002')] == [1, 1]
+    finally:
+        core.storage.close()
+
+
+def test_admin_over_service(make_data_dir):
+    import threading
+    from urllib.error import HTTPError
+    from urllib.request import urlopen
+
+    from client import AttendanceClient
+    from core import AttendanceError
+    from service import make_server
+
+    data_dir = make_data_dir(EMPLOYEES, {'2024-05-01': {'1001': [('2024-05-01 08:00:00', '2024-05-01 16:00:00')]}})
+    service = AttendanceService(AttendanceCore('json', data_dir))
+    server = make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    client = AttendanceClient(url)
+    try:
+        client.create_employee('1003', 'سارة', 'الإنتاج', 2600)
+        with pytest.raises(AttendanceError, match='مسجل مسبقاً'):
+            client.create_employee('1003', 'سارة')
+        assert ('1003', ('1003', 'سارة', 'الإنتاج', 2600, 100.0), ()) in client.employee_rows()
+
+        client.check_in_employee('1003')
+        assert [row[0] for row in client.on_site_rows()] == ['1003']
+        assert client.retire_employee('1002') == AttendanceCore.purge_delay_days
+        assert client.last_deleted_employee() == {'emp_id': '1002', 'name': 'منى'}
+        client.restore_deleted_employee('1002')
+        assert client.last_deleted_employee() is None
+
+        rows, total = client.monthly_report_rows('1001', '2024-05-01', '2024-05-31')
+        assert total == 8.0 and rows[0] == ('2024-05-01', ('2024-05-01', '2024-05-01 08:00:00',
+                                                           '2024-05-01 16:00:00', 8.0, 1230.8), ())
+        rows, _ = client.monthly_report_rows('1001', '2024-05-01', '2024-05-31', epochs=True)
+        assert rows[0][1][1:3] == (parse_time('2024-05-01 08:00:00'), parse_time('2024-05-01 16:00:00'))
+        assert client.daily_report_rows('2024-05-02') is None
+        assert client.payroll_report_rows('2024-05-01', '2024-05-31')[0][1][3:] == (1, 8.0, 1230.8)
+        rows, period = client.department_report_rows('month', '2024-05-01')
+        assert period == '2024-05' and rows[0][1] == ('الإنتاج', 1, 1, 8.0, 1230.8)
+        with pytest.raises(AttendanceError, match='غير مسجل'):
+            client.monthly_report_rows('9999', '2024-05-01', '2024-05-31')
+
+        for path in ('/search?q=1&limit=abc', '/reports/daily?date=bad'):
+            with pytest.raises(HTTPError) as error:
+                urlopen(url + path)
+            assert error.value.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+    core = AttendanceCore('json', data_dir)
+    try:
+        assert sorted(core.employees) == ['1001', '1002', '1003'] and not core.tombstones
+    finally:
+        core.storage.close()
+
+
+def test_data_dir_is_locked_while_service_runs(make_data_dir, monkeypatch):
+    import servicelock
+    from core import AttendanceError
+
+    data_dir = make_data_dir(EMPLOYEES, {})
+    # القفل باسم عملية أخرى (القفل نفسه يتعارض بين ملفين مفتوحين حتى في نفس العملية)
+    monkeypatch.setattr(servicelock.os, 'getpid', lambda: -1)
+    lock = servicelock.acquire(data_dir, 'http://127.0.0.1:8765')
+    monkeypatch.undo()
+    try:
+        assert servicelock.acquire(data_dir, 'http://127.0.0.1:8766') is None
+        assert servicelock.holder_url(data_dir) == 'http://127.0.0.1:8765'
+        with pytest.raises(AttendanceError, match='خدمة الحضور تعمل'):
+            AttendanceCore('json', data_dir)
+        # القراءة فقط مسموحة بجانب الخدمة
+        AttendanceCore('json', data_dir, read_only=True).storage.close()
+    finally:
+        servicelock.release(lock)
+
+    # ملف القفل الباقي بعد توقف الخدمة لا يمنع فتح البيانات
+    assert servicelock.holder_url(data_dir) is None
+    AttendanceCore('json', data_dir).storage.close()
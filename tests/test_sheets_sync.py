@@ -0,0 +1,40 @@
+from core import AttendanceCore
+from sheets_sync import FakeWorksheet, SheetSync, displayed_value
+
+EMPLOYEES = {
+    '0012': {'name': '0012', 'department': '2024-01-01', 'monthly_salary': 4000},
+    '1001': {'name': 'أحمد', 'department': 'الإنتاج', 'monthly_salary': 4000},
+}
+
+
+def test_fake_worksheet_coerces_user_entered_values():
+    assert displayed_value('0012', 'USER_ENTERED') == '12'
+    assert displayed_value('2024-05-01', 'USER_ENTERED') == '5/1/2024'
+    assert displayed_value(8.5, 'USER_ENTERED') == '8.5'
+    assert displayed_value("'0012", 'USER_ENTERED') == '0012'
+    assert displayed_value('0012', 'RAW') == '0012'
+
+
+def test_restarted_sync_updates_rows_instead_of_appending(make_data_dir):
+    core = AttendanceCore('json', make_data_dir(EMPLOYEES, {}))
+    worksheet = FakeWorksheet()
+    try:
+        sync = SheetSync(core, worksheet, sleep=lambda seconds: None)
+        core.apply_check_in('0012', '2024-05-01 08:00:00')
+        core.apply_check_in('1001', '2024-05-01 08:30:00')
+        assert sync.sync_once() == 2
+        sync.stop(flush=False)
+        assert [row[:4] for row in worksheet.rows[1:]] == [['2024-05-01', '0012', '0012', '2024-01-01'],
+                                                           ['2024-05-01', '1001', 'أحمد', 'الإنتاج']]
+
+        # بعد إعادة التشغيل (أو فشل دفعة) تُقرأ المفاتيح من الورقة ويُحدث نفس الصف
+        sync = SheetSync(core, worksheet, sleep=lambda seconds: None)
+        core.apply_check_out('0012', '2024-05-01 16:00:00')
+        assert sync.sync_once() == 1
+        assert len(worksheet.rows) == 3
+        assert worksheet.rows[1][5] == '5/1/2024 16:00:00'
+        # العناوين ثم الصفوف الجديدة فقط
+        assert worksheet.calls['append_rows'] == 2
+        sync.stop(flush=False)
+    finally:
+        core.storage.close()
@@ -0,0 +1,62 @@
+import struct
+
+import pytest
+
+import snapfile
+from models import parse_time
+
+
+def shard():
+    return {
+        '2024-05-01': {'1001': [(parse_time('2024-05-01 08:00:00'), parse_time('2024-05-01 16:00:00')),
+                                (parse_time('2024-05-01 17:00:00'), None)],
+                       '1002': [('07:45 ص', parse_time('2024-05-01 15:00:00'))]},
+        '2024-05-02': {'1001': [(parse_time('2024-05-02 08:00:00'), 'غير معروف')]},
+    }
+
+
+def decoded(data):
+    return {date: {emp_id: [(record.start, record.end) for record in records]
+                   for emp_id, records in employees.items()}
+            for date, employees in snapfile.decode_shard(data).items()}
+
+
+def test_round_trip_keeps_epochs_text_and_null_times():
+    data = snapfile.encode_shard(shard())
+    assert data.startswith(snapfile.MAGIC)
+    assert decoded(data) == shard()
+    assert decoded(snapfile.encode_shard({})) == {}
+
+
+def test_checksum_mismatch_is_rejected():
+    data = bytearray(snapfile.encode_shard(shard()))
+    data[-1] ^= 0xFF
+    with pytest.raises(snapfile.SnapshotError, match='checksum'):
+        snapfile.decode_shard(bytes(data))
+    with pytest.raises(snapfile.SnapshotError):
+        snapfile.decode_shard(bytes(data[:snapfile.HEADER.size - 1]))
+    with pytest.raises(snapfile.SnapshotError):
+        snapfile.decode_shard(bytes(data[:-5]))
+
+
+def test_newer_version_and_unknown_header_are_rejected():
+    data = snapfile.encode_shard(shard())
+    newer = data[:8] + struct.pack('<H', snapfile.VERSION + 1) + data[10:]
+    with pytest.raises(snapfile.SnapshotError, match=str(snapfile.VERSION + 1)):
+        snapfile.decode_shard(newer)
+    with pytest.raises(snapfile.SnapshotError):
+        snapfile.decode_shard(b'{"2024-05-01": {}}' + bytes(snapfile.HEADER.size))
+
+
+def test_write_shard_and_convert_to_json(tmp_path):
+    path = str(tmp_path / '2024-05.snap')
+    snapfile.write_shard(path, shard())
+    assert snapfile.is_snapshot(path)
+    assert not snapfile.is_snapshot(str(tmp_path / 'missing.snap'))
+
+    json_path = str(tmp_path / '2024-05.json')
+    assert snapfile.main(['to-json', path, json_path]) == 0
+    assert not snapfile.is_snapshot(json_path)
+    assert snapfile.main(['to-snap', json_path, str(tmp_path / 'back.snap')]) == 0
+    with open(str(tmp_path / 'back.snap'), 'rb') as f:
+        assert decoded(f.read()) == shard()
@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+from core import AttendanceCore, StatusLookup
+
+EMPLOYEES = {
+    '1001': {'name': 'أحمد', 'department': 'الإنتاج', 'monthly_salary': 4000},
+    '1002': {'name': 'منى', 'department': 'الجودة', 'monthly_salary': 5000},
+}
+
+ATTENDANCE = {
+    '2024-03-10': {'1001': [('2024-03-10 08:00:00', '2024-03-10 16:00:00')],
+                   '1002': [('2024-03-10 09:00:00', '2024-03-10 17:30:00')]},
+}
+
+
+def test_migration_keeps_tombstones(make_data_dir):
+    data_dir = make_data_dir(EMPLOYEES, ATTENDANCE)
+    core = AttendanceCore('json', data_dir)
+    try:
+        core.remove_employee('1002')
+        core.save_employees()
+        deleted_at = core.tombstones['1002']['deleted_at']
+    finally:
+        core.storage.close()
+
+    core = AttendanceCore('sqlite', data_dir)
+    try:
+        assert set(core.employees) == {'1001'}
+        assert core.tombstones == {'1002': {'employee': EMPLOYEES['1002'], 'deleted_at': deleted_at}}
+        core.restore_employee('1002')
+        core.save_employees()
+        assert core.monthly_report_rows('1002', '2024-03-01', '2024-03-31')[1] == 8.5
+    finally:
+        core.storage.close()
+
+    core = AttendanceCore('sqlite', data_dir)
+    try:
+        assert set(core.employees) == {'1001', '1002'}
+        assert core.tombstones == {}
+    finally:
+        core.storage.close()
+
+
+def test_read_only_reads_legacy_file_without_splitting(make_data_dir):
+    data_dir = make_data_dir(EMPLOYEES, dict(ATTENDANCE, **{
+        '2024-04-02': {'1001': [('2024-04-02 08:00:00', '')]}}))
+    core = AttendanceCore('json', data_dir, read_only=True)
+    try:
+        assert core.monthly_report_rows('1002', '2024-03-01', '2024-03-31')[1] == 8.5
+        assert core.storage.months() == ['2024-03', '2024-04']
+        assert core.open_sessions['1001'][0] == '2024-04-02'
+    finally:
+        core.storage.close()
+    assert sorted(os.listdir(data_dir)) == ['attendance.json', 'employees.json']
+
+    # البرنامج يقسم الملف عند أول فتح للكتابة، والقارئ يرى نفس البيانات بعد التحديث
+    AttendanceCore('json', data_dir).storage.close()
+    core = AttendanceCore('json', data_dir, read_only=True)
+    try:
+        assert core.storage.legacy_attendance is None
+        assert core.monthly_report_rows('1002', '2024-03-01', '2024-03-31')[1] == 8.5
+    finally:
+        core.storage.close()
+
+
+@pytest.mark.parametrize('backend, shard_format', [('json', 'json'), ('json', 'binary'), ('sqlite', 'json')])
+def test_status_lookup_matches_core(make_data_dir, backend, shard_format):
+    data_dir = make_data_dir(EMPLOYEES, dict(ATTENDANCE, **{
+        '2024-04-02': {'1001': [('2024-04-02 08:00:00', '')]}}))
+
+    lookup = StatusLookup('json', data_dir)
+    try:
+        # ملف attendance.json القديم قبل تقسيمه
+        assert lookup.employee_status('1001')['open_date'] == '2024-04-02'
+    finally:
+        lookup.storage.close()
+
+    core = AttendanceCore(backend, data_dir, shard_format)
+    try:
+        core.save_data()
+        # حركات بعد آخر لقطة (في السجل فقط مع تخزين JSON)
+        core.check_out_employee('1001')
+        core.check_in_employee('1002')
+        core.check_in_employee('1001')
+        core.remove_employee('1002')
+        core.save_employees()
+        expected = {emp_id: core.employee_status(emp_id) for emp_id in ('1001', '1002', '9999')}
+    finally:
+        core.storage.close()
+
+    lookup = StatusLookup(backend, data_dir, shard_format)
+    try:
+        assert {emp_id: lookup.employee_status(emp_id) for emp_id in expected} == expected
+        assert lookup.search_employees('أح') == [('1001', 'أحمد')]
+    finally:
+        lookup.storage.close()
@@ -0,0 +1,112 @@
+from tableview import TableView
+
+
+class FakeTree:
+    """بديل Treeview بدون شاشة: يحفظ ترتيب الصفوف وقيمها ويعد العمليات"""
+
+    def __init__(self):
+        self.children = []
+        self.items = {}
+        self.calls = {'insert': 0, 'item': 0, 'delete': 0, 'move': 0}
+        self.idle = []
+
+    def configure(self, **options):
+        self.options = options
+
+    def insert(self, parent, index, iid, values, tags):
+        assert iid not in self.items
+        self.calls['insert'] += 1
+        self.children.insert(len(self.children) if index == 'end' else index, iid)
+        self.items[iid] = (values, tags)
+
+    def item(self, iid, values, tags):
+        self.calls['item'] += 1
+        self.items[iid] = (values, tags)
+
+    def delete(self, *iids):
+        self.calls['delete'] += len(iids)
+        for iid in iids:
+            self.children.remove(iid)
+            del self.items[iid]
+
+    def move(self, iid, parent, index):
+        self.calls['move'] += 1
+        self.children.remove(iid)
+        self.children.insert(index, iid)
+
+    def after_idle(self, callback):
+        self.idle.append(callback)
+
+    def shown(self):
+        return [(iid,) + self.items[iid] for iid in self.children]
+
+    def reset_calls(self):
+        self.calls = dict.fromkeys(self.calls, 0)
+
+
+class FakeScrollbar:
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+def rows(count, changed=()):
+    return [(i, (f'موظف {i}', 'تعديل' if i in changed else ''), ('late',) if i in changed else ())
+            for i in range(count)]
+
+
+def test_set_rows_applies_only_the_differences():
+    tree = FakeTree()
+    table = TableView(tree, page_size=10)
+    table.set_rows(rows(5))
+    assert tree.shown() == [(str(i), (f'موظف {i}', ''), ()) for i in range(5)]
+
+    tree.reset_calls()
+    table.set_rows(rows(5))
+    assert tree.calls == {'insert': 0, 'item': 0, 'delete': 0, 'move': 0}
+
+    table.set_rows([row for row in rows(6, changed={2}) if row[0] != 1])
+    assert tree.calls == {'insert': 1, 'item': 1, 'delete': 1, 'move': 0}
+    assert [iid for iid, _, _ in tree.shown()] == ['0', '2', '3', '4', '5']
+    assert tree.items['2'] == (('موظف 2', 'تعديل'), ('late',))
+
+    # تغيير الترتيب ينقل الصفوف ولا يعيد إدراجها
+    tree.reset_calls()
+    table.set_rows(reversed(rows(6)))
+    assert (tree.calls['insert'], tree.calls['delete']) == (1, 0)
+    assert [iid for iid, _, _ in tree.shown()] == ['5', '4', '3', '2', '1', '0']
+    assert tree.items['2'] == (('موظف 2', ''), ())
+
+    table.clear()
+    assert tree.shown() == [] and len(table) == 0
+
+
+def test_paging_renders_more_when_scrolled_near_the_end():
+    tree = FakeTree()
+    scrollbar = FakeScrollbar()
+    table = TableView(tree, scrollbar, page_size=10)
+    assert tree.options == {'yscrollcommand': table.on_scroll}
+
+    table.set_rows(rows(25))
+    assert len(table) == 25 and len(tree.children) == 10
+    assert table.values() == [(f'موظف {i}', '') for i in range(25)]
+
+    table.on_scroll('0.0', '0.5')
+    assert scrollbar.position == ('0.0', '0.5') and tree.idle == []
+    table.on_scroll('0.5', '0.95')
+    table.on_scroll('0.5', '0.96')
+    # صفحة واحدة فقط تنتظر حتى ينتهي حدث التمرير
+    assert len(tree.idle) == 1 and len(tree.children) == 10
+    tree.idle.pop()()
+    assert tree.children == [str(i) for i in range(20)]
+
+    table.on_scroll('0.8', '1.0')
+    tree.idle.pop()()
+    assert len(tree.children) == 25
+    table.on_scroll('0.9', '1.0')
+    assert tree.idle == []
+
+    # التحديث يحتفظ بالصفوف المعروضة حتى لا يقفز موضع التمرير
+    table.set_rows(rows(30))
+    assert len(tree.children) == 25
+    table.set_rows(rows(3))
+    assert tree.children == ['0', '1', '2']
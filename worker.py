@@ -0,0 +1,77 @@
+import queue
+import threading
+
+
+class BackgroundWorker:
+    """خيط خلفي بطابور مهام (بالترتيب) لعمليات الحفظ والتصدير حتى لا تتوقف الواجهة.
+
+    المهام لا تلمس عناصر Tk؛ النتائج والتقدم ترجع للواجهة عبر root.after فقط.
+    """
+
+    def __init__(self, root, name='worker', poll_ms=50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.pending = 0
+        self.idle = threading.Condition()
+        self.poll_job = None
+
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, func, *args, on_done=None, on_error=None, on_progress=None):
+        """إضافة مهمة للطابور. إذا حُدد on_progress تستقبل الدالة معامل progress(نسبة، نص)"""
+        with self.idle:
+            self.pending += 1
+        self.jobs.put((func, args, on_done, on_error, on_progress))
+        if self.poll_job is None:
+            self.poll_job = self.root.after(self.poll_ms, self._poll)
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            func, args, on_done, on_error, on_progress = job
+            kwargs = {}
+            if on_progress is not None:
+                kwargs['progress'] = lambda fraction, text='': self.results.put(
+                    (on_progress, (fraction, text)))
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if on_error is not None:
+                    self.results.put((on_error, (e,)))
+            else:
+                if on_done is not None:
+                    self.results.put((on_done, (result,)))
+            finally:
+                with self.idle:
+                    self.pending -= 1
+                    self.idle.notify_all()
+
+    def _poll(self):
+        """تنفيذ استدعاءات النتائج والتقدم في خيط الواجهة"""
+        self.poll_job = None
+        while True:
+            try:
+                callback, args = self.results.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+
+        with self.idle:
+            busy = self.pending > 0
+        if busy or not self.results.empty():
+            self.poll_job = self.root.after(self.poll_ms, self._poll)
+
+    def wait_idle(self, timeout=None):
+        """انتظار انتهاء كل المهام الموجودة في الطابور"""
+        with self.idle:
+            return self.idle.wait_for(lambda: self.pending == 0, timeout)
+
+    def close(self, wait=True):
+        self.jobs.put(None)
+        if wait:
+            self.thread.join()